@@ -0,0 +1,103 @@
+# Memory and time for sending one large attachment to many recipients through a local SMTP sink:
+# the old path (EmailMessage + smtplib.send_message, re-encoded and flattened per recipient) vs the
+# streaming path (encoded once, written to the socket chunk by chunk) with an in-memory buffer and a
+# file-backed attachment. Peak memory is measured with tracemalloc.
+# Run from the repository root: python -m benchmarks.bench_attachments [megabytes] [recipients]
+import email
+import email.policy
+import os
+import smtplib
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from models.email_models import Attachment
+from clients.mime_stream import AttachmentEncoder
+from clients.smtp_base import SmtpClient
+from clients.smtp_pool import SmtpConnectionPool
+from benchmarks.smtp_sink import SmtpSink
+
+
+def send_all(label, sink, build, recipients, legacy=False):
+    # legacy: the EmailMessage goes through smtplib.send_message on one plain session, as it used to
+    pool = SmtpConnectionPool()
+    host, port = sink.host, sink.port
+    server = smtplib.SMTP(host, port) if legacy else None
+    sent_before = sink.bytes
+    tracemalloc.start()
+    started = time.perf_counter()
+    for i in range(recipients):
+        message = build(f"r{i}@example.com")
+        if legacy:
+            server.send_message(message)
+        else:
+            pool.send(host, port, "bench@example.com", "x", message, security="plain")
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    pool.close_all()
+    if server is not None:
+        server.quit()
+    sent = (sink.bytes - sent_before) / recipients
+    print(
+        f"{label:28s} peak {peak / 2 ** 20:8.1f} MB  {elapsed:6.2f} s  "
+        f"{recipients / elapsed:6.1f} msg/s  {sent / 2 ** 20:6.1f} MB/message"
+    )
+
+
+def check(sink, build, payload):
+    # The streamed message must parse back to the same text and attachment bytes
+    sink.keep_messages = True
+    pool = SmtpConnectionPool()
+    pool.send(sink.host, sink.port, "bench@example.com", "x", build("check@example.com"), security="plain")
+    pool.close_all()
+    sink.keep_messages = False
+    raw = sink.stored.pop().replace(b"\r\n..", b"\r\n.")
+    parsed = email.message_from_bytes(raw, policy=email.policy.default)
+    parts = list(parsed.iter_attachments())
+    body = parsed.get_body(("plain",)).get_content()
+    ok = len(parts) == 1 and parts[0].get_content() == payload and body.startswith(".Line one")
+    print("round trip:", "ok" if ok else "MISMATCH")
+    return ok
+
+
+def main() -> None:
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    recipients = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    body = ".Line one starts with a dot\nSecond line\n"
+    payload = os.urandom(megabytes * 2 ** 20)
+    sink = SmtpSink()
+    sink.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "report.bin")
+        with open(path, "wb") as f:
+            f.write(payload)
+        in_memory = [Attachment(filename="report.bin", content=payload, mime_type="application/octet-stream")]
+        on_disk = [Attachment.from_path(path)]
+        encoder = AttachmentEncoder()
+
+        def legacy(to):
+            return SmtpClient._build_message("bench@example.com", to, "Report", body, in_memory)
+
+        def streamed(to):
+            return SmtpClient._build_stream("bench@example.com", to, "Report", body, in_memory, encoder=encoder)
+
+        def file_backed(to):
+            return SmtpClient._build_stream("bench@example.com", to, "Report", body, on_disk, encoder=encoder)
+
+        print(f"{megabytes} MB attachment, {recipients} recipients")
+        ok = check(sink, streamed, payload) and check(sink, file_backed, payload)
+        encoder.clear()
+        send_all("legacy send_message", sink, legacy, recipients, legacy=True)
+        send_all("stream, in-memory buffer", sink, streamed, recipients)
+        send_all("stream, file-backed", sink, file_backed, recipients)
+        print(f"encoder: {encoder.misses} encodes, {encoder.hits} reuses")
+        encoder.clear()
+    sink.stop()
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# One announcement to many recipients through a local SMTP sink with simulated network latency:
+# EmailSender.send_many (one transaction per recipient) vs EmailSender.broadcast (one pipelined
+# transaction per 100 recipients). A few addresses are refused by the sink and must come back as
+# per-recipient failures with the server's reply.
+# Run from the repository root: python -m benchmarks.bench_broadcast [recipients] [latency_ms]
+import sys
+import time
+
+from models.email_models import EmailRequest, Provider
+from clients.custom_smtp_client import CustomSmtpClient
+from clients.smtp_pool import SmtpConnectionPool
+from services.email_sender import EmailSender
+from core.rate_limiter import QuotaScheduler
+from benchmarks.smtp_sink import SmtpSink
+
+
+def make_sender(sink):
+    pool = SmtpConnectionPool()
+    custom = CustomSmtpClient(sink.host, sink.port, "plain", pool=pool)
+    return EmailSender(pool=pool, scheduler=QuotaScheduler(), custom=custom), pool
+
+
+def run(label, sink, send):
+    trips, messages = sink.round_trips, sink.messages
+    started = time.perf_counter()
+    summary = send()
+    elapsed = time.perf_counter() - started
+    print(
+        f"{label:30s} {elapsed:6.2f} s  {summary.total / elapsed:8.1f} recipients/s  "
+        f"round trips {sink.round_trips - trips:6d}  transactions {sink.messages - messages:5d}  "
+        f"ok {summary.succeeded}  refused {summary.failed}"
+    )
+    return summary
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 2.0) / 1000
+    recipients = [f"user{i}@example.com" for i in range(count)]
+    rejected = set(recipients[7::97])
+    sink = SmtpSink(latency=latency, reject=rejected)
+    sink.start()
+    base = dict(
+        provider=Provider.CUSTOM,
+        sender_email="news@example.com",
+        sender_password="x",
+        subject="Maintenance window on Saturday",
+        body="Hello,\n\nThe service will be read-only on Saturday from 02:00 to 04:00 UTC.\n",
+    )
+    print(f"{count} recipients, {latency * 1000:.1f} ms per round trip, {len(rejected)} refused by the server")
+
+    sender, pool = make_sender(sink)
+    requests = [EmailRequest(recipient_email=address, **base) for address in recipients]
+    run("send_many (per recipient)", sink, lambda: sender.send_many(requests, provider_limits={"custom": 4}))
+    pool.close_all()
+
+    sender, pool = make_sender(sink)
+    request = EmailRequest(recipient_email=base["sender_email"], **base)
+    summary = run("broadcast (pipelined)", sink, lambda: sender.broadcast(request, recipients))
+    pool.close_all()
+    sink.stop()
+
+    reported = {r.recipient_email for r in summary.results if not r.ok}
+    ok = reported == rejected and all(r.error.startswith("550") for r in summary.results if not r.ok)
+    ok = ok and [r.recipient_email for r in summary.results] == recipients
+    print("per-recipient results:", "ok" if ok else "MISMATCH")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
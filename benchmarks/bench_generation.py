@@ -0,0 +1,180 @@
+# Draft generation end to end against the local API stand-in (benchmarks/fake_llm.py), no network or
+# API keys needed: generate_email latency (p50/p95), time to first token, the share of it spent in
+# StreamingEmailParser, and batch throughput of DraftGenerator (threads) and AsyncEmailSender (asyncio)
+# at several concurrency levels. A raw HTTP client gives the transport floor for comparison.
+# Providers whose SDK (google-genai, groq) is not installed are skipped. The Groq SDK retries 429/5xx
+# by itself, so with --error-rate its failures show up as extra latency rather than errors.
+# Run from the repository root: python -m benchmarks.bench_generation --requests 50 --ttft-ms 200 --tps 150
+import argparse
+import http.client
+import json
+import time
+from urllib.parse import urlsplit
+
+from models.email_models import DraftRequest
+from clients.gemini_client import GeminiClient
+from clients.groq_client import GroqClient
+from clients.response_parser import StreamingEmailParser
+from services.async_email_sender import AsyncEmailSender
+from services.draft_generator import DraftGenerator
+from core.generation_cache import GenerationCache
+from core.rate_limiter import QuotaScheduler
+from benchmarks.fake_llm import FakeLLMServer
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))] if ordered else 0.0
+
+
+def make_drafts(count):
+    return [
+        DraftRequest(purpose="Follow up after the demo", recipient_name=f"Recipient {i}", language="English")
+        for i in range(count)
+    ]
+
+
+def make_clients(base_url, providers):
+    # No disk cache and no quota pacing: every call reaches the server
+    common = dict(api_key="fake-key", cache=GenerationCache(disk_dir=None), scheduler=QuotaScheduler(), base_url=base_url)
+    clients = []
+    if "gemini" in providers:
+        clients.append(GeminiClient(raise_on_error=True, **common))
+    if "groq" in providers:
+        clients.append(GroqClient(**common))
+    for client in [c for c in clients if not c.configured]:
+        print(f"{client.PROVIDER}: SDK not installed, skipped")
+        clients.remove(client)
+    return clients
+
+
+def raw_stream(base_url, count):
+    # Chat-completions stream over one keep-alive connection with http.client: TTFT and total per request
+    parts = urlsplit(base_url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port)
+    body = json.dumps({"model": "fake", "stream": True, "messages": [{"role": "user", "content": "hi"}]})
+    ttfts, totals = [], []
+    for _ in range(count):
+        started = time.perf_counter()
+        connection.request("POST", "/openai/v1/chat/completions", body, {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        first = None
+        while True:
+            line = response.readline()
+            if not line:
+                break
+            if first is None and line.startswith(b"data: {"):
+                first = time.perf_counter() - started
+        response.close()
+        ttfts.append(first or 0.0)
+        totals.append(time.perf_counter() - started)
+    connection.close()
+    return ttfts, totals
+
+
+def parse_overhead(server, iterations=500):
+    # Feeds the exact chunk sequence the server streams through the parser the clients use
+    chunks = server.chunks()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        parser = StreamingEmailParser()
+        for chunk in chunks:
+            parser.feed(chunk)
+            parser.subject, parser.body
+        parser.finish(default_subject="Regarding: benchmark")
+    return (time.perf_counter() - started) / iterations, len(chunks)
+
+
+def latency(client, drafts):
+    ttfts, totals, errors = [], [], 0
+    for draft in drafts:
+        started = time.perf_counter()
+        final = None
+        try:
+            for final in client.generate_email_stream(
+                purpose=draft.purpose,
+                recipient_name=draft.recipient_name,
+                language=draft.language,
+                use_cache=False,
+            ):
+                pass
+        except Exception:
+            errors += 1
+            continue
+        totals.append(time.perf_counter() - started)
+        ttfts.append(final.time_to_first_token or 0.0)
+    return ttfts, totals, errors
+
+
+def throughput(label, run, count):
+    started = time.perf_counter()
+    results = run()
+    elapsed = time.perf_counter() - started
+    failed = sum(1 for r in results if not r.ok)
+    print(f"  {label:28s} {count / elapsed:8.1f} drafts/s  {elapsed:6.2f} s  failed {failed}")
+
+
+def row(label, ttfts, totals, extra=""):
+    print(
+        f"  {label:28s} p50 {percentile(totals, 50) * 1000:8.1f} ms  p95 {percentile(totals, 95) * 1000:8.1f} ms  "
+        f"ttft p50 {percentile(ttfts, 50) * 1000:7.1f} ms  p95 {percentile(ttfts, 95) * 1000:7.1f} ms{extra}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Draft generation benchmark against a local API stand-in")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated levels for the batch runs")
+    parser.add_argument("--providers", default="gemini,groq")
+    parser.add_argument("--ttft-ms", type=float, default=200.0)
+    parser.add_argument("--tps", type=float, default=150.0, help="tokens per second after the first")
+    parser.add_argument("--tokens-per-chunk", type=int, default=4)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    server = FakeLLMServer(
+        ttft=args.ttft_ms / 1000,
+        tokens_per_second=args.tps,
+        tokens_per_chunk=args.tokens_per_chunk,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    base_url = server.start()
+    drafts = make_drafts(args.requests)
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    print(
+        f"fake API {base_url}: ttft {args.ttft_ms:.0f} ms, {args.tps:.0f} tokens/s, "
+        f"{len(server.chunks())} events per response, error rate {args.error_rate:.1%}"
+    )
+
+    per_response, events = parse_overhead(server)
+    ttfts, totals = raw_stream(base_url, min(args.requests, 20))
+    print("transport floor (http.client, sequential)")
+    row("raw SSE stream", ttfts, totals)
+    print(
+        f"parser: {per_response * 1e6:.1f} us per response over {events} chunks "
+        f"({per_response / max(percentile(totals, 50), 1e-9):.3%} of the raw p50)"
+    )
+
+    for client in make_clients(base_url, [p.strip() for p in args.providers.split(",")]):
+        print(f"{client.PROVIDER} ({client.model_name})")
+        ttfts, totals, errors = latency(client, drafts)
+        row("generate_email_stream", ttfts, totals, f"  errors {errors}")
+        for level in levels:
+            throughput(
+                f"DraftGenerator x{level}",
+                lambda: DraftGenerator(client, max_concurrency=level).generate_many(drafts, use_cache=False),
+                len(drafts),
+            )
+            throughput(
+                f"AsyncEmailSender x{level}",
+                lambda: AsyncEmailSender().generate_many_sync(client, drafts, max_concurrency=level, use_cache=False),
+                len(drafts),
+            )
+    print(f"server: {server.requests} requests, {server.errors} injected errors, {server.connections} connections")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
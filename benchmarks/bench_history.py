@@ -0,0 +1,133 @@
+# Send history queries (services/send_log_store.py) over a synthetic log of N rows in a temporary
+# database: exact recipient and duplicate checks, domain/provider/period filters and full-text search,
+# each against a scan of the same rows in Python, which is what answering them from the exported xlsx
+# amounts to. Also prints the append rate with the indexes and FTS triggers in place, and the query plans.
+# The synthetic vocabulary is tiny, so every word is in most rows: the common-word searches are a worst case.
+# Run from the repository root: python -m benchmarks.bench_history [rows]
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from services.send_log_store import SendLogStore
+
+WORDS = (
+    "meeting roadmap invoice proposal follow up quarterly review contract renewal pricing demo "
+    "onboarding feedback partnership launch schedule budget hiring interview offer report update"
+).split()
+PROVIDERS = ("GMAIL", "OUTLOOK", "CUSTOM")
+
+
+def synthetic(count, seed=7):
+    rng = random.Random(seed)
+    domains = [f"company{i}.com" for i in range(2000)]
+    senders = [f"sales{i}@example.com" for i in range(20)]
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        yield {
+            "timestamp": (start + timedelta(seconds=i * 90)).isoformat(),
+            "provider": PROVIDERS[i % 3],
+            "sender": senders[i % len(senders)],
+            "recipient": f"user{rng.randrange(count // 3 + 1)}@{rng.choice(domains)}",
+            "subject": " ".join(rng.choice(WORDS) for _ in range(5)).capitalize(),
+            "body": " ".join(rng.choice(WORDS) for _ in range(60)) + f" ref{i}",
+        }
+
+
+def best(fn, repeat=7):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def show(label, fn, scan=None, repeat=7):
+    elapsed, result = best(fn, repeat)
+    size = len(result) if isinstance(result, (list, set)) else result
+    line = f"{label:44s} {elapsed * 1000:9.3f} ms  ({size})"
+    if scan is not None:
+        scan_elapsed, scan_result = best(scan, 1)
+        scan_size = len(scan_result) if isinstance(scan_result, (list, set)) else scan_result
+        line += f"   python scan {scan_elapsed * 1000:8.1f} ms ({scan_size})"
+    print(line)
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    directory = tempfile.mkdtemp(prefix="bench-history-")
+    try:
+        store = SendLogStore(os.path.join(directory, "sent_emails.db"))
+        rows = list(synthetic(count))
+        started = time.perf_counter()
+        for i in range(0, len(rows), 200):
+            store.append_many(rows[i:i + 200])
+        elapsed = time.perf_counter() - started
+        print(f"appended {count} rows in batches of 200: {count / elapsed:,.0f} rows/s (full text: {store.full_text})")
+
+        probe = rows[count // 2]
+        address = probe["recipient"]
+        domain = address.rpartition("@")[2]
+        since = datetime(2024, 3, 1)
+        until = datetime(2024, 4, 1)
+        show("has_sent (hit)", lambda: store.has_sent(address.upper()), repeat=1000)
+        show("has_sent (miss)", lambda: store.has_sent("nobody@nowhere.test"), repeat=1000)
+        batch = [r["recipient"] for r in rows[:5000:2]] + [f"new{i}@nowhere.test" for i in range(2500)]
+        show(
+            f"sent_to ({len(batch)} addresses)",
+            lambda: store.sent_to(batch),
+            scan=lambda: {r["recipient"].lower() for r in rows} & {b.lower() for b in batch},
+        )
+        show(
+            "search recipient",
+            lambda: store.search(recipient=address),
+            scan=lambda: [r for r in rows if r["recipient"].lower() == address.lower()],
+        )
+        show(
+            "search domain",
+            lambda: store.search(recipient=domain),
+            scan=lambda: [r for r in rows if r["recipient"].endswith("@" + domain)],
+        )
+        show(
+            "search provider + month",
+            lambda: store.search(provider="outlook", since=since, until=until),
+            scan=lambda: [
+                r for r in rows
+                if r["provider"] == "OUTLOOK" and since.isoformat() <= r["timestamp"] < until.isoformat()
+            ],
+        )
+        show(
+            "search text, rare word",
+            lambda: store.search(text=f"ref{count // 3}"),
+            scan=lambda: [r for r in rows if f"ref{count // 3}" in r["body"]],
+        )
+        show(
+            "search text, two common words",
+            lambda: store.search(text="invoice renewal"),
+            scan=lambda: [r for r in rows if all(w in r["subject"] + r["body"] for w in ("invoice", "renewal"))],
+        )
+        show("search text + domain", lambda: store.search(text="pricing", recipient=domain))
+        show("search text, page 20", lambda: store.search(text="pricing", offset=1000))
+        show("count_matching text + month", lambda: store.count_matching(text="pricing", since=since, until=until))
+        show("count_matching all", lambda: store.count_matching())
+
+        print("query plans:")
+        for label, text, recipient, provider in (
+            ("recipient", "", address, ""),
+            ("provider + month", "", "", "outlook"),
+            ("text + domain", "pricing", domain, ""),
+        ):
+            source, order, params = store._query(text, recipient, "", provider, since, until)
+            plan = store._conn.execute(f"EXPLAIN QUERY PLAN SELECT 1 FROM {source} ORDER BY {order} DESC", params)
+            print(f"  {label:18s} " + "; ".join(row[-1] for row in plan.fetchall()))
+        store.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
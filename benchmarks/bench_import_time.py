@@ -0,0 +1,96 @@
+# Cold-start import cost of the entry points, from `python -X importtime` in a fresh interpreter per
+# run (best of --runs). Also a regression check: pandas, the xlsx engine and the LLM SDKs must load on
+# first use, not on import, and only the UI may import Streamlit. Exits 1 when a module pulls in one of
+# those, or when --budget-ms is given and an import exceeds it. Modules whose own dependencies are not
+# installed (e.g. ui.app without streamlit) are reported and skipped.
+# Run from the repository root: python -m benchmarks.bench_import_time [--runs 5] [--top 8] [--budget-ms 300]
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("pandas", "openpyxl", "xlsxwriter", "google.genai", "groq", "httpx", "streamlit")
+# module -> heavy modules it is allowed to import
+TARGETS = {
+    "services.service_registry": (),
+    "services.email_sender": (),
+    "services.async_log_writer": (),
+    "services.mail_merge": (),
+    "clients.gemini_client": (),
+    "clients.groq_client": (),
+    "ui.app": ("streamlit",),
+    "main": ("streamlit",),
+    "cli": (),
+}
+
+
+def import_profile(module):
+    # [(self_us, cumulative_us, name)] in import order, or the error when the import failed
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    errors = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            errors.append(line)
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        rows.append((int(fields[0]), int(fields[1]), fields[2].strip()))
+    if result.returncode != 0:
+        return None, (errors or ["import failed"])[-1]
+    return rows, ""
+
+
+def violations(names, allowed):
+    return sorted(
+        {heavy for heavy in HEAVY if heavy not in allowed for name in names if name == heavy or name.startswith(heavy + ".")}
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import-time report and regression check")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="heaviest dependencies to list per module (0 = none)")
+    parser.add_argument("--budget-ms", type=float, default=0.0, help="fail when an import takes longer (0 = no budget)")
+    parser.add_argument("modules", nargs="*", help=f"default: {', '.join(TARGETS)}")
+    args = parser.parse_args()
+
+    failures = 0
+    for module in args.modules or list(TARGETS):
+        best = None
+        for _ in range(max(1, args.runs)):
+            rows, error = import_profile(module)
+            if rows is None:
+                break
+            total = next(cumulative for _, cumulative, name in reversed(rows) if name == module)
+            if best is None or total < best[0]:
+                best = (total, rows)
+        if best is None:
+            print(f"{module:28s} skipped: {error}")
+            continue
+        total, rows = best
+        names = [name for _, _, name in rows]
+        bad = violations(names, TARGETS.get(module, ()))
+        over = args.budget_ms and total / 1000 > args.budget_ms
+        status = "FAIL" if bad or over else "ok"
+        print(f"{module:28s} {total / 1000:8.1f} ms  {len(rows):4d} modules  {status}")
+        if bad:
+            print(f"{'':28s} imports {', '.join(bad)} at import time")
+        if over:
+            print(f"{'':28s} over the {args.budget_ms:.0f} ms budget")
+        for self_us, cumulative, name in sorted(rows, reverse=True)[:args.top]:
+            print(f"{'':28s}   {self_us / 1000:7.1f} ms self  {cumulative / 1000:7.1f} ms cumulative  {name}")
+        failures += 1 if bad or over else 0
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
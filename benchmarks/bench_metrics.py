@@ -0,0 +1,92 @@
+# Cost of the hot-path instrumentation (core/metrics.py): nanoseconds per span and per counter
+# increment, enabled vs disabled, then the same pooled send of N messages through the local SMTP sink
+# with metrics on and off. Prints the per-stage table the UI shows and the Prometheus export.
+# Run from the repository root: python -m benchmarks.bench_metrics [messages]
+import sys
+import time
+
+from models.email_models import EmailRequest, Provider
+from clients.custom_smtp_client import CustomSmtpClient
+from clients.smtp_pool import SmtpConnectionPool
+from services.email_sender import EmailSender
+from core.metrics import Metrics, default_metrics
+from core.rate_limiter import QuotaScheduler
+from benchmarks.smtp_sink import SmtpSink
+
+
+def per_call(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e9
+
+
+def micro(iterations):
+    # Net of the cost of calling an empty function the same way
+    def empty():
+        pass
+
+    baseline = per_call(empty, iterations)
+    for enabled in (False, True):
+        metrics = Metrics(enabled=enabled)
+
+        def span():
+            with metrics.span("stage"):
+                pass
+
+        label = "enabled " if enabled else "disabled"
+        print(
+            f"{label}  span {per_call(span, iterations) - baseline:7.1f} ns   increment "
+            f"{per_call(lambda: metrics.increment('event'), iterations) - baseline:7.1f} ns   observe "
+            f"{per_call(lambda: metrics.observe('stage', 0.001), iterations) - baseline:7.1f} ns"
+        )
+
+
+def send(sink, count):
+    pool = SmtpConnectionPool()
+    sender = EmailSender(pool=pool, scheduler=QuotaScheduler(), custom=CustomSmtpClient(sink.host, sink.port, "plain", pool=pool))
+    requests = [
+        EmailRequest(
+            provider=Provider.CUSTOM,
+            sender_email="metrics@example.com",
+            sender_password="",
+            recipient_email=f"user{i}@example.com",
+            subject="Metrics overhead",
+            body="Hello,\n\nThis message measures instrumentation overhead.\n",
+        )
+        for i in range(count)
+    ]
+    started = time.perf_counter()
+    summary = sender.send_many(requests, max_workers=1, provider_limits={})
+    elapsed = time.perf_counter() - started
+    pool.close_all()
+    return elapsed, summary.succeeded
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    micro(200000)
+
+    sink = SmtpSink()
+    sink.start()
+    send(sink, 50)  # warm up
+    timings = {}
+    for enabled in (False, True, False, True):
+        default_metrics.enabled = enabled
+        default_metrics.reset()
+        elapsed, ok = send(sink, count)
+        timings.setdefault(enabled, []).append(elapsed)
+    sink.stop()
+    off, on = min(timings[False]), min(timings[True])
+    print(
+        f"{count} pooled sends: metrics off {count / off:8.1f} msg/s, on {count / on:8.1f} msg/s "
+        f"({(on - off) / off:+.1%})"
+    )
+    for stat in default_metrics.stages():
+        print(f"  {stat.stage:14s} p50 {stat.p50 * 1e6:8.1f} us  p95 {stat.p95 * 1e6:8.1f} us  n {stat.count}")
+    exported = default_metrics.prometheus().splitlines()
+    print(f"prometheus export: {len(exported)} lines, e.g. {exported[2]}")
+
+
+if __name__ == "__main__":
+    main()
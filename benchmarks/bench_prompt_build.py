@@ -0,0 +1,93 @@
+# Prompt assembly cost for batch generation: the old per-call f-string + textwrap.dedent + profile
+# flattening vs the precompiled templates in clients/prompts.py.
+# Run from the repository root: python -m benchmarks.bench_prompt_build [drafts]
+import sys
+import textwrap
+import time
+
+from clients.prompts import default_builder
+
+PROFILE = {
+    "name": "Jane Doe",
+    "title": "Senior Backend Engineer",
+    "company": "Acme",
+    "experience": "8",
+    "location": "Istanbul",
+    "email": "jane@example.com",
+    "github": "github.com/jane",
+    "skills": "Python, Go, PostgreSQL, Kubernetes",
+    "summary": "Backend engineer focused on high-throughput services.",
+    "achievements": "Cut p99 latency of the billing API by 70%.",
+}
+
+
+def legacy_prompt(purpose, recipient_name, tone, language, additional_context, profile, email_length):
+    extras = []
+    for key in (
+        "name", "title", "company", "experience", "location", "phone", "email",
+        "website", "linkedin", "github", "skills", "summary", "achievements",
+    ):
+        value = profile.get(key)
+        if value:
+            extras.append(f"{key.capitalize()}: {value}")
+    profile_text = "\n".join(extras)
+    return textwrap.dedent(
+        f"""
+        You are a professional email writing assistant. Create a well-structured, {tone.lower()} email in {language}.
+
+        TASK: Write a complete email based on the following information:
+
+        PURPOSE/TOPIC: {purpose}
+        RECIPIENT: {recipient_name}
+        ADDITIONAL CONTEXT: {additional_context}
+        AUTHOR PROFILE: {profile_text}
+        EMAIL LENGTH: {email_length}
+
+        REQUIREMENTS:
+        - Write a professional email that addresses the purpose/topic
+        - If this appears to be a job application, write a compelling cover letter
+        - Use the author profile to personalize the email appropriately
+        - Keep the tone {tone.lower()} and language {language}
+        - Make it engaging and relevant to the recipient
+        - Include proper greeting and closing
+        - Follow the specified email length: {email_length}
+        - For "Very Short": write only 1 concise paragraph but still include greeting and closing
+        - Do NOT repeat the instructions or context verbatim
+        - Use the profile information naturally in the email content
+
+        Return ONLY a JSON object with these exact keys:
+        {{
+            "subject": "Clear, professional subject line",
+            "body": "Complete email body with proper formatting"
+        }}
+        """
+    ).strip()
+
+
+def run(label, build, drafts):
+    started = time.perf_counter()
+    for i in range(drafts):
+        build(
+            purpose="Backend Engineer application",
+            recipient_name=f"Recipient {i}",
+            tone="Professional",
+            language="English",
+            additional_context=f"Team {i % 50} is hiring for the payments platform.",
+            profile=PROFILE,
+            email_length="Medium (3-4 paragraphs)",
+        )
+    elapsed = time.perf_counter() - started
+    print(f"{label:22s} {drafts:7d} drafts  {elapsed * 1000:9.1f} ms total  {elapsed / drafts * 1e6:7.2f} us/draft")
+    return elapsed
+
+
+def main() -> None:
+    drafts = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    legacy = run("legacy f-string+dedent", legacy_prompt, drafts)
+    single = run("template single", default_builder.single_prompt, drafts)
+    run("template chat", default_builder.chat_messages, drafts)
+    print(f"speedup (single prompt): {legacy / single:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
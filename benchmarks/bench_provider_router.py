@@ -0,0 +1,90 @@
+# Tail latency of draft generation against local fake providers: one provider directly vs the
+# ProviderRouter with failover and hedged requests. The primary has a heavy tail (slow first token)
+# and an error rate; the secondary is slower on median but steady.
+# Run from the repository root: python -m benchmarks.bench_provider_router [requests]
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from models.email_models import GeneratedEmail, StreamedDraft
+from services.provider_router import ProviderRouter
+
+
+class FakeProvider:
+    # Streams a few chunks; first-token delay is drawn from a two-mode distribution
+    def __init__(self, name, ttft, tail_ttft, tail_rate, error_rate, chunk_delay=0.002, chunks=5, seed=0):
+        self.PROVIDER = name
+        self.model_name = f"{name}-fake"
+        self.ttft = ttft
+        self.tail_ttft = tail_ttft
+        self.tail_rate = tail_rate
+        self.error_rate = error_rate
+        self.chunk_delay = chunk_delay
+        self.chunks = chunks
+        self._random = random.Random(seed)
+
+    def generate_email_stream(self, **inputs):
+        roll = self._random.random()
+        if roll < self.error_rate:
+            time.sleep(self.ttft)
+            raise RuntimeError(f"{self.PROVIDER}: 503 Service Unavailable")
+        time.sleep(self.tail_ttft if roll < self.error_rate + self.tail_rate else self.ttft)
+        body = ""
+        for i in range(self.chunks):
+            body += f"chunk {i} "
+            yield StreamedDraft(subject="Fake", body=body)
+            time.sleep(self.chunk_delay)
+        yield StreamedDraft.final(GeneratedEmail(subject=f"From {self.PROVIDER}", body=body))
+
+    def generate_email(self, **inputs):
+        final = None
+        for final in self.generate_email_stream(**inputs):
+            pass
+        return final.email
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def run(label, client, requests, concurrency=8):
+    def one(i):
+        started = time.perf_counter()
+        try:
+            client.generate_email(purpose="Benchmark", recipient_name=f"R{i}")
+            return time.perf_counter() - started, True
+        except Exception:
+            return time.perf_counter() - started, False
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(requests)))
+    latencies = [latency for latency, _ in results]
+    errors = sum(1 for _, ok in results if not ok)
+    print(
+        f"{label:26s} p50 {percentile(latencies, 50) * 1000:7.1f} ms  p95 {percentile(latencies, 95) * 1000:7.1f} ms  "
+        f"p99 {percentile(latencies, 99) * 1000:7.1f} ms  errors {errors}/{requests}"
+    )
+
+
+def providers():
+    primary = FakeProvider("gemini", ttft=0.02, tail_ttft=0.6, tail_rate=0.08, error_rate=0.05, seed=1)
+    secondary = FakeProvider("groq", ttft=0.04, tail_ttft=0.2, tail_rate=0.01, error_rate=0.01, seed=2)
+    return primary, secondary
+
+
+def main() -> None:
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    primary, _ = providers()
+    run("primary only", primary, requests)
+    # Breakers are effectively disabled here so the comparison is about retries and hedging alone
+    router = ProviderRouter(list(providers()), hedge_after=None, backoff_base=0.01, failure_threshold=10 ** 6)
+    run("router, failover", router, requests)
+    router = ProviderRouter(list(providers()), hedge_after=0.08, backoff_base=0.01, failure_threshold=10 ** 6)
+    run("router, failover + hedge", router, requests)
+    print(router.stats())
+
+
+if __name__ == "__main__":
+    main()
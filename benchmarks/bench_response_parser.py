@@ -0,0 +1,86 @@
+# Response parsing: checks StreamingEmailParser against a corpus of malformed model outputs
+# (benchmarks/data/model_outputs.json) at several chunk sizes, then measures throughput against the
+# old greedy-regex + json.loads approach on the full text.
+# Run from the repository root: python -m benchmarks.bench_response_parser [iterations]
+import json
+import os
+import re
+import sys
+import time
+
+from clients.response_parser import StreamingEmailParser
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "data", "model_outputs.json")
+DEFAULT_SUBJECT = "Regarding: corpus"
+CHUNK_SIZES = (1, 3, 16, 0)
+
+
+def chunks(text, size):
+    if size <= 0:
+        return [text]
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def parse(text, size):
+    parser = StreamingEmailParser()
+    for chunk in chunks(text, size):
+        parser.feed(chunk)
+    return parser.finish(default_subject=DEFAULT_SUBJECT)
+
+
+def legacy_parse(full_text):
+    match = re.search(r"\{[\s\S]*\}", full_text)
+    if match:
+        try:
+            data = json.loads(match.group(0))
+            return data.get("subject", DEFAULT_SUBJECT), data.get("body", "")
+        except Exception:
+            pass
+    lines = [l.strip() for l in full_text.splitlines() if l.strip()]
+    return (lines[0][:120] if lines else DEFAULT_SUBJECT), "\n".join(lines[1:])
+
+
+def check_corpus(cases):
+    failures = 0
+    for case in cases:
+        for size in CHUNK_SIZES:
+            email = parse(case["text"], size)
+            if email.subject != case["subject"] or email.body != case["body"]:
+                failures += 1
+                print(f"FAIL {case['name']} (chunk={size or 'all'}): {email.subject!r} / {email.body[:60]!r}")
+        legacy_subject, legacy_body = legacy_parse(case["text"])
+        case["legacy_ok"] = legacy_subject == case["subject"] and str(legacy_body).strip() == case["body"]
+    legacy_ok = sum(1 for case in cases if case["legacy_ok"])
+    print(f"corpus: {len(cases)} cases x {len(CHUNK_SIZES)} chunkings, {failures} failures")
+    print(f"legacy regex parser handles {legacy_ok}/{len(cases)} cases")
+    return failures
+
+
+def throughput(label, fn, text, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(text)
+    elapsed = time.perf_counter() - started
+    mb = len(text.encode("utf-8")) * iterations / 1e6
+    print(f"{label:28s} {elapsed / iterations * 1e6:9.1f} us/response  {mb / elapsed:7.1f} MB/s")
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
+        cases = json.load(f)
+    failures = check_corpus(cases)
+
+    body = "\n\n".join(f"Paragraph {i}: we shipped the {{retry}} change and cut p99 latency." for i in range(12))
+    text = "Sure, here it is:\n```json\n" + json.dumps({"subject": "Quarterly update", "body": body}, indent=2) + "\n```"
+    print(f"response size: {len(text)} chars")
+    throughput("legacy regex + json.loads", lambda t: legacy_parse(t), text, iterations)
+    throughput("streaming, whole text", lambda t: parse(t, 0), text, iterations)
+    throughput("streaming, 16-char chunks", lambda t: parse(t, 16), text, iterations)
+    throughput("streaming, 4-char chunks", lambda t: parse(t, 4), text, iterations)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# Per-rerun cost of building services: fresh objects (the old init_services) vs the ServiceRegistry.
+# Run from the repository root: python -m benchmarks.bench_service_init [iterations]
+import os
+import sys
+import tempfile
+import time
+
+from clients.gemini_client import GeminiClient
+from clients.groq_client import GroqClient
+from services.email_sender import EmailSender
+from services.excel_logger import ExcelLogger
+from services.profile_store import ProfileStore
+from services.service_registry import ServiceRegistry
+
+
+def rerun_fresh(provider: str, model: str, api_key: str) -> None:
+    if provider == "groq":
+        GroqClient(api_key=api_key, model_name=model)
+    else:
+        GeminiClient(api_key=api_key, model_name=model)
+    EmailSender()
+    ExcelLogger()
+    ProfileStore().load()
+
+
+def rerun_registry(registry: ServiceRegistry, provider: str, model: str, api_key: str) -> None:
+    registry.ai_client(provider, model, api_key)
+    registry.email_sender()
+    registry.log_writer()
+    registry.profile_store().load()
+
+
+def timeit(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    os.chdir(tempfile.mkdtemp(prefix="bench_service_init_"))
+    registry = ServiceRegistry()
+    for provider, model, env in (
+        ("gemini", "gemini-2.0-flash-lite", "GEMINI_API_KEY"),
+        ("groq", "llama-3.1-8b-instant", "GROQ_API_KEY"),
+    ):
+        api_key = os.getenv(env, "bench-key")
+        fresh = timeit(lambda: rerun_fresh(provider, model, api_key), iterations)
+        cached = timeit(lambda: rerun_registry(registry, provider, model, api_key), iterations)
+        print(
+            f"{provider:7s} fresh {fresh * 1000:8.3f} ms/rerun   registry {cached * 1000:8.3f} ms/rerun   "
+            f"speedup {fresh / cached if cached else float('inf'):6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+# Local stand-in for the Gemini and Groq (OpenAI-compatible) HTTP APIs for tests and benchmarks.
+# Answers with a canned draft, streamed or whole, and is deterministic for a given seed:
+#   POST /v1beta/models/<model>:streamGenerateContent   Gemini, server-sent events
+#   POST /v1beta/models/<model>:generateContent         Gemini, one JSON response
+#   POST /openai/v1/chat/completions                    Groq, SSE when "stream": true, else JSON
+# Timing and faults can be configured:
+#   ttft              seconds before the first token (or before the whole response)
+#   tokens_per_second rate at which the rest of the response is released
+#   chars_per_token   how the canned text is cut into tokens; tokens_per_chunk tokens go in each event
+#   error_rate        share of requests answered with error_status and the API's JSON error body
+# Point the clients at it with base_url=... or GEMINI_BASE_URL / GROQ_BASE_URL (any API key works).
+# Runs its own asyncio loop in a background thread, or standalone:
+#   python -m benchmarks.fake_llm --port 8787 --ttft-ms 300 --tps 80 --error-rate 0.02
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_RESPONSE = json.dumps(
+    {
+        "subject": "Following up on our conversation",
+        "body": (
+            "Hello,\n\n"
+            "Thank you for taking the time to talk with me last week. I wanted to follow up on the points we "
+            "discussed and share a short summary of the next steps.\n\n"
+            "First, I will send over the updated proposal by Friday, including the revised timeline and the "
+            "budget breakdown you asked for. Second, I would be glad to set up a call with our technical lead "
+            "to go through the integration details.\n\n"
+            "Please let me know if there is anything else I can prepare in the meantime.\n\n"
+            "Best regards,"
+        ),
+    },
+    ensure_ascii=False,
+)
+
+_STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 429: "Too Many Requests", 500: "Internal Server Error", 503: "Service Unavailable"}
+_GEMINI_STATUS = {400: "INVALID_ARGUMENT", 404: "NOT_FOUND", 429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}
+
+
+class FakeLLMServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        ttft: float = 0.0,
+        tokens_per_second: float = 0.0,
+        chars_per_token: int = 4,
+        tokens_per_chunk: int = 1,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: Optional[int] = None,
+        response: str = DEFAULT_RESPONSE,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.chars_per_token = max(1, chars_per_token)
+        self.tokens_per_chunk = max(1, tokens_per_chunk)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.response = response
+        self._random = random.Random(seed)
+        self.requests = 0
+        self.streams = 0
+        self.errors = 0
+        self.tokens = 0
+        self.connections = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> str:
+        ready = threading.Event()
+
+        def run() -> None:
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+            # Connections the clients left open are cancelled so the loop closes cleanly
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._server.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="fake-llm", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.base_url
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+    def chunks(self) -> List[str]:
+        # The text of each streamed event, in order
+        step = self.chars_per_token * self.tokens_per_chunk
+        return [self.response[i:i + step] for i in range(0, len(self.response), step)]
+
+    def _token_count(self) -> int:
+        return -(-len(self.response) // self.chars_per_token)
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, Dict[str, str], bytes]]:
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        method, target = line.decode("latin-1").split(" ", 2)[:2]
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", "0") or 0)
+        body = await reader.readexactly(length) if length else b""
+        return f"{method} {target}", headers, body
+
+    @staticmethod
+    def _head(status: int, content_type: str, length: Optional[int] = None) -> bytes:
+        lines = [f"HTTP/1.1 {status} {_STATUS_TEXT.get(status, 'Error')}", f"Content-Type: {content_type}"]
+        lines.append(f"Content-Length: {length}" if length is not None else "Transfer-Encoding: chunked")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("ascii")
+
+    def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        writer.write(self._head(status, "application/json", len(body)) + body)
+
+    def _error(self, writer: asyncio.StreamWriter, status: int, openai: bool, message: str) -> None:
+        self.errors += 1
+        if openai:
+            payload = {"error": {"message": message, "type": "server_error" if status >= 500 else "invalid_request_error"}}
+        else:
+            payload = {"error": {"code": status, "message": message, "status": _GEMINI_STATUS.get(status, "UNKNOWN")}}
+        self._send_json(writer, status, payload)
+
+    @staticmethod
+    def _gemini_event(text: str, last: bool) -> dict:
+        candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+        if last:
+            candidate["finishReason"] = "STOP"
+        return {"candidates": [candidate]}
+
+    @staticmethod
+    def _openai_event(model: str, text: Optional[str], finish: Optional[str]) -> dict:
+        delta = {"content": text} if text is not None else {}
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }
+
+    async def _stream(self, writer: asyncio.StreamWriter, events: List[bytes]) -> None:
+        # One SSE event per HTTP chunk, released at the configured token rate
+        writer.write(self._head(200, "text/event-stream"))
+        interval = self.tokens_per_chunk / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        if self.ttft > 0:
+            await asyncio.sleep(self.ttft)
+        for i, event in enumerate(events):
+            if i and interval:
+                await asyncio.sleep(interval)
+            writer.write(b"%x\r\n%s\r\n" % (len(event), event))
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+
+    async def _respond(self, writer: asyncio.StreamWriter, request: str, body: bytes) -> None:
+        self.requests += 1
+        method, target = request.split(" ", 1)
+        path = target.split("?", 1)[0]
+        openai = path.endswith("/chat/completions")
+        streaming = ":streamGenerateContent" in path
+        if method != "POST" or not (openai or streaming or ":generateContent" in path):
+            self._error(writer, 404, openai, f"no route for {method} {path}")
+            return
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            self._error(writer, 400, openai, "request body is not JSON")
+            return
+        if self.error_rate and self._random.random() < self.error_rate:
+            self._error(writer, self.error_status, openai, "injected failure")
+            return
+        if openai:
+            streaming = bool(payload.get("stream"))
+        self.tokens += self._token_count()
+        model = payload.get("model") or path.rsplit("/", 1)[-1].split(":", 1)[0]
+
+        if streaming:
+            self.streams += 1
+            chunks = self.chunks()
+            if openai:
+                events = [self._openai_event(model, text, None) for text in chunks]
+                events.append(self._openai_event(model, None, "stop"))
+            else:
+                events = [self._gemini_event(text, i == len(chunks) - 1) for i, text in enumerate(chunks)]
+            encoded = [b"data: " + json.dumps(event).encode("utf-8") + b"\r\n\r\n" for event in events]
+            if openai:
+                encoded.append(b"data: [DONE]\r\n\r\n")
+            await self._stream(writer, encoded)
+            return
+
+        delay = self.ttft + (self._token_count() / self.tokens_per_second if self.tokens_per_second > 0 else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if openai:
+            self._send_json(writer, 200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": self.response}, "finish_reason": "stop"}],
+            })
+        else:
+            self._send_json(writer, 200, self._gemini_event(self.response, True))
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                parsed = await self._read_request(reader)
+                if parsed is None:
+                    break
+                request, headers, body = parsed
+                await self._respond(writer, request, body)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local Gemini/Groq API stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--ttft-ms", type=float, default=0.0, help="delay before the first token")
+    parser.add_argument("--tps", type=float, default=0.0, help="tokens per second after the first (0 = no delay)")
+    parser.add_argument("--chars-per-token", type=int, default=4)
+    parser.add_argument("--tokens-per-chunk", type=int, default=1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    server = FakeLLMServer(
+        host=args.host,
+        port=args.port,
+        ttft=args.ttft_ms / 1000,
+        tokens_per_second=args.tps,
+        chars_per_token=args.chars_per_token,
+        tokens_per_chunk=args.tokens_per_chunk,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+    base_url = server.start()
+    print(f"Fake LLM API on {base_url} (Ctrl-C to stop)")
+    print(f"  GEMINI_BASE_URL={base_url} GROQ_BASE_URL={base_url}")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"{server.requests} requests, {server.streams} streamed, {server.errors} errors, {server.connections} connections")
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
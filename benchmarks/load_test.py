@@ -0,0 +1,136 @@
+# Offline load test of the send path against the local SMTP sink (or any server with --host/--port):
+# messages/s, p50/p95/p99 latency and error rates per mode:
+#   single      a new connection per message, sequential (what every send cost before pooling)
+#   pooled      EmailSender.send_many with one worker, reusing pooled sessions
+#   concurrent  EmailSender.send_many with --workers threads
+#   async       AsyncEmailSender with --workers messages in flight
+# Faults are injected by the sink: --latency-ms, --jitter-ms, --temp-fail, --perm-fail, --drop.
+# Run from the repository root: python -m benchmarks.load_test --messages 1000 --latency-ms 5 --temp-fail 0.01
+import argparse
+import re
+import time
+
+from models.email_models import EmailRequest, Provider
+from clients.async_smtp import AsyncSmtpTransport
+from clients.custom_smtp_client import CustomSmtpClient
+from clients.smtp_pool import SmtpConnectionPool
+from services.async_email_sender import AsyncEmailSender
+from services.email_sender import EmailSender
+from core.rate_limiter import QuotaScheduler
+from benchmarks.smtp_sink import SmtpSink
+
+MODES = ("single", "pooled", "concurrent", "async")
+_REPLY_CODE = re.compile(r"\b([45])\d\d\b")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))] if ordered else 0.0
+
+
+def classify(error):
+    # 4xx / 5xx from the server reply, anything else is a connection-level failure
+    match = _REPLY_CODE.search(error.splitlines()[0] if error else "")
+    return f"{match.group(1)}xx" if match else "connection"
+
+
+def make_requests(count, body_lines):
+    body = "Hello,\n\n" + "".join(f"Line {i} of the load-test message body.\n" for i in range(body_lines))
+    return [
+        EmailRequest(
+            provider=Provider.CUSTOM,
+            sender_email="load@example.com",
+            sender_password="x",
+            recipient_email=f"user{i}@example.com",
+            subject="Load test",
+            body=body,
+        )
+        for i in range(count)
+    ]
+
+
+def run_mode(mode, host, port, requests, workers):
+    if mode == "async":
+        sender = AsyncEmailSender(
+            transport=AsyncSmtpTransport(max_connections_per_key=workers, max_idle_per_key=workers),
+            max_in_flight=workers,
+            provider_limits={},
+            endpoints={Provider.CUSTOM: (host, port, "plain")},
+            scheduler=QuotaScheduler(),
+        )
+        return sender.send_many_sync(requests)
+    # "single" closes every session after one message, so each send pays connect + EHLO + AUTH
+    pool = SmtpConnectionPool(max_messages_per_session=1 if mode == "single" else 100)
+    sender = EmailSender(
+        pool=pool, scheduler=QuotaScheduler(), custom=CustomSmtpClient(host, port, "plain", pool=pool)
+    )
+    try:
+        return sender.send_many(requests, max_workers=workers if mode == "concurrent" else 1, provider_limits={})
+    finally:
+        pool.close_all()
+
+
+def report(mode, summary):
+    latencies = [r.latency for r in summary.results]
+    errors = {}
+    for r in summary.results:
+        if not r.ok:
+            kind = classify(r.error)
+            errors[kind] = errors.get(kind, 0) + 1
+    rates = "  ".join(f"{kind} {errors.get(kind, 0) / summary.total:6.2%}" for kind in ("4xx", "5xx", "connection"))
+    print(
+        f"{mode:11s} {summary.total / summary.elapsed:8.1f} msg/s  "
+        f"p50 {percentile(latencies, 50) * 1000:7.2f} ms  p95 {percentile(latencies, 95) * 1000:7.2f} ms  "
+        f"p99 {percentile(latencies, 99) * 1000:7.2f} ms  {rates}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline SMTP load test")
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated subset of " + ", ".join(MODES))
+    parser.add_argument("--body-lines", type=int, default=40)
+    parser.add_argument("--host", default="", help="test an existing server instead of starting the sink")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--temp-fail", type=float, default=0.0)
+    parser.add_argument("--perm-fail", type=float, default=0.0)
+    parser.add_argument("--drop", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    sink = None
+    host, port = args.host, args.port
+    if not host:
+        sink = SmtpSink(
+            latency=args.latency_ms / 1000,
+            jitter=args.jitter_ms / 1000,
+            temp_fail_rate=args.temp_fail,
+            perm_fail_rate=args.perm_fail,
+            drop_rate=args.drop,
+            seed=args.seed,
+        )
+        host, port = sink.start()
+        print(
+            f"sink {host}:{port}  latency {args.latency_ms} ms (+{args.jitter_ms} jitter)  "
+            f"451 {args.temp_fail:.1%}  554 {args.perm_fail:.1%}  drop {args.drop:.1%}"
+        )
+    print(f"{args.messages} messages, {args.workers} workers")
+    requests = make_requests(args.messages, args.body_lines)
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        if mode not in MODES:
+            parser.error(f"unknown mode {mode!r}")
+        started = time.perf_counter()
+        connections = sink.connections if sink else 0
+        summary = run_mode(mode, host, port, requests, max(1, args.workers))
+        report(mode, summary)
+        if sink is not None and time.perf_counter() - started > 0:
+            print(f"{'':11s} {sink.connections - connections} connections opened")
+    if sink is not None:
+        sink.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# Local SMTP server for tests and benchmarks: speaks EHLO/AUTH/MAIL/RCPT/DATA/RSET/NOOP/QUIT with
+# PIPELINING, counts messages, bytes and round trips and discards the payload (or keeps it when asked).
+# Faults can be injected:
+#   latency/jitter  seconds added once per round trip (when the client has nothing more in flight)
+#   temp_fail_rate  share of messages answered 451 after DATA
+#   perm_fail_rate  share of messages answered 554 after DATA
+#   drop_rate       share of transactions whose connection is closed at MAIL FROM
+#   reject          addresses refused with 550 at RCPT
+# Runs its own asyncio loop in a background thread so blocking clients in the main thread can use it,
+# or standalone for the Custom SMTP provider:
+#   python -m benchmarks.smtp_sink --port 2525 --latency-ms 20 --temp-fail 0.02
+import argparse
+import asyncio
+import random
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+_EHLO = b"250-sink\r\n250-AUTH PLAIN LOGIN\r\n250-PIPELINING\r\n250-8BITMIME\r\n250 SMTPUTF8\r\n"
+_END = b"\r\n.\r\n"
+
+
+class SmtpSink:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        keep_messages: bool = False,
+        latency: float = 0.0,
+        reject: Iterable[str] = (),
+        jitter: float = 0.0,
+        temp_fail_rate: float = 0.0,
+        perm_fail_rate: float = 0.0,
+        drop_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.keep_messages = keep_messages
+        self.latency = latency
+        self.jitter = jitter
+        self.reject = {address.lower() for address in reject}
+        self.temp_fail_rate = temp_fail_rate
+        self.perm_fail_rate = perm_fail_rate
+        self.drop_rate = drop_rate
+        self._random = random.Random(seed)
+        self.messages = 0
+        self.recipients = 0
+        self.rejected = 0
+        self.temp_failures = 0
+        self.perm_failures = 0
+        self.drops = 0
+        self.connections = 0
+        self.bytes = 0
+        self.round_trips = 0
+        self.stored: List[bytes] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> Tuple[str, int]:
+        ready = threading.Event()
+
+        def run() -> None:
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+            # Connections the clients left open are cancelled so the loop closes cleanly
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._server.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="smtp-sink", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.host, self.port
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+    async def _read_data(self, reader: asyncio.StreamReader) -> int:
+        # Reads up to the terminating CRLF.CRLF in large chunks instead of line by line
+        size = 0
+        tail = b"\r\n"  # DATA starts at the beginning of a line
+        parts: List[bytes] = []
+        while True:
+            chunk = await reader.read(256 * 1024)
+            if not chunk:
+                raise ConnectionError("client went away during DATA")
+            window = tail + chunk
+            end = window.find(_END)
+            if end >= 0:
+                consumed = end + len(_END) - len(tail)
+                if self.keep_messages:
+                    parts.append(chunk[:max(0, consumed - 3)])
+                size += consumed
+                if self.keep_messages:
+                    self.stored.append(b"".join(parts))
+                return size
+            if self.keep_messages:
+                parts.append(chunk)
+            size += len(chunk)
+            tail = window[-4:]
+
+    async def _flush(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # Replies go out once the client has nothing more queued, which is one round trip
+        if getattr(reader, "_buffer", None):
+            return
+        self.round_trips += 1
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        writer.write(b"220 sink ready\r\n")
+        try:
+            while True:
+                await self._flush(reader, writer)
+                line = await reader.readline()
+                if not line:
+                    break
+                verb = line[:4].upper()
+                if verb in (b"EHLO", b"HELO"):
+                    writer.write(_EHLO)
+                elif verb == b"AUTH":
+                    writer.write(b"235 ok\r\n")
+                elif verb == b"MAIL" and self.drop_rate and self._random.random() < self.drop_rate:
+                    self.drops += 1
+                    break
+                elif verb == b"RCPT":
+                    address = line[line.find(b"<") + 1:line.rfind(b">")].decode("utf-8", "replace").lower()
+                    if address in self.reject:
+                        self.rejected += 1
+                        writer.write(b"550 5.1.1 mailbox unavailable\r\n")
+                    else:
+                        self.recipients += 1
+                        writer.write(b"250 ok\r\n")
+                elif verb == b"DATA":
+                    writer.write(b"354 go ahead\r\n")
+                    await self._flush(reader, writer)
+                    self.bytes += await self._read_data(reader)
+                    roll = self._random.random()
+                    if roll < self.temp_fail_rate:
+                        self.temp_failures += 1
+                        writer.write(b"451 4.3.0 temporary failure, try again later\r\n")
+                    elif roll < self.temp_fail_rate + self.perm_fail_rate:
+                        self.perm_failures += 1
+                        writer.write(b"554 5.7.1 message rejected\r\n")
+                    else:
+                        self.messages += 1
+                        writer.write(b"250 queued\r\n")
+                elif verb == b"QUIT":
+                    writer.write(b"221 bye\r\n")
+                    break
+                else:
+                    writer.write(b"250 ok\r\n")
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local SMTP sink with fault injection")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--temp-fail", type=float, default=0.0, help="share of messages answered 451")
+    parser.add_argument("--perm-fail", type=float, default=0.0, help="share of messages answered 554")
+    parser.add_argument("--drop", type=float, default=0.0, help="share of transactions dropped at MAIL FROM")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    sink = SmtpSink(
+        host=args.host,
+        port=args.port,
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        temp_fail_rate=args.temp_fail,
+        perm_fail_rate=args.perm_fail,
+        drop_rate=args.drop,
+        seed=args.seed,
+    )
+    host, port = sink.start()
+    print(f"SMTP sink listening on {host}:{port} (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(5)
+            print(
+                f"{sink.messages} accepted, {sink.temp_failures} 451, {sink.perm_failures} 554, "
+                f"{sink.drops} dropped, {sink.connections} connections"
+            )
+    except KeyboardInterrupt:
+        sink.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import argparse
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+from models.email_models import Attachment, BatchProgress, Provider
+from services.batch_runner import BatchCheckpoint, BatchRunner, CheckpointMismatch
+from services.mail_merge import load_recipients
+from core.metrics import default_metrics
+from services.service_registry import get_registry
+from config.app_config import (
+    BATCH_CHECKPOINT_DIR,
+    CUSTOM_SMTP_HOST,
+    CUSTOM_SMTP_PORT,
+    CUSTOM_SMTP_SECURITY,
+    GEMINI_MODEL,
+    GENERATION_MAX_CONCURRENCY,
+    GROQ_MODEL,
+    SEND_MAX_WORKERS,
+)
+
+# Same environment as the Streamlit app
+load_dotenv(dotenv_path=".env", override=False)
+load_dotenv(dotenv_path=".env.local", override=False)
+
+LENGTHS = {
+    "very-short": "Very Short (1 paragraph)",
+    "short": "Short (1-2 paragraphs)",
+    "medium": "Medium (3-4 paragraphs)",
+    "long": "Long (5+ paragraphs)",
+    "ultra-short": "Ultra Short (~700 chars)",
+}
+
+
+def _api_key(provider: str) -> str:
+    return os.getenv("GROQ_API_KEY", "") if provider == "groq" else os.getenv("GEMINI_API_KEY", "")
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Generate and/or send personalized emails for a recipients file without the UI. "
+        "Progress is checkpointed, so rerunning the same command resumes where it stopped."
+    )
+    parser.add_argument("recipients", help="CSV/XLSX with an 'email' column; other columns fill {placeholders}")
+    parser.add_argument("--generate", action="store_true", help="write a personalized AI draft per recipient")
+    parser.add_argument("--send", action="store_true", help="send to every recipient not sent yet")
+    parser.add_argument("--checkpoint", default="", help=f"progress file (default: {BATCH_CHECKPOINT_DIR}/<recipients file>.jsonl)")
+    parser.add_argument("--restart", action="store_true", help="discard the checkpoint and start over")
+    parser.add_argument("--metrics", default="", help="write stage timings and counters here (.prom for Prometheus text, else JSON)")
+
+    ai = parser.add_argument_group("generation")
+    ai.add_argument("--purpose", default="", help="what the email is about; may use {placeholders}")
+    ai.add_argument("--context", default="", help="additional context for the model")
+    ai.add_argument("--tone", default="Professional")
+    ai.add_argument("--language", default="Turkish")
+    ai.add_argument("--length", choices=list(LENGTHS), default="medium")
+    ai.add_argument("--ai-provider", choices=["gemini", "groq"], default="", help="default: the saved UI setting")
+    ai.add_argument("--model", default="", help="default: the saved UI setting for the provider")
+    ai.add_argument("--failover-model", default="", help="fail over to the other provider with this model")
+    ai.add_argument("--concurrency", type=int, default=GENERATION_MAX_CONCURRENCY, help="drafts in flight")
+    ai.add_argument("--no-cache", action="store_true", help="regenerate drafts even when cached")
+
+    smtp = parser.add_argument_group("sending")
+    smtp.add_argument("--smtp-provider", choices=[p.value for p in Provider], default=os.getenv("SMTP_PROVIDER", "gmail").lower())
+    smtp.add_argument("--sender", default=os.getenv("SMTP_EMAIL", ""), help="default: SMTP_EMAIL")
+    smtp.add_argument("--password-env", default="SMTP_PASSWORD", help="environment variable holding the SMTP password")
+    smtp.add_argument("--smtp-host", default=os.getenv("SMTP_HOST", CUSTOM_SMTP_HOST), help="custom provider only")
+    smtp.add_argument("--smtp-port", type=int, default=int(os.getenv("SMTP_PORT", CUSTOM_SMTP_PORT)))
+    smtp.add_argument("--smtp-security", choices=["starttls", "ssl", "plain"], default=os.getenv("SMTP_SECURITY", CUSTOM_SMTP_SECURITY))
+    smtp.add_argument("--subject", default="", help="subject template for recipients without a draft")
+    smtp.add_argument("--body", default="", help="body template for recipients without a draft")
+    smtp.add_argument("--body-file", default="", help="read the body template from a file")
+    smtp.add_argument("--attach", action="append", default=[], help="file to attach (repeatable)")
+    smtp.add_argument("--workers", type=int, default=SEND_MAX_WORKERS, help="messages in flight")
+    smtp.add_argument("--no-log", action="store_true", help="do not record sent mail in the send log")
+    smtp.add_argument("--suppress", action="append", default=[], help="CSV/XLSX of opted-out addresses to add to the suppression list (repeatable)")
+    smtp.add_argument("--allow-duplicates", action="store_true", help="also send to suppressed addresses and to those that already got this subject")
+    return parser
+
+
+def _progress_printer():
+    live = sys.stderr.isatty()
+
+    def show(progress: BatchProgress) -> None:
+        remaining = progress.total - progress.skipped - progress.done
+        eta = remaining / progress.throughput if progress.throughput else 0.0
+        line = (
+            f"[{progress.stage}] {progress.skipped + progress.done}/{progress.total}  "
+            f"{progress.throughput:7.2f}/s  ok {progress.succeeded}  failed {progress.failed}"
+            + (f"  skipped {progress.skipped}" if progress.skipped else "")
+            + (f"  eta {eta:.0f}s" if remaining and eta else "")
+        )
+        sys.stderr.write(f"\r{line}\033[K" if live else line + "\n")
+        sys.stderr.flush()
+
+    return show
+
+
+def main(argv=None) -> int:
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if not (args.generate or args.send):
+        parser.error("nothing to do: pass --generate, --send or both")
+    if args.generate and not args.purpose:
+        parser.error("--generate needs --purpose")
+
+    with open(args.recipients, "rb") as f:
+        recipients = load_recipients(args.recipients, f.read())
+    if not recipients:
+        parser.error(f"no recipients with an email address in {args.recipients}")
+
+    registry = get_registry()
+    checkpoint = BatchCheckpoint(
+        args.checkpoint or os.path.join(BATCH_CHECKPOINT_DIR, os.path.basename(args.recipients) + ".jsonl")
+    )
+    if args.restart:
+        checkpoint.reset()
+    show = _progress_printer()
+    runner = BatchRunner(
+        email_sender=registry.email_sender(),
+        log_writer=None if args.no_log else registry.log_writer(),
+        checkpoint=checkpoint,
+        on_progress=show,
+    )
+    print(
+        f"{len(recipients)} recipients, {len(checkpoint.drafts)} drafted and {len(checkpoint.sent)} sent "
+        f"before (checkpoint {checkpoint.path})",
+        file=sys.stderr,
+    )
+
+    failed = 0
+    try:
+        drafts = None
+        if args.generate:
+            settings = registry.settings_store().load()
+            provider = args.ai_provider or settings.get("ai_provider", "gemini")
+            model = args.model or settings.get(f"{provider}_model", GROQ_MODEL if provider == "groq" else GEMINI_MODEL)
+            if args.failover_model:
+                other = "gemini" if provider == "groq" else "groq"
+                runner.ai_client = registry.provider_router(
+                    [(provider, model, _api_key(provider)), (other, args.failover_model, _api_key(other))]
+                )
+            else:
+                runner.ai_client = registry.ai_client(provider, model, _api_key(provider))
+            drafts, failures = runner.generate(
+                recipients,
+                purpose=args.purpose,
+                tone=args.tone,
+                language=args.language,
+                additional_context=args.context,
+                email_length=LENGTHS[args.length],
+                profile=registry.profile_store().load(),
+                max_concurrency=args.concurrency,
+                use_cache=not args.no_cache,
+            )
+            print(file=sys.stderr)
+            for result in failures:
+                print(f"draft failed for {result.request.recipient_email}: {result.error}", file=sys.stderr)
+            failed += len(failures)
+
+        if args.send:
+            if not args.sender:
+                parser.error("--send needs --sender (or SMTP_EMAIL)")
+            body = args.body
+            if args.body_file:
+                with open(args.body_file, "r", encoding="utf-8") as f:
+                    body = f.read()
+            if drafts is not None:
+                # Recipients whose draft failed are left for the next run instead of getting the bare template
+                recipients = [r for r in recipients if r["email"] in drafts]
+            elif not (args.subject or body or checkpoint.drafts):
+                parser.error("--send needs --subject/--body, drafts from --generate, or drafts in the checkpoint")
+            provider = Provider(args.smtp_provider)
+            endpoint = (args.smtp_host, args.smtp_port, args.smtp_security) if provider == Provider.CUSTOM else None
+            attachments = [Attachment.from_path(path) for path in args.attach] or None
+            for path in args.suppress:
+                with open(path, "rb") as f:
+                    opted_out = [r["email"] for r in load_recipients(path, f.read())]
+                added = registry.suppression_list().add(opted_out, "opted out")
+                print(f"{added} new addresses suppressed from {path}", file=sys.stderr)
+            started = time.perf_counter()
+            summary = runner.send(
+                recipients,
+                provider=provider,
+                sender_email=args.sender,
+                sender_password=os.getenv(args.password_env, ""),
+                subject=args.subject,
+                body=body,
+                attachments=attachments,
+                drafts=drafts,
+                max_workers=args.workers,
+                log=not args.no_log,
+                screen=not args.allow_duplicates,
+                smtp_endpoint=endpoint,
+            )
+            print(file=sys.stderr)
+            for skipped in summary.skipped:
+                print(f"skipped {skipped.recipient_email}: {skipped.reason}", file=sys.stderr)
+            for result in summary.results:
+                if not result.ok:
+                    print(f"send failed for {result.recipient_email}: {result.error.splitlines()[0] if result.error else ''}", file=sys.stderr)
+            if summary.total:
+                print(
+                    f"sent {summary.succeeded}/{summary.total} in {time.perf_counter() - started:.1f}s "
+                    f"({summary.throughput:.2f} msg/s, p50 {summary.latency_p50:.2f}s, p95 {summary.latency_p95:.2f}s)",
+                    file=sys.stderr,
+                )
+            failed += summary.failed
+    except KeyboardInterrupt:
+        print("\ninterrupted; rerun the same command to resume", file=sys.stderr)
+        return 130
+    except CheckpointMismatch as e:
+        print(f"{e}; pass --restart to discard it or --checkpoint for a separate file", file=sys.stderr)
+        return 2
+    finally:
+        checkpoint.close()
+        if args.metrics:
+            default_metrics.export(args.metrics)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
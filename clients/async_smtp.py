@@ -0,0 +1,320 @@
+import asyncio
+import base64
+import smtplib
+import ssl
+import time
+from dataclasses import dataclass
+from email.message import EmailMessage
+from email.utils import getaddresses
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from core.metrics import default_metrics
+from config.app_config import (
+    SMTP_TIMEOUT,
+    SMTP_POOL_MAX_MESSAGES_PER_SESSION,
+    SMTP_POOL_IDLE_TIMEOUT,
+    SMTP_POOL_NOOP_INTERVAL,
+    SMTP_ASYNC_MAX_CONNECTIONS_PER_KEY,
+)
+
+
+class AsyncSmtpError(Exception):
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(f"{code} {message}")
+        self.code = code
+        self.message = message
+
+
+class AsyncSmtpDisconnected(ConnectionError):
+    pass
+
+
+def message_bytes(message: EmailMessage) -> bytes:
+    # CRLF line endings and dot-stuffing as required for the DATA phase
+    raw = message.as_bytes(policy=message.policy.clone(linesep="\r\n"))
+    if raw.startswith(b"."):
+        raw = b"." + raw
+    raw = raw.replace(b"\r\n.", b"\r\n..")
+    if not raw.endswith(b"\r\n"):
+        raw += b"\r\n"
+    return raw
+
+
+class AsyncSmtpConnection:
+    def __init__(self, timeout: float = SMTP_TIMEOUT) -> None:
+        self.timeout = timeout
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.extensions: Dict[str, str] = {}
+        self.host = ""
+        # Set once DATA has gone out for the current message: from then on the server may have accepted it
+        self.data_sent = False
+
+    async def connect(
+        self,
+        host: str,
+        port: int,
+        security: str = "starttls",
+        ssl_context: Optional[ssl.SSLContext] = None,
+    ) -> None:
+        self.host = host
+        context = ssl_context or ssl.create_default_context()
+        with default_metrics.span("smtp_connect"):
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=context if security == "ssl" else None),
+                self.timeout,
+            )
+            await self._expect(220)
+            await self.ehlo()
+        if security == "starttls":
+            with default_metrics.span("smtp_tls"):
+                await self.command("STARTTLS", expect=220)
+                await self.writer.start_tls(context, server_hostname=host)
+                await self.ehlo()
+
+    async def _read_reply(self) -> Tuple[int, str]:
+        lines: List[str] = []
+        while True:
+            try:
+                raw = await asyncio.wait_for(self.reader.readline(), self.timeout)
+            except asyncio.TimeoutError:
+                raise AsyncSmtpDisconnected("Timed out waiting for SMTP reply")
+            if not raw:
+                raise AsyncSmtpDisconnected("Connection unexpectedly closed")
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            lines.append(line[4:])
+            if len(line) < 4 or line[3] != "-":
+                try:
+                    return int(line[:3]), "\n".join(lines)
+                except ValueError:
+                    raise AsyncSmtpDisconnected(f"Malformed SMTP reply: {line!r}")
+
+    async def _expect(self, *codes: int) -> Tuple[int, str]:
+        code, text = await self._read_reply()
+        if codes and code not in codes:
+            raise AsyncSmtpError(code, text)
+        return code, text
+
+    async def command(self, line: str, expect: Sequence[int] = (250,)) -> Tuple[int, str]:
+        if isinstance(expect, int):
+            expect = (expect,)
+        if self.writer is None or self.writer.is_closing():
+            raise AsyncSmtpDisconnected("Not connected")
+        self.writer.write(line.encode("utf-8") + b"\r\n")
+        await self.writer.drain()
+        return await self._expect(*expect)
+
+    async def ehlo(self) -> None:
+        _, text = await self.command("EHLO localhost", expect=250)
+        self.extensions = {}
+        for entry in text.splitlines()[1:]:
+            name, _, params = entry.partition(" ")
+            self.extensions[name.lower()] = params
+
+    def has_extn(self, name: str) -> bool:
+        return name.lower() in self.extensions
+
+    async def login(self, username: str, password: str) -> None:
+        mechanisms = self.extensions.get("auth", "").upper().split()
+        if "PLAIN" in mechanisms or not mechanisms:
+            token = base64.b64encode(f"\0{username}\0{password}".encode("utf-8")).decode("ascii")
+            await self.command(f"AUTH PLAIN {token}", expect=235)
+            return
+        await self.command("AUTH LOGIN", expect=334)
+        await self.command(base64.b64encode(username.encode("utf-8")).decode("ascii"), expect=334)
+        await self.command(base64.b64encode(password.encode("utf-8")).decode("ascii"), expect=235)
+
+    async def noop(self) -> bool:
+        try:
+            code, _ = await self.command("NOOP", expect=())
+            return code == 250
+        except Exception:
+            return False
+
+    async def sendmail(
+        self, from_addr: str, to_addrs: Sequence[str], data: Union[bytes, Any]
+    ) -> Dict[str, Tuple[int, bytes]]:
+        # `data` is the ready DATA payload or a StreamingMessage whose chunks are written as they come.
+        # Returns the refused recipients like SmtpConnectionPool; raises SMTPRecipientsRefused when none
+        # were accepted
+        self.data_sent = False
+        options = " SMTPUTF8" if self.has_extn("smtputf8") else ""
+        await self.command(f"MAIL FROM:<{from_addr}>{options}", expect=250)
+        refused: Dict[str, Tuple[int, bytes]] = {}
+        for rcpt in to_addrs:
+            code, text = await self.command(f"RCPT TO:<{rcpt}>", expect=())
+            if code not in (250, 251):
+                refused[rcpt] = (code, text.encode("utf-8"))
+        if len(refused) == len(to_addrs):
+            await self.command("RSET", expect=())
+            raise smtplib.SMTPRecipientsRefused(refused)
+        self.data_sent = True
+        try:
+            await self.command("DATA", expect=354)
+        except AsyncSmtpError:
+            # Recipients were accepted, so the transaction is still open on the server: reset it, or the
+            # next message on this pooled session would inherit them
+            await self.command("RSET", expect=())
+            raise
+        if isinstance(data, bytes):
+            self.writer.write(data)
+        else:
+            for chunk in data.chunks():
+                self.writer.write(chunk)
+                await self.writer.drain()
+        self.writer.write(b".\r\n")
+        await self.writer.drain()
+        await self._expect(250)
+        return refused
+
+    async def quit(self) -> None:
+        try:
+            await self.command("QUIT", expect=())
+        except Exception:
+            pass
+        await self.close()
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+            self.writer = None
+
+
+@dataclass
+class _AsyncSession:
+    conn: AsyncSmtpConnection
+    password: str
+    security: str
+    last_used: float
+    messages_sent: int = 0
+    reused: bool = False
+
+
+class AsyncSmtpTransport:
+    # asyncio counterpart of SmtpConnectionPool: authenticated sessions reused per (host, port, username)
+    def __init__(
+        self,
+        max_messages_per_session: int = SMTP_POOL_MAX_MESSAGES_PER_SESSION,
+        max_idle_per_key: int = SMTP_ASYNC_MAX_CONNECTIONS_PER_KEY,
+        idle_timeout: float = SMTP_POOL_IDLE_TIMEOUT,
+        noop_interval: float = SMTP_POOL_NOOP_INTERVAL,
+        timeout: float = SMTP_TIMEOUT,
+        max_connections_per_key: int = SMTP_ASYNC_MAX_CONNECTIONS_PER_KEY,
+    ) -> None:
+        self.max_messages_per_session = max_messages_per_session
+        self.max_idle_per_key = max_idle_per_key
+        self.idle_timeout = idle_timeout
+        self.noop_interval = noop_interval
+        self.timeout = timeout
+        self.max_connections_per_key = max(1, max_connections_per_key)
+        self._idle: Dict[Tuple[str, int, str], List[_AsyncSession]] = {}
+        self._limits: Dict[Tuple[str, int, str], asyncio.Semaphore] = {}
+        self._ssl_context: Optional[ssl.SSLContext] = None
+
+    def _context(self) -> ssl.SSLContext:
+        if self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context()
+        return self._ssl_context
+
+    async def _acquire(self, host: str, port: int, username: str, password: str, security: str) -> _AsyncSession:
+        sessions = self._idle.get((host, port, username), [])
+        while sessions:
+            session = sessions.pop()
+            idle_for = time.monotonic() - session.last_used
+            if session.password != password or session.security != security or idle_for > self.idle_timeout:
+                await session.conn.quit()
+                continue
+            if idle_for > self.noop_interval and not await session.conn.noop():
+                await session.conn.close()
+                continue
+            session.reused = True
+            return session
+
+        conn = AsyncSmtpConnection(timeout=self.timeout)
+        try:
+            await conn.connect(host, port, security=security, ssl_context=self._context())
+            if password:
+                with default_metrics.span("smtp_auth"):
+                    await conn.login(username, password)
+        except BaseException:
+            await conn.close()
+            raise
+        return _AsyncSession(conn=conn, password=password, security=security, last_used=time.monotonic())
+
+    async def _release(self, key: Tuple[str, int, str], session: _AsyncSession) -> None:
+        session.last_used = time.monotonic()
+        sessions = self._idle.setdefault(key, [])
+        if session.messages_sent >= self.max_messages_per_session or len(sessions) >= self.max_idle_per_key:
+            await session.conn.quit()
+        else:
+            sessions.append(session)
+
+    async def send_message(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: str,
+        message: Any,
+        security: str = "starttls",
+    ) -> Dict[str, Tuple[int, bytes]]:
+        # Returns the recipients the server refused; raises when none were accepted
+        key = (host, port, username)
+        if isinstance(message, EmailMessage):
+            data = message_bytes(message)
+            from_addr = next((a for _, a in getaddresses([str(message["From"])]) if a), username)
+            to_addrs = [a for _, a in getaddresses([str(message["To"])]) if a]
+        else:
+            data, from_addr, to_addrs = message, message.from_addr or username, message.to_addrs
+        limit = self._limits.get(key)
+        if limit is None:
+            limit = self._limits[key] = asyncio.Semaphore(self.max_connections_per_key)
+        async with limit:
+            return await self._send_with_session(key, from_addr, to_addrs, data, password, security)
+
+    async def _send_with_session(
+        self,
+        key: Tuple[str, int, str],
+        from_addr: str,
+        to_addrs: List[str],
+        data: Any,
+        password: str,
+        security: str,
+    ) -> Dict[str, Tuple[int, bytes]]:
+        host, port, username = key
+        while True:
+            session = await self._acquire(host, port, username, password, security)
+            started = time.perf_counter()
+            try:
+                refused = await session.conn.sendmail(from_addr, to_addrs, data)
+            except (AsyncSmtpError, smtplib.SMTPRecipientsRefused):
+                default_metrics.increment("smtp_rejected")
+                await self._release(key, session)
+                raise
+            except (AsyncSmtpDisconnected, ConnectionError, OSError):
+                await session.conn.close()
+                # Only a stale pooled session whose envelope failed is retried: once DATA is out the server
+                # may have queued the message, and a fresh session is never retried either
+                if session.reused and not session.conn.data_sent:
+                    default_metrics.increment("smtp_reconnects")
+                    continue
+                default_metrics.increment("smtp_connection_errors")
+                raise
+            except BaseException:
+                await session.conn.close()
+                raise
+            default_metrics.observe("smtp_data", time.perf_counter() - started)
+            session.messages_sent += 1
+            await self._release(key, session)
+            return refused
+
+    async def close(self) -> None:
+        sessions = [s for group in self._idle.values() for s in group]
+        self._idle.clear()
+        self._limits.clear()
+        for session in sessions:
+            await session.conn.quit()
@@ -0,0 +1,57 @@
+import smtplib
+from typing import List, Optional
+
+from models.email_models import Attachment
+from config.app_config import CUSTOM_SMTP_HOST, CUSTOM_SMTP_PORT, CUSTOM_SMTP_SECURITY
+from .message_template import default_templates
+from .smtp_base import SmtpClient
+from .smtp_pool import Refused, SmtpConnectionPool
+
+
+class CustomSmtpClient(SmtpClient):
+    # Any SMTP server by host, port and security ("starttls", "ssl" or "plain")
+    def __init__(
+        self,
+        host: str = CUSTOM_SMTP_HOST,
+        port: int = CUSTOM_SMTP_PORT,
+        security: str = CUSTOM_SMTP_SECURITY,
+        pool: Optional[SmtpConnectionPool] = None,
+    ) -> None:
+        super().__init__(pool=pool)
+        self.HOST = host
+        self.PORT = port
+        self.security = security
+
+    def send(
+        self,
+        sender_email: str,
+        sender_password: str,
+        recipient_email: str,
+        subject: str,
+        body: str,
+        attachments: Optional[List[Attachment]] = None,
+        message_id: str = "",
+    ) -> None:
+        message = default_templates.render(sender_email, recipient_email, subject, body, attachments, message_id)
+        self.pool.send(self.HOST, self.PORT, sender_email, sender_password, message, security=self.security)
+
+    def broadcast(
+        self,
+        sender_email: str,
+        sender_password: str,
+        recipients: List[str],
+        subject: str,
+        body: str,
+        attachments: Optional[List[Attachment]] = None,
+        message_id: str = "",
+    ) -> Refused:
+        message = default_templates.render(
+            sender_email, sender_email, subject, body, attachments, message_id, envelope=recipients
+        )
+        try:
+            refused = self.pool.send(
+                self.HOST, self.PORT, sender_email, sender_password, message, security=self.security
+            )
+        except smtplib.SMTPRecipientsRefused as e:
+            refused = e.recipients
+        return {address: refused[rcpt] for address, rcpt in zip(recipients, message.to_addrs) if rcpt in refused}
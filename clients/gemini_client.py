@@ -1,31 +1,88 @@
-from typing import Optional, Dict, Any
-import textwrap
+from typing import Optional, Dict, Any, Iterator, Tuple
+import copy
 import os
 
-try:
-    from google import genai
-    from google.genai import types
-except Exception:  # pragma: no cover - optional at runtime
-    genai = None
-    types = None
-
-from models.email_models import GeneratedEmail
+from models.email_models import GeneratedEmail, StreamedDraft
+from clients.prompts import default_builder, render_profile
+from clients.generation_call import GenerationCall
 from config.app_config import GEMINI_MODEL
+from core.generation_cache import GenerationCache, get_default_cache
+from core.rate_limiter import QuotaScheduler, get_default_scheduler
+
+# google-genai takes about a second to import, so it is loaded by the first client that needs it
+genai = None
+types = None
+_sdk_missing = False
+
+
+def _load_sdk() -> bool:
+    global genai, types, _sdk_missing
+    if genai is None and not _sdk_missing:
+        try:
+            from google import genai as genai_module
+            from google.genai import types as types_module
+        except Exception:  # pragma: no cover - optional at runtime
+            _sdk_missing = True
+            return False
+        genai, types = genai_module, types_module
+    return genai is not None
 
 
 class GeminiClient:
-    def __init__(self, api_key: str = "", model_name: str = GEMINI_MODEL) -> None:
+    PROVIDER = "gemini"
+
+    def __init__(
+        self,
+        api_key: str = "",
+        model_name: str = GEMINI_MODEL,
+        cache: Optional[GenerationCache] = None,
+        raise_on_error: bool = False,
+        scheduler: Optional[QuotaScheduler] = None,
+        base_url: str = "",
+    ) -> None:
         self.api_key = api_key
         self.model_name = model_name
+        # Another endpoint for the same API, e.g. the local stand-in in benchmarks/fake_llm.py
+        self.base_url = base_url or os.getenv("GEMINI_BASE_URL", "")
+        self.cache = cache if cache is not None else get_default_cache()
+        # The UI wants the canned draft on failure; ProviderRouter needs the error to retry or fail over
+        self.raise_on_error = raise_on_error
+        self.prompts = default_builder
+        self.scheduler = scheduler or get_default_scheduler()
         self._configured = False
         self._client = None
-        if api_key and genai is not None:
+        if api_key and _load_sdk():
             try:
-                self._client = genai.Client(api_key=api_key)
+                http_options = types.HttpOptions(base_url=self.base_url) if self.base_url else None
+                self._client = genai.Client(api_key=api_key, http_options=http_options)
                 self._configured = True
             except Exception:
                 self._configured = False
 
+    def with_model(self, model_name: str) -> "GeminiClient":
+        # Shares the SDK client (and its HTTP connection pool) and the cache; only the model differs
+        clone = copy.copy(self)
+        clone.model_name = model_name
+        return clone
+
+    @property
+    def configured(self) -> bool:
+        return self._configured
+
+    def _fallback_or_raise(
+        self,
+        purpose: str,
+        recipient_name: str,
+        additional_context: str,
+        profile_text: str,
+        error: Optional[Exception] = None,
+    ) -> GeneratedEmail:
+        if self.raise_on_error:
+            if error is None:
+                raise RuntimeError("Gemini client is not configured. Set GEMINI_API_KEY and install google-genai")
+            raise RuntimeError(f"Gemini generation failed: {error}") from error
+        return self._fallback_email(purpose, recipient_name, additional_context, profile_text)
+
     def generate_email(
         self,
         purpose: str,
@@ -35,146 +92,128 @@ class GeminiClient:
         additional_context: str = "",
         profile: Optional[Dict[str, Any]] = None,
         email_length: str = "Medium (3-4 paragraphs)",
+        use_cache: bool = True,
     ) -> GeneratedEmail:
-        if not purpose:
-            purpose = "General correspondence"
-
-        profile_text = ""
-        if profile:
-            # Include all profile fields for comprehensive context
-            name = profile.get("name")
-            title = profile.get("title")
-            company = profile.get("company")
-            experience = profile.get("experience")
-            location = profile.get("location")
-            phone = profile.get("phone")
-            email = profile.get("email")
-            website = profile.get("website")
-            linkedin = profile.get("linkedin")
-            github = profile.get("github")
-            skills = profile.get("skills")
-            summary = profile.get("summary")
-            achievements = profile.get("achievements")
-            
-            extras = []
-            if name:
-                extras.append(f"Name: {name}")
-            if title:
-                extras.append(f"Title: {title}")
-            if company:
-                extras.append(f"Company: {company}")
-            if experience:
-                extras.append(f"Experience: {experience}")
-            if location:
-                extras.append(f"Location: {location}")
-            if phone:
-                extras.append(f"Phone: {phone}")
-            if email:
-                extras.append(f"Email: {email}")
-            if website:
-                extras.append(f"Website: {website}")
-            if linkedin:
-                extras.append(f"LinkedIn: {linkedin}")
-            if github:
-                extras.append(f"GitHub: {github}")
-            if skills:
-                extras.append(f"Skills: {skills}")
-            if summary:
-                extras.append(f"Summary: {summary}")
-            if achievements:
-                extras.append(f"Achievements: {achievements}")
-            
-            if extras:
-                profile_text = "\n".join(extras)
-
-        if not self._configured:
-            subject = f"Regarding: {purpose}"
-            body_lines = [
-                f"Merhaba {recipient_name or 'Alıcı'},",
-                "",
-                f"{purpose} hakkında iletişime geçmek isterim.",
-            ]
-            if additional_context:
-                body_lines.append(additional_context)
-            if profile_text:
-                body_lines += ["", "Hakkımda:", profile_text]
-            body_lines += ["", "Saygılarımla,", ""]
-            return GeneratedEmail(subject=subject, body="\n".join(body_lines).strip())
-
-        # Improved prompt for better email generation
-        prompt = textwrap.dedent(
-            f"""
-            You are a professional email writing assistant. Create a well-structured, {tone.lower()} email in {language}.
-
-            TASK: Write a complete email based on the following information:
-
-            PURPOSE/TOPIC: {purpose}
-            RECIPIENT: {recipient_name}
-            ADDITIONAL CONTEXT: {additional_context}
-            AUTHOR PROFILE: {profile_text}
-            EMAIL LENGTH: {email_length}
-
-            REQUIREMENTS:
-            - Write a professional email that addresses the purpose/topic
-            - If this appears to be a job application, write a compelling cover letter
-            - Use the author profile to personalize the email appropriately
-            - Keep the tone {tone.lower()} and language {language}
-            - Make it engaging and relevant to the recipient
-            - Include proper greeting and closing
-            - Follow the specified email length: {email_length}
-            - For "Very Short": write only 1 concise paragraph but still include greeting and closing 
-            - Do NOT repeat the instructions or context verbatim
-            - Use the profile information naturally in the email content
-
-            Return ONLY a JSON object with these exact keys:
-            {{
-                "subject": "Clear, professional subject line",
-                "body": "Complete email body with proper formatting"
-            }}
-            """
-        ).strip()
+        final = None
+        for final in self.generate_email_stream(
+            purpose=purpose,
+            recipient_name=recipient_name,
+            tone=tone,
+            language=language,
+            additional_context=additional_context,
+            profile=profile,
+            email_length=email_length,
+            use_cache=use_cache,
+        ):
+            pass
+        return final.email
+
+    def generate_email_stream(
+        self,
+        purpose: str,
+        recipient_name: str,
+        tone: str = "Professional",
+        language: str = "Turkish",
+        additional_context: str = "",
+        profile: Optional[Dict[str, Any]] = None,
+        email_length: str = "Medium (3-4 paragraphs)",
+        use_cache: bool = True,
+    ) -> Iterator[StreamedDraft]:
+        # Yields partial subject/body as tokens arrive; the last item has done=True and the final email
+        call = GenerationCall(self, self._inputs(locals()), use_cache)
+        if call.done:
+            yield call.final()
+            return
 
+        self.scheduler.acquire(**call.quota)
+        call.start()
         try:
-            contents = [
-                types.Content(
-                    role="user",
-                    parts=[
-                        types.Part.from_text(text=prompt),
-                    ],
-                ),
-            ]
-            generate_content_config = types.GenerateContentConfig()
-
-            # Collect all chunks
-            full_text = ""
             for chunk in self._client.models.generate_content_stream(
                 model=self.model_name,
-                contents=contents,
-                config=generate_content_config,
+                contents=self._contents(call.prompt),
+                config=types.GenerateContentConfig(),
             ):
-                full_text += chunk.text or ""
-
-            import json, re
-            match = re.search(r"\{[\s\S]*\}", full_text)
-            if match:
-                data = json.loads(match.group(0))
-                subject = data.get("subject") or f"Regarding: {purpose}"
-                body = data.get("body") or ""
-            else:
-                lines = [l.strip() for l in full_text.splitlines() if l.strip()]
-                subject = lines[0][:120] if lines else f"Regarding: {purpose}"
-                body = "\n".join(lines[1:]) if len(lines) > 1 else full_text
-            return GeneratedEmail(subject=subject, body=body.strip())
-        except Exception:
-            subject = f"Regarding: {purpose}"
-            body_lines = [
-                f"Merhaba {recipient_name or 'Alıcı'},",
-                "",
-                f"{purpose} hakkında iletişime geçmek isterim.",
-            ]
-            if additional_context:
-                body_lines.append(additional_context)
-            if profile_text:
-                body_lines += ["", "Hakkımda:", profile_text]
-            body_lines += ["", "Saygılarımla,", ""]
-            return GeneratedEmail(subject=subject, body="\n".join(body_lines).strip())
+                if call.feed(chunk.text):
+                    yield call.partial()
+            generated = call.parse()
+        except Exception as e:
+            yield call.fail(e)
+            return
+        yield call.complete(generated)
+
+    async def agenerate_email(
+        self,
+        purpose: str,
+        recipient_name: str,
+        tone: str = "Professional",
+        language: str = "Turkish",
+        additional_context: str = "",
+        profile: Optional[Dict[str, Any]] = None,
+        email_length: str = "Medium (3-4 paragraphs)",
+        use_cache: bool = True,
+    ) -> GeneratedEmail:
+        # Same behaviour as generate_email, on the SDK's native asyncio client
+        call = GenerationCall(self, self._inputs(locals()), use_cache)
+        if call.done:
+            return call.result
+
+        await self.scheduler.acquire_async(**call.quota)
+        call.start()
+        try:
+            stream = await self._client.aio.models.generate_content_stream(
+                model=self.model_name,
+                contents=self._contents(call.prompt),
+                config=types.GenerateContentConfig(),
+            )
+            async for chunk in stream:
+                call.feed(chunk.text)
+            generated = call.parse()
+        except Exception as e:
+            return call.fail(e).email
+        return call.complete(generated).email
+
+    @staticmethod
+    def _inputs(arguments: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in arguments.items() if k not in ("self", "use_cache")}
+
+    def _build_prompt(self, inputs: Dict[str, Any]) -> Tuple[str, str]:
+        prompt = self.prompts.single_prompt(**inputs)
+        return prompt, prompt
+
+    def _unconfigured(self, inputs: Dict[str, Any]) -> GeneratedEmail:
+        return self._failed(inputs, None)
+
+    def _failed(self, inputs: Dict[str, Any], error: Optional[Exception]) -> GeneratedEmail:
+        return self._fallback_or_raise(
+            inputs["purpose"],
+            inputs["recipient_name"],
+            inputs["additional_context"],
+            render_profile(inputs["profile"]),
+            error=error,
+        )
+
+    @staticmethod
+    def _contents(prompt: str) -> list:
+        return [
+            types.Content(
+                role="user",
+                parts=[
+                    types.Part.from_text(text=prompt),
+                ],
+            ),
+        ]
+
+    @staticmethod
+    def _fallback_email(purpose: str, recipient_name: str, additional_context: str, profile_text: str) -> GeneratedEmail:
+        subject = f"Regarding: {purpose}"
+        body_lines = [
+            f"Merhaba {recipient_name or 'Alıcı'},",
+            "",
+            f"{purpose} hakkında iletişime geçmek isterim.",
+        ]
+        if additional_context:
+            body_lines.append(additional_context)
+        if profile_text:
+            body_lines += ["", "Hakkımda:", profile_text]
+        body_lines += ["", "Saygılarımla,", ""]
+        return GeneratedEmail(subject=subject, body="\n".join(body_lines).strip())
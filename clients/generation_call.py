@@ -0,0 +1,94 @@
+import time
+from typing import Any, Dict, Optional
+
+from models.email_models import GeneratedEmail, StreamedDraft
+from clients.response_parser import StreamingEmailParser
+from config.app_config import LLM_OUTPUT_TOKENS_ESTIMATE
+from core.generation_cache import GenerationCache
+from core.metrics import default_metrics
+from core.rate_limiter import estimate_tokens
+
+
+class GenerationCall:
+    # Everything around one model request except the SDK call itself: defaults, cache lookup, prompt
+    # build, quota cost, parsing, metrics and the cache write. A client's sync stream and its async
+    # path both go through it, so they only differ in how they pace and read the stream.
+    # The client provides _build_prompt, _unconfigured and _failed.
+    def __init__(self, client: Any, inputs: Dict[str, Any], use_cache: bool) -> None:
+        self.client = client
+        self.inputs = dict(inputs, purpose=inputs.get("purpose") or "General correspondence")
+        self.result: Optional[GeneratedEmail] = None
+        self.cached = False
+        self.prompt: Any = None
+        self.quota: Dict[str, Any] = {}
+        self.parser = StreamingEmailParser()
+        self.started = 0.0
+        self.first_token: Optional[float] = None
+
+        if not client.configured:
+            self.result = client._unconfigured(self.inputs)
+            return
+
+        # Fallback drafts are never cached, only real model output
+        self.cache_key = GenerationCache.make_key(
+            client.model_name,
+            provider=client.PROVIDER,
+            **dict(self.inputs, profile=self.inputs.get("profile") or {}),
+        )
+        if use_cache:
+            cached = client.cache.get(self.cache_key)
+            if cached is not None:
+                self.result, self.cached = cached, True
+                return
+
+        with default_metrics.span("prompt_build"):
+            self.prompt, prompt_text = client._build_prompt(self.inputs)
+        # Paced per provider and model, after the cache lookup so cache hits cost no quota
+        self.quota = {
+            "budget": f"llm:{client.PROVIDER}",
+            "account": client.model_name,
+            "tokens": estimate_tokens(prompt_text) + LLM_OUTPUT_TOKENS_ESTIMATE,
+        }
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None
+
+    def final(self) -> StreamedDraft:
+        return StreamedDraft.final(self.result, cached=self.cached)
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+
+    def feed(self, text: Optional[str]) -> bool:
+        if not text:
+            return False
+        if self.first_token is None:
+            self.first_token = time.perf_counter() - self.started
+        self.parser.feed(text)
+        return True
+
+    def partial(self) -> StreamedDraft:
+        return StreamedDraft(
+            subject=self.parser.subject,
+            body=self.parser.body,
+            time_to_first_token=self.first_token,
+            elapsed=time.perf_counter() - self.started,
+        )
+
+    def parse(self) -> GeneratedEmail:
+        return self.parser.finish(default_subject=f"Regarding: {self.inputs['purpose']}")
+
+    def fail(self, error: Exception) -> StreamedDraft:
+        default_metrics.increment("llm_failures")
+        self.result = self.client._failed(self.inputs, error)
+        return self.final()
+
+    def complete(self, generated: GeneratedEmail) -> StreamedDraft:
+        self.client.cache.put(self.cache_key, generated)
+        elapsed = time.perf_counter() - self.started
+        if self.first_token is not None:
+            default_metrics.observe("llm_ttft", self.first_token)
+        default_metrics.observe("llm_total", elapsed)
+        self.result = generated
+        return StreamedDraft.final(generated, time_to_first_token=self.first_token, elapsed=elapsed)
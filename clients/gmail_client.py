@@ -1,7 +1,10 @@
+import smtplib
 from typing import List, Optional
 
 from models.email_models import Attachment
+from .message_template import default_templates
 from .smtp_base import SmtpClient
+from .smtp_pool import Refused
 
 
 class GmailClient(SmtpClient):
@@ -16,7 +19,29 @@ class GmailClient(SmtpClient):
         subject: str,
         body: str,
         attachments: Optional[List[Attachment]] = None,
+        message_id: str = "",
     ) -> None:
-        message = self._build_message(sender_email, recipient_email, subject, body, attachments)
+        message = default_templates.render(sender_email, recipient_email, subject, body, attachments, message_id)
         # Gmail supports STARTTLS on 587
         self._send_starttls(self.HOST, self.PORT_TLS, sender_email, sender_password, message)
+
+    def broadcast(
+        self,
+        sender_email: str,
+        sender_password: str,
+        recipients: List[str],
+        subject: str,
+        body: str,
+        attachments: Optional[List[Attachment]] = None,
+        message_id: str = "",
+    ) -> Refused:
+        # Recipients go in the envelope only; the visible To is the sender, as for a Bcc announcement
+        message = default_templates.render(
+            sender_email, sender_email, subject, body, attachments, message_id, envelope=recipients
+        )
+        try:
+            refused = self._send_starttls(self.HOST, self.PORT_TLS, sender_email, sender_password, message)
+        except smtplib.SMTPRecipientsRefused as e:
+            # Nobody accepted: still report each address with its own reply
+            refused = e.recipients
+        return {address: refused[rcpt] for address, rcpt in zip(recipients, message.to_addrs) if rcpt in refused}
@@ -1,35 +1,77 @@
+import copy
 import os
-import json
-import textwrap
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator, List, Tuple
 
-from models.email_models import GeneratedEmail
+from models.email_models import GeneratedEmail, StreamedDraft
+from clients.prompts import default_builder
+from clients.generation_call import GenerationCall
 from config.app_config import GROQ_MODEL
+from core.generation_cache import GenerationCache, get_default_cache
+from core.rate_limiter import QuotaScheduler, get_default_scheduler
 
-try:
-    from groq import Groq  # type: ignore
-except Exception:
-    Groq = None
+# The groq SDK (and httpx/pydantic under it) is loaded by the first client that needs it
+Groq = None
+AsyncGroq = None
+_sdk_missing = False
+
+
+def _load_sdk() -> bool:
+    global Groq, AsyncGroq, _sdk_missing
+    if Groq is None and not _sdk_missing:
+        try:
+            from groq import Groq as sync_client, AsyncGroq as async_client  # type: ignore
+        except Exception:
+            _sdk_missing = True
+            return False
+        Groq, AsyncGroq = sync_client, async_client
+    return Groq is not None
 
 
 class GroqClient:
-    def __init__(self, api_key: str = "", model_name: str = GROQ_MODEL) -> None:
+    PROVIDER = "groq"
+    # Groq errors always propagate (there is no canned fallback draft)
+    raise_on_error = True
+
+    def __init__(
+        self,
+        api_key: str = "",
+        model_name: str = GROQ_MODEL,
+        cache: Optional[GenerationCache] = None,
+        scheduler: Optional[QuotaScheduler] = None,
+        base_url: str = "",
+    ) -> None:
         self.api_key = api_key or os.getenv("GROQ_API_KEY", "")
         self.model_name = model_name
+        # Another endpoint for the same API, e.g. the local stand-in in benchmarks/fake_llm.py
+        self.base_url = base_url or os.getenv("GROQ_BASE_URL", "")
+        self.cache = cache if cache is not None else get_default_cache()
+        self.prompts = default_builder
+        self.scheduler = scheduler or get_default_scheduler()
         self._client = None
+        self._async_client = None
         self._configured = False
         self._init_error: Optional[Exception] = None
         try:
-            if Groq is None:
+            if not _load_sdk():
                 raise ImportError("groq Python package not installed. Install with: pip install groq")
             if not self.api_key:
                 raise ValueError("GROQ_API_KEY is missing or empty. Add it to your .env and restart the app")
-            self._client = Groq(api_key=self.api_key)
+            self._client = Groq(api_key=self.api_key, base_url=self.base_url or None)
             self._configured = True
         except Exception as e:
             self._init_error = e
             self._configured = False
 
+    def with_model(self, model_name: str) -> "GroqClient":
+        # Shares the SDK client (and its HTTP connection pool) and the cache; only the model differs
+        clone = copy.copy(self)
+        clone.model_name = model_name
+        return clone
+
+    @property
+    def configured(self) -> bool:
+        return self._configured
+
     def _not_configured_message(self) -> str:
         if isinstance(self._init_error, ImportError):
             return str(self._init_error)
@@ -46,72 +88,101 @@ class GroqClient:
         additional_context: str = "",
         profile: Optional[Dict[str, Any]] = None,
         email_length: str = "Medium (3-4 paragraphs)",
+        use_cache: bool = True,
+    ) -> GeneratedEmail:
+        final = None
+        for final in self.generate_email_stream(
+            purpose=purpose,
+            recipient_name=recipient_name,
+            tone=tone,
+            language=language,
+            additional_context=additional_context,
+            profile=profile,
+            email_length=email_length,
+            use_cache=use_cache,
+        ):
+            pass
+        return final.email
+
+    def generate_email_stream(
+        self,
+        purpose: str,
+        recipient_name: str,
+        tone: str = "Professional",
+        language: str = "Turkish",
+        additional_context: str = "",
+        profile: Optional[Dict[str, Any]] = None,
+        email_length: str = "Medium (3-4 paragraphs)",
+        use_cache: bool = True,
+    ) -> Iterator[StreamedDraft]:
+        # Yields partial subject/body as tokens arrive; the last item has done=True and the final email
+        call = GenerationCall(self, self._inputs(locals()), use_cache)
+        if call.done:
+            yield call.final()
+            return
+
+        self.scheduler.acquire(**call.quota)
+        call.start()
+        try:
+            stream = self._client.chat.completions.create(
+                model=self.model_name,
+                messages=call.prompt,
+                temperature=0.7,
+                stream=True,
+            )
+            for chunk in stream:
+                if call.feed(chunk.choices[0].delta.content if chunk.choices else None):
+                    yield call.partial()
+        except Exception as e:
+            call.fail(e)
+        yield call.complete(call.parse())
+
+    async def agenerate_email(
+        self,
+        purpose: str,
+        recipient_name: str,
+        tone: str = "Professional",
+        language: str = "Turkish",
+        additional_context: str = "",
+        profile: Optional[Dict[str, Any]] = None,
+        email_length: str = "Medium (3-4 paragraphs)",
+        use_cache: bool = True,
     ) -> GeneratedEmail:
-        if not self._configured:
-            raise RuntimeError(self._not_configured_message())
-
-        if not purpose:
-            purpose = "General correspondence"
-
-        profile_text = ""
-        if profile:
-            # Flatten profile to readable lines
-            lines = []
-            for k, v in profile.items():
-                if v:
-                    lines.append(f"{k.capitalize()}: {v}")
-            profile_text = "\n".join(lines)
-
-        system_prompt = textwrap.dedent(
-            f"""
-            You are a professional email writing assistant. Create a well-structured, {tone.lower()} email in {language}.
-            TASK: Write a complete email using the inputs provided.
-            REQUIREMENTS:
-            - Address the purpose/topic
-            - If this appears to be a job application, write a compelling cover letter
-            - Personalize using the author's profile
-            - Follow the specified length: {email_length}
-            - For "Very Short": write only 1 concise paragraph but still include greeting and closing, make line breaks and also add the links
-
-            - Include greeting and closing
-            - Return ONLY JSON with keys subject, body.
-            """
-        ).strip()
-
-        user_prompt = textwrap.dedent(
-            f"""
-            PURPOSE/TOPIC: {purpose}
-            RECIPIENT: {recipient_name}
-            ADDITIONAL CONTEXT: {additional_context}
-            AUTHOR PROFILE:\n{profile_text}
-            """
-        ).strip()
+        # Same behaviour as generate_email, on the SDK's AsyncGroq client
+        call = GenerationCall(self, self._inputs(locals()), use_cache)
+        if call.done:
+            return call.result
 
+        await self.scheduler.acquire_async(**call.quota)
+        call.start()
         try:
-            chat = self._client.chat.completions.create(
+            if self._async_client is None:
+                if AsyncGroq is None:
+                    raise ImportError("groq Python package not installed. Install with: pip install groq")
+                self._async_client = AsyncGroq(api_key=self.api_key, base_url=self.base_url or None)
+            stream = await self._async_client.chat.completions.create(
                 model=self.model_name,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
+                messages=call.prompt,
                 temperature=0.7,
-                stream=False,
+                stream=True,
             )
-            text = chat.choices[0].message.content if chat and chat.choices else ""
-            match = None
-            try:
-                match = json.loads(text)
-            except Exception:
-                pass
-            if isinstance(match, dict):
-                subject = match.get("subject") or f"Regarding: {purpose}"
-                body = match.get("body") or text
-                return GeneratedEmail(subject=subject, body=(body or "").strip())
-            # Fallback heuristic
-            lines = [l.strip() for l in text.splitlines() if l.strip()]
-            subject = lines[0][:120] if lines else f"Regarding: {purpose}"
-            body = "\n".join(lines[1:]) if len(lines) > 1 else text
-            return GeneratedEmail(subject=subject, body=(body or "").strip())
+            async for chunk in stream:
+                call.feed(chunk.choices[0].delta.content if chunk.choices else None)
         except Exception as e:
-            # Surface upstream errors (e.g., 401, 404) for easier debugging in UI
-            raise RuntimeError(f"Groq generation failed: {e}")
+            call.fail(e)
+        return call.complete(call.parse()).email
+
+    @staticmethod
+    def _inputs(arguments: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in arguments.items() if k not in ("self", "use_cache")}
+
+    def _build_prompt(self, inputs: Dict[str, Any]) -> Tuple[List[Dict[str, str]], str]:
+        messages = self.prompts.chat_messages(**inputs)
+        return messages, "".join(m["content"] for m in messages)
+
+    def _unconfigured(self, inputs: Dict[str, Any]) -> GeneratedEmail:
+        raise RuntimeError(self._not_configured_message())
+
+    def _failed(self, inputs: Dict[str, Any], error: Exception) -> GeneratedEmail:
+        # Surface upstream errors (e.g., 401, 404) for easier debugging in UI
+        raise RuntimeError(f"Groq generation failed: {error}")
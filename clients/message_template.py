@@ -0,0 +1,225 @@
+import binascii
+import re
+import threading
+from collections import OrderedDict
+from email.header import Header
+from email.message import EmailMessage
+from email.policy import SMTPUTF8
+from email.headerregistry import Address
+from typing import Dict, List, Optional, Tuple
+
+from models.email_models import Attachment
+from config.app_config import MESSAGE_TEMPLATE_CACHE_BYTES, MESSAGE_TEMPLATE_CACHE_ENTRIES
+from core.metrics import default_metrics
+from .mime_stream import AttachmentEncoder, StreamingMessage, default_encoder, dot_stuff, new_boundary
+from .smtp_base import _split_email
+
+_POLICY = SMTPUTF8.clone(linesep="\r\n")
+_MAX_LINE = _POLICY.max_line_length
+# Values the email package would emit unchanged: plain ASCII, nothing to quote, encode or fold
+_SIMPLE_ADDRESS = re.compile(r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*@[A-Za-z0-9.-]+\Z")
+_SIMPLE_TEXT = re.compile(r"[!-~]+( [!-~]+)*\Z")
+_SIMPLE_ID = re.compile(r"<[!-;=?-~]+>\Z")
+_MIME_VERSION = b"MIME-Version: 1.0\r\n"
+# Rendered bodies other than the template's own kept per template, e.g. two campaigns from one sender
+_MAX_TEXTS = 8
+
+
+def _fold(name: str, value: str) -> bytes:
+    msg = EmailMessage(policy=_POLICY)
+    msg[name] = value
+    return b"".join(_POLICY.fold_binary(n, v) for n, v in msg.raw_items())
+
+
+def _line(name: str, value: str) -> bytes:
+    return f"{name}: {value}\r\n".encode("ascii")
+
+
+def _address_line(name: str, email_addr: str) -> bytes:
+    if len(name) + len(email_addr) + 2 <= _MAX_LINE and _SIMPLE_ADDRESS.match(email_addr):
+        return _line(name, email_addr)
+    local, domain = _split_email(email_addr)
+    return _fold(name, str(Address(username=local, domain=domain)) if domain else email_addr)
+
+
+def _subject_line(subject: str) -> bytes:
+    if len(subject) + 9 <= _MAX_LINE and "=?" not in subject and _SIMPLE_TEXT.match(subject):
+        return _line("Subject", subject)
+    return _fold("Subject", str(Header(subject or "", "utf-8")))
+
+
+def _message_id_line(message_id: str) -> bytes:
+    if not message_id:
+        return b""
+    if len(message_id) + 12 <= _MAX_LINE and _SIMPLE_ID.match(message_id):
+        return _line("Message-ID", message_id)
+    return _fold("Message-ID", message_id)
+
+
+def _envelope(email_addr: str) -> str:
+    local, domain = _split_email(email_addr)
+    return f"{local}@{domain}" if domain else local
+
+
+def _text_body(body: str) -> Tuple[str, bytes]:
+    # Same choice as email.contentmanager for short lines (7bit/8bit); longer lines get quoted-printable
+    # from binascii instead of the pure-Python encoder. Returns (cte, CRLF payload)
+    lines = (body or "").encode("utf-8").splitlines()
+    payload = b"\r\n".join(lines) + b"\r\n"
+    if max((len(line) for line in lines), default=0) <= _MAX_LINE:
+        return ("7bit" if payload.isascii() else "8bit"), payload
+    return "quoted-printable", binascii.b2a_qp(payload, istext=True)
+
+
+class MessageTemplate:
+    # Bulk-send builder. Everything a campaign shares (From, encoded attachment parts, boundary, and the
+    # Subject and text part while they match the template) is rendered once; render() only encodes the
+    # recipient-specific headers and any subject or body that differs. Values needing encoded words or
+    # folding still go through the email package.
+    def __init__(
+        self,
+        sender_email: str,
+        subject: str = "",
+        body: str = "",
+        attachments: Optional[List[Attachment]] = None,
+        encoder: Optional[AttachmentEncoder] = None,
+    ) -> None:
+        self.sender_email = sender_email
+        self.subject = subject
+        self.body = body
+        self.attachments = attachments
+        self._from_addr = _envelope(sender_email)
+        self._from_line = _address_line("From", sender_email)
+        self._subject_line = _subject_line(subject)
+        self._subjects: Dict[str, bytes] = {}
+        self._texts: "OrderedDict[str, Tuple[bytes, bytes]]" = OrderedDict()
+        # Templates are shared by the send threads
+        self._texts_lock = threading.Lock()
+        self.parts = [(encoder or default_encoder).encode(att) for att in attachments or []]
+        # Encoded bytes this template keeps alive, including spooled parts the encoder has since evicted
+        self.size = sum(memoryview(part.body).nbytes for part in self.parts)
+        if self.parts:
+            boundary = new_boundary()
+            self.boundary = boundary.encode("ascii")
+            self._tail = _MIME_VERSION + _fold("Content-Type", f'multipart/mixed; boundary="{boundary}"') + b"\r\n"
+        else:
+            self.boundary = b""
+            self._tail = b""
+        self._text = self._render_text(body)
+
+    def _render_text(self, body: str) -> Tuple[bytes, bytes]:
+        # (headers that end the message head or start the text part, dot-stuffed payload)
+        cte, payload = _text_body(body)
+        headers = b'Content-Type: text/plain; charset="utf-8"\r\n' + _line("Content-Transfer-Encoding", cte)
+        if not self.parts:
+            headers += _MIME_VERSION
+        return headers + b"\r\n", dot_stuff(payload)
+
+    def _subject(self, subject: str) -> bytes:
+        if subject == self.subject:
+            return self._subject_line
+        line = self._subjects.get(subject)
+        if line is None:
+            if len(self._subjects) >= 1024:
+                self._subjects.clear()
+            line = self._subjects[subject] = _subject_line(subject)
+        return line
+
+    def _text_for(self, body: str) -> Tuple[bytes, bytes]:
+        if body == self.body:
+            return self._text
+        with self._texts_lock:
+            text = self._texts.get(body)
+            if text is not None:
+                self._texts.move_to_end(body)
+                return text
+        # Mail merge gives every recipient a different body; those just cycle through the small LRU
+        text = self._render_text(body)
+        with self._texts_lock:
+            self._texts[body] = text
+            if len(self._texts) > _MAX_TEXTS:
+                self._texts.popitem(last=False)
+        return text
+
+    def render(
+        self,
+        recipient_email: str,
+        subject: Optional[str] = None,
+        body: Optional[str] = None,
+        message_id: str = "",
+        envelope: Optional[List[str]] = None,
+    ) -> StreamingMessage:
+        # `envelope` sends one copy to many recipients (Bcc-style); they are not listed in the headers
+        subject_line = self._subject_line if subject is None else self._subject(subject)
+        text_headers, text = self._text if body is None else self._text_for(body)
+        head = self._from_line + _address_line("To", recipient_email) + subject_line + _message_id_line(message_id)
+        to_addrs = [_envelope(address) for address in envelope or [recipient_email]]
+        if not self.parts:
+            return StreamingMessage(self._from_addr, to_addrs, head + text_headers + text)
+        return StreamingMessage(
+            self._from_addr, to_addrs, head + self._tail, text_headers + text, self.parts, self.boundary
+        )
+
+
+class TemplateCache:
+    # Templates by sender and attachments, so consecutive sends of one campaign share the pre-rendered
+    # parts without callers having to manage templates themselves. Subject and body are per-render
+    # overrides: a mail merge with a different text per recipient still reuses one template. Bounded by
+    # entry count and by the encoded attachment bytes the cached templates hold on to
+    def __init__(
+        self,
+        max_entries: int = MESSAGE_TEMPLATE_CACHE_ENTRIES,
+        max_bytes: int = MESSAGE_TEMPLATE_CACHE_BYTES,
+    ) -> None:
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes
+        self._templates: "OrderedDict[tuple, MessageTemplate]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        sender_email: str,
+        attachments: Optional[List[Attachment]] = None,
+        subject: str = "",
+        body: str = "",
+    ) -> MessageTemplate:
+        # Same keys as the attachment encoder: a changed file gets a new template. The template holds the
+        # attachments, so buffer ids stay unique while it is cached. subject/body only seed a new template
+        key = (sender_email, tuple(AttachmentEncoder._key(att) for att in attachments or []))
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                return template
+        template = MessageTemplate(sender_email, subject, body, attachments)
+        with self._lock:
+            previous = self._templates.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._templates[key] = template
+            self._bytes += template.size
+            # The newest template always stays, however large
+            while len(self._templates) > 1 and (
+                len(self._templates) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                _, evicted = self._templates.popitem(last=False)
+                self._bytes -= evicted.size
+        return template
+
+    def render(
+        self,
+        sender_email: str,
+        recipient_email: str,
+        subject: str,
+        body: str,
+        attachments: Optional[List[Attachment]] = None,
+        message_id: str = "",
+        envelope: Optional[List[str]] = None,
+    ) -> StreamingMessage:
+        with default_metrics.span("mime_build"):
+            template = self.get(sender_email, attachments, subject, body)
+            return template.render(recipient_email, subject, body, message_id, envelope)
+
+
+default_templates = TemplateCache()
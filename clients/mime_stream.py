@@ -0,0 +1,190 @@
+import base64
+import mmap
+import os
+import secrets
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.message import EmailMessage, MIMEPart
+from email.policy import SMTPUTF8
+from email.utils import getaddresses
+from typing import Iterator, List, Optional, Tuple, Union
+
+from models.email_models import Attachment
+from config.app_config import ATTACHMENT_CACHE_ENTRIES, ATTACHMENT_SPOOL_THRESHOLD
+from .async_smtp import message_bytes
+
+Buffer = Union[bytes, memoryview]
+
+_POLICY = SMTPUTF8.clone(linesep="\r\n")
+# base64 wraps at 76 output columns, i.e. 57 input bytes; reading multiples of 57 keeps every line full
+_ENCODE_CHUNK = 57 * 16384
+
+
+@dataclass
+class EncodedAttachment:
+    headers: bytes  # part headers including the blank separator line
+    body: Buffer  # CRLF-wrapped base64, ends with CRLF
+    size: int  # size of the raw attachment
+
+
+def _part_headers(att: Attachment) -> bytes:
+    maintype, subtype = (att.mime_type.split("/", 1) if "/" in att.mime_type else ("application", "octet-stream"))
+    part = MIMEPart(policy=_POLICY)
+    part["Content-Type"] = f"{maintype}/{subtype}"
+    part["Content-Transfer-Encoding"] = "base64"
+    # RFC2231-encoded filename for non-ASCII
+    part.add_header("Content-Disposition", "attachment", filename=("utf-8", "", att.filename))
+    return b"".join(_POLICY.fold_binary(name, value) for name, value in part.raw_items()) + b"\r\n"
+
+
+def _source_chunks(att: Attachment, size: int) -> Iterator[Buffer]:
+    if att.path:
+        with open(att.path, "rb") as f:
+            while True:
+                chunk = f.read(_ENCODE_CHUNK)
+                if not chunk:
+                    return
+                yield chunk
+    view = memoryview(att.content).cast("B")
+    for start in range(0, size, _ENCODE_CHUNK):
+        yield view[start:start + _ENCODE_CHUNK]
+
+
+def new_boundary() -> str:
+    return "===============" + secrets.token_hex(16) + "=="
+
+
+def dot_stuff(raw: bytes) -> bytes:
+    # For a piece that starts at the beginning of a line inside DATA
+    raw = raw.replace(b"\r\n.", b"\r\n..")
+    return b"." + raw if raw.startswith(b".") else raw
+
+
+def _encode(chunk: Buffer) -> bytes:
+    return base64.encodebytes(chunk).replace(b"\n", b"\r\n")
+
+
+class AttachmentEncoder:
+    # LRU of encoded attachments so a broadcast encodes each file once. File-backed attachments are keyed by
+    # (path, mtime, size) and in-memory ones by buffer identity; entries keep the buffer alive so an id is
+    # never reused while it is cached. Large encodings live in an anonymous temp file mapped read-only.
+    def __init__(
+        self,
+        max_entries: int = ATTACHMENT_CACHE_ENTRIES,
+        spool_threshold: int = ATTACHMENT_SPOOL_THRESHOLD,
+    ) -> None:
+        self.max_entries = max(1, max_entries)
+        self.spool_threshold = spool_threshold
+        self._entries: "OrderedDict[tuple, Tuple[object, EncodedAttachment]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(att: Attachment) -> tuple:
+        if att.path:
+            stat = os.stat(att.path)
+            return ("path", os.path.abspath(att.path), stat.st_mtime_ns, stat.st_size, att.filename, att.mime_type)
+        return ("buffer", id(att.content), memoryview(att.content).nbytes, att.filename, att.mime_type)
+
+    def encode(self, att: Attachment) -> EncodedAttachment:
+        key = self._key(att)
+        # Encoding under the lock means concurrent senders of the same file wait for one encoder
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            encoded = self._encode_attachment(att, key[3] if att.path else key[2])
+            self._entries[key] = (att.content, encoded)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return encoded
+
+    def _encode_attachment(self, att: Attachment, size: int) -> EncodedAttachment:
+        headers = _part_headers(att)
+        if size <= self.spool_threshold:
+            return EncodedAttachment(headers=headers, body=_encode(att.data()), size=size)
+        with tempfile.TemporaryFile(prefix="attachment-") as spool:
+            for chunk in _source_chunks(att, size):
+                spool.write(_encode(chunk))
+            spool.flush()
+            # The mapping holds its own reference to the file, so the temp file can be closed (and is gone on exit)
+            mapped = mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ)
+        return EncodedAttachment(headers=headers, body=memoryview(mapped), size=size)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+default_encoder = AttachmentEncoder()
+
+
+class StreamingMessage:
+    # DATA payload (CRLF line endings, dot-stuffed) produced piece by piece: the head and text part are
+    # per message, attachment bodies are the encoder's shared buffers and are never copied
+    def __init__(
+        self,
+        from_addr: str,
+        to_addrs: List[str],
+        head: bytes,
+        text: bytes = b"",
+        parts: Optional[List[EncodedAttachment]] = None,
+        boundary: bytes = b"",
+    ) -> None:
+        self.from_addr = from_addr
+        self.to_addrs = to_addrs
+        self.head = head
+        self.text = text
+        self.parts = parts or []
+        self.boundary = boundary
+
+    @classmethod
+    def build(
+        cls,
+        headers: EmailMessage,
+        body: str,
+        attachments: Optional[List[Attachment]] = None,
+        encoder: Optional[AttachmentEncoder] = None,
+    ) -> "StreamingMessage":
+        encoder = encoder or default_encoder
+        from_addr = next((a for _, a in getaddresses([str(headers["From"])]) if a), "")
+        to_addrs = [a for _, a in getaddresses([str(headers["To"])]) if a]
+        parts = [encoder.encode(att) for att in attachments or []]
+        if not parts:
+            headers.set_content(body or "", subtype="plain", charset="utf-8")
+            return cls(from_addr, to_addrs, message_bytes(headers))
+        boundary = new_boundary()
+        headers["MIME-Version"] = "1.0"
+        headers["Content-Type"] = f'multipart/mixed; boundary="{boundary}"'
+        head = b"".join(_POLICY.fold_binary(name, value) for name, value in headers.raw_items()) + b"\r\n"
+        text = MIMEPart(policy=_POLICY)
+        text.set_content(body or "", subtype="plain", charset="utf-8")
+        return cls(from_addr, to_addrs, head, dot_stuff(text.as_bytes(policy=_POLICY)), parts, boundary.encode("ascii"))
+
+    @property
+    def size(self) -> int:
+        if not self.parts:
+            return len(self.head)
+        delimiter = len(self.boundary) + 6
+        total = len(self.head) + delimiter - 2 + len(self.text)
+        total += sum(delimiter + len(p.headers) + len(p.body) for p in self.parts)
+        return total + delimiter + 2
+
+    def chunks(self) -> Iterator[Buffer]:
+        yield self.head
+        if not self.parts:
+            return
+        yield b"--" + self.boundary + b"\r\n" + self.text
+        for part in self.parts:
+            yield b"\r\n--" + self.boundary + b"\r\n" + part.headers
+            yield part.body
+        yield b"\r\n--" + self.boundary + b"--\r\n"
+
+    def as_bytes(self) -> bytes:
+        return b"".join(self.chunks())
@@ -0,0 +1,175 @@
+import re
+import textwrap
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+_SLOT = re.compile(r"\{\{|\}\}|\{(\w+)\}")
+
+# Profile fields in the order they are presented to the model
+PROFILE_FIELDS: Tuple[Tuple[str, str], ...] = (
+    ("name", "Name"),
+    ("title", "Title"),
+    ("company", "Company"),
+    ("experience", "Experience"),
+    ("location", "Location"),
+    ("phone", "Phone"),
+    ("email", "Email"),
+    ("website", "Website"),
+    ("linkedin", "LinkedIn"),
+    ("github", "GitHub"),
+    ("skills", "Skills"),
+    ("summary", "Summary"),
+    ("achievements", "Achievements"),
+)
+_PROFILE_LABELS = dict(PROFILE_FIELDS)
+
+
+class PromptTemplate:
+    # Dedented and split into literal/slot segments once; render() only joins strings.
+    # Slots are written as {name}; literal braces as {{ and }}.
+    def __init__(self, source: str) -> None:
+        self.source = textwrap.dedent(source).strip()
+        self._segments: List[Tuple[bool, str]] = []
+        literal: List[str] = []
+        pos = 0
+        for match in _SLOT.finditer(self.source):
+            literal.append(self.source[pos:match.start()])
+            token = match.group(0)
+            if match.group(1) is None:
+                literal.append(token[0])
+            else:
+                self._segments.append((False, "".join(literal)))
+                self._segments.append((True, match.group(1)))
+                literal = []
+            pos = match.end()
+        literal.append(self.source[pos:])
+        self._segments.append((False, "".join(literal)))
+        self.slots = tuple(value for is_slot, value in self._segments if is_slot)
+
+    def render(self, values: Dict[str, Any]) -> str:
+        return "".join(str(values[value]) if is_slot else value for is_slot, value in self._segments)
+
+
+@lru_cache(maxsize=64)
+def _render_profile_items(items: Tuple[Tuple[str, str], ...]) -> str:
+    present = dict(items)
+    lines = [f"{label}: {present[key]}" for key, label in PROFILE_FIELDS if present.get(key)]
+    # Fields outside the standard profile form are kept, after the known ones
+    lines += [
+        f"{key.replace('_', ' ').capitalize()}: {value}"
+        for key, value in items
+        if key not in _PROFILE_LABELS and value
+    ]
+    return "\n".join(lines)
+
+
+def render_profile(profile: Optional[Dict[str, Any]]) -> str:
+    # Memoized per distinct profile content, so a batch with one profile renders it once
+    if not profile:
+        return ""
+    return _render_profile_items(tuple((str(k), str(v)) for k, v in profile.items() if v))
+
+
+SINGLE_PROMPT = PromptTemplate(
+    """
+    You are a professional email writing assistant. Create a well-structured, {tone_lower} email in {language}.
+
+    TASK: Write a complete email based on the following information:
+
+    PURPOSE/TOPIC: {purpose}
+    RECIPIENT: {recipient_name}
+    ADDITIONAL CONTEXT: {additional_context}
+    AUTHOR PROFILE: {profile_text}
+    EMAIL LENGTH: {email_length}
+
+    REQUIREMENTS:
+    - Write a professional email that addresses the purpose/topic
+    - If this appears to be a job application, write a compelling cover letter
+    - Use the author profile to personalize the email appropriately
+    - Keep the tone {tone_lower} and language {language}
+    - Make it engaging and relevant to the recipient
+    - Include proper greeting and closing
+    - Follow the specified email length: {email_length}
+    - For "Very Short": write only 1 concise paragraph but still include greeting and closing
+    - Do NOT repeat the instructions or context verbatim
+    - Use the profile information naturally in the email content
+
+    Return ONLY a JSON object with these exact keys:
+    {{
+        "subject": "Clear, professional subject line",
+        "body": "Complete email body with proper formatting"
+    }}
+    """
+)
+
+CHAT_SYSTEM_PROMPT = PromptTemplate(
+    """
+    You are a professional email writing assistant. Create a well-structured, {tone_lower} email in {language}.
+    TASK: Write a complete email using the inputs provided.
+    REQUIREMENTS:
+    - Address the purpose/topic
+    - If this appears to be a job application, write a compelling cover letter
+    - Personalize using the author's profile
+    - Follow the specified length: {email_length}
+    - For "Very Short": write only 1 concise paragraph but still include greeting and closing, make line breaks and also add the links
+
+    - Include greeting and closing
+    - Return ONLY JSON with keys subject, body.
+    """
+)
+
+CHAT_USER_PROMPT = PromptTemplate(
+    """
+    PURPOSE/TOPIC: {purpose}
+    RECIPIENT: {recipient_name}
+    ADDITIONAL CONTEXT: {additional_context}
+    AUTHOR PROFILE:
+    {profile_text}
+    """
+)
+
+
+class PromptBuilder:
+    # Shared by GeminiClient (single prompt) and GroqClient (system + user chat messages)
+    def __init__(
+        self,
+        single: PromptTemplate = SINGLE_PROMPT,
+        system: PromptTemplate = CHAT_SYSTEM_PROMPT,
+        user: PromptTemplate = CHAT_USER_PROMPT,
+    ) -> None:
+        self.single = single
+        self.system = system
+        self.user = user
+
+    @staticmethod
+    def slots(
+        purpose: str,
+        recipient_name: str,
+        tone: str,
+        language: str,
+        additional_context: str,
+        profile: Optional[Dict[str, Any]],
+        email_length: str,
+    ) -> Dict[str, str]:
+        return {
+            "purpose": purpose,
+            "recipient_name": recipient_name,
+            "tone_lower": tone.lower(),
+            "language": language,
+            "additional_context": additional_context,
+            "profile_text": render_profile(profile),
+            "email_length": email_length,
+        }
+
+    def single_prompt(self, **inputs: Any) -> str:
+        return self.single.render(self.slots(**inputs))
+
+    def chat_messages(self, **inputs: Any) -> List[Dict[str, str]]:
+        values = self.slots(**inputs)
+        return [
+            {"role": "system", "content": self.system.render(values)},
+            {"role": "user", "content": self.user.render(values)},
+        ]
+
+
+default_builder = PromptBuilder()
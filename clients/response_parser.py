@@ -0,0 +1,311 @@
+import ast
+import json
+import re
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from models.email_models import GeneratedEmail
+from core.metrics import default_metrics
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_CLOSERS = {"{": "}", "[": "]"}
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_WHITESPACE = " \t\r\n"
+_STRING_RUN = re.compile(r'[^"\\]+')
+_INERT_RUN = re.compile(r"[^{}\[\]\",:]+")
+_SURROGATES = re.compile("[\ud800-\udfff]")
+_DECODER = json.JSONDecoder(strict=False)
+
+
+class StreamingEmailParser:
+    # Scans model output chunk by chunk in a single pass. It locates the first balanced JSON object
+    # (skipping prose, code fences and stray braces), and exposes top-level string fields such as
+    # subject/body while they are still arriving. finish() repairs truncated or slightly malformed
+    # objects before falling back to plain-text heuristics.
+    def __init__(self) -> None:
+        self.parse_time = 0.0  # seconds spent in feed() and finish(), reported once per response
+        self._text = ""
+        self._scan_pos = 0
+        self._object: Optional[Dict[str, Any]] = None
+        self._reset(-1)
+
+    def _reset(self, start: int) -> None:
+        self._object_start = start
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._unicode: Optional[str] = None
+        self._high_surrogate: Optional[int] = None
+        self._expect_key = False
+        self._opened = False
+        self._key_chars: Optional[List[str]] = None
+        self._current_key: Optional[str] = None
+        self._value_key: Optional[str] = None
+        self._last_comma = -1
+        self._fields: Dict[str, List[str]] = {}
+        self._completed: Set[str] = set()
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    @property
+    def complete(self) -> bool:
+        return self._object is not None
+
+    def field(self, name: str) -> str:
+        if name not in self._fields and self._object is not None:
+            # Decoded in one go, so nothing was streamed field by field
+            value = self._object.get(name)
+            return value if isinstance(value, str) else ""
+        return "".join(self._fields.get(name, ()))
+
+    def field_complete(self, name: str) -> bool:
+        if name not in self._fields and self._object is not None:
+            return isinstance(self._object.get(name), str)
+        return name in self._completed
+
+    @property
+    def subject(self) -> str:
+        return self.field("subject")
+
+    @property
+    def body(self) -> str:
+        return self.field("body")
+
+    def _emit(self, ch: str) -> None:
+        if self._key_chars is not None:
+            self._key_chars.append(ch)
+        elif self._value_key is not None:
+            self._fields[self._value_key].append(ch)
+
+    def _emit_codepoint(self, code: int) -> None:
+        if 0xD800 <= code < 0xDC00:
+            self._high_surrogate = code
+            return
+        if 0xDC00 <= code < 0xE000:
+            # A low surrogate only means something right after a high one; alone it is not encodable
+            if self._high_surrogate is None:
+                return
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        self._emit(chr(code))
+
+    def _string_char(self, ch: str) -> None:
+        if self._unicode is not None:
+            self._unicode += ch
+            if len(self._unicode) == 4:
+                try:
+                    self._emit_codepoint(int(self._unicode, 16))
+                except ValueError:
+                    pass
+                self._unicode = None
+        elif self._escape:
+            self._escape = False
+            if ch == "u":
+                self._unicode = ""
+            else:
+                self._emit(_ESCAPES.get(ch, ch))
+        elif ch == "\\":
+            self._escape = True
+        elif ch == '"':
+            self._in_string = False
+            if self._key_chars is not None:
+                self._current_key = "".join(self._key_chars).strip().lower()
+                self._key_chars = None
+            elif self._value_key is not None:
+                self._completed.add(self._value_key)
+                self._value_key = None
+                self._current_key = None
+        else:
+            self._emit(ch)
+
+    def feed(self, chunk: str) -> None:
+        if not chunk:
+            return
+        started = time.perf_counter()
+        self._text += chunk
+        if not self.complete:
+            self._scan()
+        self.parse_time += time.perf_counter() - started
+
+    def _scan(self) -> None:
+        text = self._text
+        pos = self._scan_pos
+        end = len(text)
+        while pos < end:
+            # Runs of plain string characters and of non-structural characters are consumed with a
+            # single regex match instead of one loop iteration per character
+            if self._in_string:
+                if not self._escape and self._unicode is None:
+                    match = _STRING_RUN.match(text, pos)
+                    if match:
+                        self._emit(match.group())
+                        pos = match.end()
+                        continue
+                    if text[pos] == "\\" and pos + 1 < end and text[pos + 1] in _ESCAPES:
+                        self._emit(_ESCAPES[text[pos + 1]])
+                        pos += 2
+                        continue
+                self._string_char(text[pos])
+                pos += 1
+                continue
+            if not self._stack:
+                pos = text.find("{", pos)
+                if pos < 0:
+                    pos = end
+                    break
+                # Well-formed output decodes in one C-level call; anything else is scanned below
+                candidate = _decode_at(text, pos)
+                if candidate is not None:
+                    self._object = candidate
+                    self._scan_pos = end
+                    return
+                self._reset(pos)
+                self._stack.append("{")
+                self._expect_key = True
+                self._opened = True
+                pos += 1
+                continue
+            if not self._opened:
+                match = _INERT_RUN.match(text, pos)
+                if match:
+                    pos = match.end()
+                    continue
+            ch = text[pos]
+            pos += 1
+            if self._opened and ch not in _WHITESPACE:
+                self._opened = False
+                if ch not in '"}\'':
+                    # "{" followed by something that is not a key: prose such as "use {name} here".
+                    # Restart the search just after the false opening brace.
+                    pos = self._object_start + 1
+                    self._reset(-1)
+                    continue
+            depth = len(self._stack)
+            if ch == '"':
+                self._in_string = True
+                if depth == 1 and self._expect_key:
+                    self._key_chars = []
+                elif depth == 1 and self._current_key is not None:
+                    self._value_key = self._current_key
+                    self._fields[self._value_key] = []
+            elif depth == 1 and ch == ":":
+                self._expect_key = False
+            elif depth == 1 and ch == ",":
+                self._last_comma = pos - 1
+                self._expect_key = True
+                self._current_key = None
+            elif ch in "{[":
+                self._stack.append(ch)
+            elif ch in "}]":
+                self._stack.pop()
+                if not self._stack:
+                    candidate = _loads(text[self._object_start:pos])
+                    if candidate is not None:
+                        self._object = candidate
+                        self._scan_pos = pos
+                        return
+                    # Balanced but not a usable object: keep looking after it
+                    self._reset(-1)
+        self._scan_pos = pos
+
+    def _repair_truncated(self) -> Optional[Dict[str, Any]]:
+        # Close whatever the stream left open: a string, an escape, nested objects/arrays
+        if self._object_start < 0 or not self._stack:
+            return None
+        fragment = self._text[self._object_start:]
+        if self._in_string:
+            if self._escape:
+                fragment = fragment[:-1]
+            if self._unicode is not None:
+                fragment = fragment[: len(fragment) - len(self._unicode) - 2]
+            fragment += '"'
+        fragment = fragment.rstrip().rstrip(",")
+        fragment += "".join(_CLOSERS[c] for c in reversed(self._stack))
+        data = _loads(fragment)
+        if data is None and self._last_comma > self._object_start:
+            # Cut inside a key or right after a colon: drop the unfinished member
+            data = _loads(self._text[self._object_start:self._last_comma] + "}")
+        return data
+
+    def parsed(self) -> Optional[Dict[str, Any]]:
+        if self._object is not None:
+            return self._object
+        return self._repair_truncated()
+
+    def finish(self, default_subject: str) -> GeneratedEmail:
+        started = time.perf_counter()
+        email = self._finish(default_subject)
+        self.parse_time += time.perf_counter() - started
+        default_metrics.observe("response_parse", self.parse_time)
+        return email
+
+    def _finish(self, default_subject: str) -> GeneratedEmail:
+        data = self.parsed()
+        if data is not None:
+            fields = _email_fields(data)
+            if fields is not None:
+                subject = fields.get("subject") or default_subject
+                body = fields.get("body") or ""
+                return GeneratedEmail(subject=_as_text(subject).strip(), body=_as_text(body).strip())
+        # Truncated beyond repair, but the fields streamed so far are still the best answer
+        if self.subject or self.body:
+            subject = _as_text(self.subject).strip()
+            return GeneratedEmail(subject=subject or default_subject, body=_as_text(self.body).strip())
+        full_text = _strip_fences(self._text)
+        lines = [l.strip() for l in full_text.splitlines() if l.strip()]
+        subject = lines[0][:120] if lines else default_subject
+        body = "\n".join(lines[1:]) if len(lines) > 1 else full_text
+        return GeneratedEmail(subject=subject, body=body.strip())
+
+
+def _loads(fragment: str) -> Optional[Dict[str, Any]]:
+    # strict=False accepts raw newlines inside strings, which models emit all the time
+    for attempt in (fragment, _TRAILING_COMMA.sub(r"\1", fragment)):
+        try:
+            data = json.loads(attempt, strict=False)
+        except ValueError:
+            continue
+        return data if isinstance(data, dict) else None
+    try:
+        # Python-style dicts with single quotes
+        data = ast.literal_eval(fragment)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        # TypeError: an unhashable key such as {[1]: 2}
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _decode_at(text: str, pos: int) -> Optional[Dict[str, Any]]:
+    # The JSON object starting at pos, ignoring whatever follows it; None if it is not valid (yet)
+    try:
+        data = _DECODER.raw_decode(text, pos)[0]
+    except (ValueError, RecursionError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _email_fields(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    lowered = {str(k).strip().lower(): v for k, v in data.items()}
+    if "subject" in lowered or "body" in lowered:
+        return lowered
+    # Wrapped one level deep, e.g. {"email": {"subject": ..., "body": ...}}
+    for value in lowered.values():
+        if isinstance(value, dict):
+            nested = _email_fields(value)
+            if nested is not None:
+                return nested
+    return None
+
+
+def _as_text(value: Any) -> str:
+    if isinstance(value, list):
+        return "\n\n".join(_as_text(v) for v in value)
+    # json.loads and the stream both let lone surrogates ("\ud83d" cut from its pair) through; they
+    # cannot be encoded, so drop them here rather than fail when the email is sent
+    return "" if value is None else _SURROGATES.sub("", str(value))
+
+
+def _strip_fences(text: str) -> str:
+    return "\n".join(l for l in text.splitlines() if not l.strip().startswith("```"))
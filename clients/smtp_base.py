@@ -1,5 +1,3 @@
-import smtplib
-import ssl
 from abc import ABC, abstractmethod
 from email.message import EmailMessage
 from email.header import Header
@@ -8,6 +6,8 @@ from email.headerregistry import Address
 from typing import List, Optional, Tuple
 
 from models.email_models import Attachment
+from .mime_stream import AttachmentEncoder, StreamingMessage
+from .smtp_pool import Refused, SmtpConnectionPool, default_pool
 
 
 def _split_email(email_addr: str) -> Tuple[str, str]:
@@ -22,6 +22,10 @@ def _split_email(email_addr: str) -> Tuple[str, str]:
 
 
 class SmtpClient(ABC):
+    def __init__(self, pool: Optional[SmtpConnectionPool] = None) -> None:
+        # Sessions are shared process-wide unless a dedicated pool is injected
+        self.pool = pool or default_pool
+
     @abstractmethod
     def send(
         self,
@@ -31,17 +35,26 @@ class SmtpClient(ABC):
         subject: str,
         body: str,
         attachments: Optional[List[Attachment]] = None,
+        message_id: str = "",
     ) -> None:
         raise NotImplementedError
 
-    @staticmethod
-    def _build_message(
+    @abstractmethod
+    def broadcast(
+        self,
         sender_email: str,
-        recipient_email: str,
+        sender_password: str,
+        recipients: List[str],
         subject: str,
         body: str,
         attachments: Optional[List[Attachment]] = None,
-    ) -> EmailMessage:
+        message_id: str = "",
+    ) -> Refused:
+        # One transaction for all recipients; returns the refused ones keyed as given
+        raise NotImplementedError
+
+    @staticmethod
+    def _build_headers(sender_email: str, recipient_email: str, subject: str, message_id: str = "") -> EmailMessage:
         msg = EmailMessage(policy=SMTPUTF8)
         # RFC-compliant addresses (IDNA domain)
         s_local, s_domain = _split_email(sender_email)
@@ -50,6 +63,21 @@ class SmtpClient(ABC):
         msg["To"] = str(Address(username=r_local, domain=r_domain)) if r_domain else recipient_email
         # Encode subject safely for non-ASCII (cast Header to str)
         msg["Subject"] = str(Header(subject or "", "utf-8"))
+        # A stable Message-ID lets a retried send be recognised as the same message
+        if message_id:
+            msg["Message-ID"] = message_id
+        return msg
+
+    @staticmethod
+    def _build_message(
+        sender_email: str,
+        recipient_email: str,
+        subject: str,
+        body: str,
+        attachments: Optional[List[Attachment]] = None,
+        message_id: str = "",
+    ) -> EmailMessage:
+        msg = SmtpClient._build_headers(sender_email, recipient_email, subject, message_id)
         # UTF-8 body
         msg.set_content(body or "", subtype="plain", charset="utf-8")
         if attachments:
@@ -57,24 +85,29 @@ class SmtpClient(ABC):
                 maintype, subtype = (att.mime_type.split("/", 1) if "/" in att.mime_type else ("application", "octet-stream"))
                 # RFC2231-encoded filename for non-ASCII
                 filename_param = ("utf-8", "", att.filename)
-                msg.add_attachment(att.content, maintype=maintype, subtype=subtype, filename=filename_param)
+                msg.add_attachment(att.data(), maintype=maintype, subtype=subtype, filename=filename_param)
         return msg
 
     @staticmethod
-    def _send_starttls(host: str, port: int, username: str, password: str, message: EmailMessage) -> None:
-        context = ssl.create_default_context()
-        with smtplib.SMTP(host, port) as server:
-            server.ehlo()
-            server.starttls(context=context)
-            server.ehlo()
-            server.login(username, password)
-            mail_opts = ["SMTPUTF8"] if server.has_extn("smtputf8") else []
-            server.send_message(message, mail_options=mail_opts)
+    def _build_stream(
+        sender_email: str,
+        recipient_email: str,
+        subject: str,
+        body: str,
+        attachments: Optional[List[Attachment]] = None,
+        message_id: str = "",
+        encoder: Optional[AttachmentEncoder] = None,
+    ) -> StreamingMessage:
+        # Same message as _build_message, but attachments are encoded once and streamed from shared buffers
+        headers = SmtpClient._build_headers(sender_email, recipient_email, subject, message_id)
+        return StreamingMessage.build(headers, body, attachments, encoder=encoder)
 
-    @staticmethod
-    def _send_ssl(host: str, port: int, username: str, password: str, message: EmailMessage) -> None:
-        context = ssl.create_default_context()
-        with smtplib.SMTP_SSL(host, port, context=context) as server:
-            server.login(username, password)
-            mail_opts = ["SMTPUTF8"] if server.has_extn("smtputf8") else []
-            server.send_message(message, mail_options=mail_opts)
+    def _send_starttls(
+        self, host: str, port: int, username: str, password: str, message: StreamingMessage
+    ) -> Refused:
+        return self.pool.send(host, port, username, password, message, security="starttls")
+
+    def _send_ssl(
+        self, host: str, port: int, username: str, password: str, message: StreamingMessage
+    ) -> Refused:
+        return self.pool.send(host, port, username, password, message, security="ssl")
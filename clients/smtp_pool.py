@@ -0,0 +1,301 @@
+import atexit
+import smtplib
+import ssl
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .mime_stream import StreamingMessage
+from core.metrics import default_metrics
+from config.app_config import (
+    SMTP_TIMEOUT,
+    SMTP_POOL_MAX_MESSAGES_PER_SESSION,
+    SMTP_POOL_MAX_IDLE_PER_KEY,
+    SMTP_POOL_IDLE_TIMEOUT,
+    SMTP_POOL_NOOP_INTERVAL,
+)
+
+PoolKey = Tuple[str, int, str]
+# Pieces of a streamed message smaller than this are merged into one socket write
+_COALESCE_BYTES = 64 * 1024
+
+# Recipient -> (code, message) for the addresses a server refused in an otherwise accepted transaction
+Refused = Dict[str, Tuple[int, bytes]]
+
+# Errors that mean the connection itself is gone rather than the message being rejected
+_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, OSError)
+
+
+@dataclass
+class PooledSession:
+    server: smtplib.SMTP
+    password: str
+    security: str
+    created_at: float
+    last_used: float
+    messages_sent: int = 0
+    reused: bool = False
+    # Set once DATA has gone out for the current message: from then on the server may have accepted it
+    data_sent: bool = False
+
+
+class SmtpConnectionPool:
+    # Keeps authenticated SMTP sessions alive per (host, port, username)
+    def __init__(
+        self,
+        max_messages_per_session: int = SMTP_POOL_MAX_MESSAGES_PER_SESSION,
+        max_idle_per_key: int = SMTP_POOL_MAX_IDLE_PER_KEY,
+        idle_timeout: float = SMTP_POOL_IDLE_TIMEOUT,
+        noop_interval: float = SMTP_POOL_NOOP_INTERVAL,
+        timeout: float = SMTP_TIMEOUT,
+    ) -> None:
+        self.max_messages_per_session = max_messages_per_session
+        self.max_idle_per_key = max_idle_per_key
+        self.idle_timeout = idle_timeout
+        self.noop_interval = noop_interval
+        self.timeout = timeout
+        self._idle: Dict[PoolKey, List[PooledSession]] = {}
+        self._lock = threading.Lock()
+        self._ssl_context: Optional[ssl.SSLContext] = None
+
+    def _context(self) -> ssl.SSLContext:
+        # Loading the CA bundle is expensive; build the context once per pool, even when several
+        # threads open their first connection at the same time
+        if self._ssl_context is None:
+            with self._lock:
+                if self._ssl_context is None:
+                    self._ssl_context = ssl.create_default_context()
+        return self._ssl_context
+
+    def _connect(self, host: str, port: int, username: str, password: str, security: str) -> smtplib.SMTP:
+        # Plain connections (local relays) never need the context
+        context = self._context() if security in ("ssl", "starttls") else None
+        # smtp_connect covers TCP, the greeting and EHLO (and the TLS handshake for implicit "ssl")
+        started = time.perf_counter()
+        try:
+            if security == "ssl":
+                server = smtplib.SMTP_SSL(host, port, context=context, timeout=self.timeout)
+            else:
+                server = smtplib.SMTP(host, port, timeout=self.timeout)
+        except Exception:
+            default_metrics.increment("smtp_connect_errors")
+            raise
+        try:
+            server.ehlo()
+            default_metrics.observe("smtp_connect", time.perf_counter() - started)
+            if security == "starttls":
+                with default_metrics.span("smtp_tls"):
+                    server.starttls(context=context)
+                    server.ehlo()
+            # Relays without authentication (local sinks, internal MTAs) are used with an empty password
+            if password:
+                with default_metrics.span("smtp_auth"):
+                    server.login(username, password)
+        except Exception:
+            self._close_server(server)
+            raise
+        return server
+
+    @staticmethod
+    def _close_server(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _is_alive(self, session: PooledSession) -> bool:
+        try:
+            code, _ = session.server.noop()
+            return code == 250
+        except Exception:
+            return False
+
+    def acquire(self, host: str, port: int, username: str, password: str, security: str = "starttls") -> PooledSession:
+        key = (host, port, username)
+        while True:
+            with self._lock:
+                sessions = self._idle.get(key)
+                session = sessions.pop() if sessions else None
+            if session is None:
+                break
+            idle_for = time.monotonic() - session.last_used
+            if session.password != password or session.security != security or idle_for > self.idle_timeout:
+                self._close_server(session.server)
+                continue
+            if idle_for > self.noop_interval and not self._is_alive(session):
+                self._close_server(session.server)
+                continue
+            session.reused = True
+            return session
+
+        server = self._connect(host, port, username, password, security)
+        now = time.monotonic()
+        return PooledSession(server=server, password=password, security=security, created_at=now, last_used=now)
+
+    def release(self, key: PoolKey, session: PooledSession, reusable: bool = True) -> None:
+        session.last_used = time.monotonic()
+        if not reusable or session.messages_sent >= self.max_messages_per_session:
+            self._close_server(session.server)
+            return
+        with self._lock:
+            expired = self._pop_expired(session.last_used)
+            sessions = self._idle.setdefault(key, [])
+            if len(sessions) < self.max_idle_per_key:
+                sessions.append(session)
+                session = None
+        for stale in expired:
+            self._close_server(stale.server)
+        if session is not None:
+            self._close_server(session.server)
+
+    def _pop_expired(self, now: float) -> List[PooledSession]:
+        expired: List[PooledSession] = []
+        for key, sessions in list(self._idle.items()):
+            alive = [s for s in sessions if now - s.last_used <= self.idle_timeout]
+            expired.extend(s for s in sessions if now - s.last_used > self.idle_timeout)
+            if alive:
+                self._idle[key] = alive
+            else:
+                del self._idle[key]
+        return expired
+
+    @staticmethod
+    def _reset(server: smtplib.SMTP) -> None:
+        # Best effort, as in smtplib's own cleanup: the error about to be raised matters more than RSET's
+        # reply, and a dropped connection shows up on the next use of the session anyway
+        try:
+            server.rset()
+        except (smtplib.SMTPException, OSError):
+            pass
+
+    @staticmethod
+    def _envelope(
+        server: smtplib.SMTP, from_addr: str, to_addrs: List[str], mail_options: List[str]
+    ) -> Refused:
+        # MAIL FROM and every RCPT TO. With PIPELINING (RFC 2920) they go out in one write and the replies
+        # are read afterwards, so a whole recipient list costs one round trip instead of one per address
+        if not server.has_extn("pipelining"):
+            code, resp = server.mail(from_addr, mail_options)
+            replies = [] if code != 250 else [server.rcpt(rcpt) for rcpt in to_addrs]
+        else:
+            if any(option.lower() == "smtputf8" for option in mail_options):
+                server.command_encoding = "utf-8"
+            options = "".join(" " + option for option in mail_options)
+            commands = [f"mail FROM:{smtplib.quoteaddr(from_addr)}{options}"]
+            commands.extend(f"rcpt TO:{smtplib.quoteaddr(rcpt)}" for rcpt in to_addrs)
+            server.send("".join(command + "\r\n" for command in commands))
+            code, resp = server.getreply()
+            replies = [server.getreply() for _ in to_addrs]
+        if code != 250:
+            SmtpConnectionPool._reset(server)
+            raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+        refused = {rcpt: reply for rcpt, reply in zip(to_addrs, replies) if reply[0] not in (250, 251)}
+        if len(refused) == len(to_addrs):
+            SmtpConnectionPool._reset(server)
+            raise smtplib.SMTPRecipientsRefused(refused)
+        return refused
+
+    @staticmethod
+    def _stream_message(
+        server: smtplib.SMTP,
+        message: StreamingMessage,
+        mail_options: List[str],
+        session: Optional[PooledSession] = None,
+    ) -> Refused:
+        # smtplib.sendmail() wants the whole message as one bytes object; this drives the same
+        # MAIL/RCPT/DATA exchange but writes the payload chunk by chunk straight to the socket.
+        # Returns the refused recipients, like sendmail()
+        refused = SmtpConnectionPool._envelope(server, message.from_addr, message.to_addrs, mail_options)
+        if session is not None:
+            session.data_sent = True
+        server.putcmd("data")
+        code, resp = server.getreply()
+        if code != 354:
+            SmtpConnectionPool._reset(server)
+            raise smtplib.SMTPDataError(code, resp)
+        # Tiny separate writes would stall on Nagle's algorithm and the server's delayed ACK
+        pending = b""
+        for chunk in message.chunks():
+            if len(chunk) < _COALESCE_BYTES:
+                pending += chunk
+                continue
+            if pending:
+                server.send(pending)
+                pending = b""
+            server.send(chunk)
+        server.send(pending + b".\r\n")
+        code, resp = server.getreply()
+        if code != 250:
+            SmtpConnectionPool._reset(server)
+            raise smtplib.SMTPDataError(code, resp)
+        return refused
+
+    def send(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: str,
+        message: StreamingMessage,
+        security: str = "starttls",
+    ) -> Refused:
+        # Returns the recipients the server refused; raises when none were accepted
+        key = (host, port, username)
+        while True:
+            session = self.acquire(host, port, username, password, security)
+            started = time.perf_counter()
+            session.data_sent = False
+            try:
+                mail_opts = ["SMTPUTF8"] if session.server.has_extn("smtputf8") else []
+                refused = self._stream_message(session.server, message, mail_opts, session)
+            except smtplib.SMTPResponseException as e:
+                # Server rejected this message; the session itself is still usable unless the reply was
+                # 421, which means the server is closing the connection
+                default_metrics.increment("smtp_rejected")
+                self.release(key, session, reusable=e.smtp_code != 421)
+                raise
+            except smtplib.SMTPRecipientsRefused as e:
+                default_metrics.increment("smtp_rejected")
+                self.release(key, session, reusable=all(code != 421 for code, _ in e.recipients.values()))
+                raise
+            except _CONNECTION_ERRORS:
+                self._close_server(session.server)
+                # A pooled session may have been dropped by the server while idle: reconnect once, but
+                # only if the envelope failed. Once DATA is out the server may have queued the message
+                # before the connection broke, and a retry could deliver it twice; fresh sessions are
+                # never retried either.
+                if session.reused and not session.data_sent:
+                    default_metrics.increment("smtp_reconnects")
+                    continue
+                default_metrics.increment("smtp_connection_errors")
+                raise
+            except Exception:
+                default_metrics.increment("smtp_connection_errors")
+                self._close_server(session.server)
+                raise
+            # MAIL/RCPT/DATA through the server's final reply, for one message
+            default_metrics.observe("smtp_data", time.perf_counter() - started)
+            session.messages_sent += 1
+            self.release(key, session)
+            return refused
+
+    def idle_count(self, key: Optional[PoolKey] = None) -> int:
+        with self._lock:
+            if key is not None:
+                return len(self._idle.get(key, []))
+            return sum(len(s) for s in self._idle.values())
+
+    def close_all(self) -> None:
+        with self._lock:
+            sessions = [s for group in self._idle.values() for s in group]
+            self._idle.clear()
+        for session in sessions:
+            self._close_server(session.server)
+
+
+default_pool = SmtpConnectionPool()
+atexit.register(default_pool.close_all)
@@ -3,4 +3,93 @@ GEMINI_MODEL = "gemini-2.0-flash-lite"
 GROQ_MODEL = "llama-3.1-8b-instant"
 DEFAULT_PROVIDER = "gemini"  # or "groq"
 EXCEL_LOG_PATH = "logs/sent_emails.xlsx"
+SEND_LOG_DB_PATH = "logs/sent_emails.db"  # append-only store; the xlsx is exported from it
+HISTORY_PAGE_SIZE = 50  # send history search results per page
+EXCEL_EXPORT_INTERVAL = 0  # seconds between automatic xlsx exports, 0 = on demand only
 PROFILE_PATH = "config/profile.json"
+
+# SMTP connection pool
+SMTP_TIMEOUT = 30  # seconds
+SMTP_POOL_MAX_MESSAGES_PER_SESSION = 100
+SMTP_POOL_MAX_IDLE_PER_KEY = 4
+SMTP_ASYNC_MAX_CONNECTIONS_PER_KEY = 8  # concurrent sessions per account on the asyncio transport
+SMTP_POOL_IDLE_TIMEOUT = 60  # seconds before an idle session is closed
+SMTP_POOL_NOOP_INTERVAL = 10  # seconds idle before a NOOP health check
+
+# Attachments
+ATTACHMENT_CACHE_ENTRIES = 16  # encoded attachments kept for reuse across recipients
+ATTACHMENT_SPOOL_THRESHOLD = 1024 * 1024  # bytes; larger encodings are spooled to a memory-mapped temp file
+MESSAGE_TEMPLATE_CACHE_ENTRIES = 32  # pre-rendered campaign templates (sender, subject/body and attachments)
+MESSAGE_TEMPLATE_CACHE_BYTES = 64 * 1024 * 1024  # encoded attachment bytes those templates may keep alive
+
+# Custom SMTP server (Provider.CUSTOM), e.g. an internal relay or the benchmarks' local sink
+CUSTOM_SMTP_HOST = "localhost"
+CUSTOM_SMTP_PORT = 2525
+CUSTOM_SMTP_SECURITY = "plain"  # "starttls", "ssl" or "plain"
+
+# Bulk sending
+SEND_MAX_WORKERS = 8
+PROVIDER_SEND_CONCURRENCY = {"gmail": 4, "outlook": 2}
+BROADCAST_BATCH_SIZE = 100  # recipients per SMTP transaction (Gmail and Office365 accept 100)
+
+# Background log writer
+LOG_QUEUE_SIZE = 10000
+LOG_BATCH_SIZE = 200
+LOG_FLUSH_INTERVAL = 0.5  # seconds
+
+# Generation cache
+GENERATION_CACHE_SIZE = 256  # in-memory LRU entries
+GENERATION_CACHE_DIR = ""  # e.g. ".cache/generations" to enable the on-disk tier
+GENERATION_CACHE_TTL = 7 * 24 * 3600  # seconds
+GENERATION_CACHE_MAX_DISK_BYTES = 50 * 1024 * 1024
+
+# Batch draft generation
+GENERATION_MAX_CONCURRENCY = 4
+
+# asyncio send/generate path
+ASYNC_MAX_IN_FLIGHT = 1000
+
+# Provider router (retries, circuit breakers, hedged requests)
+ROUTER_MAX_ATTEMPTS = 3  # per draft, across all providers
+ROUTER_BACKOFF_BASE = 0.5  # seconds, doubled per retry with full jitter
+ROUTER_BACKOFF_MAX = 8.0
+ROUTER_HEDGE_AFTER = 2.0  # seconds without a first token before asking the next provider, 0 = never
+CIRCUIT_FAILURE_THRESHOLD = 3  # consecutive failures that open a provider's breaker
+CIRCUIT_RESET_TIMEOUT = 30.0  # seconds before an open breaker lets one trial request through
+
+# Client-side quotas: requests are paced to stay under these instead of hitting 429s / 4xx rejections.
+# Keys are <dimension>_per_<second|minute|hour|day>; dimensions are requests, tokens, recipients.
+SMTP_ACCOUNT_QUOTAS = {  # per sender account
+    "gmail": {"requests_per_minute": 20, "recipients_per_day": 500},
+    "outlook": {"requests_per_minute": 30, "recipients_per_day": 10000},
+}
+LLM_PROVIDER_QUOTAS = {  # per provider and model
+    "gemini": {"requests_per_minute": 15, "tokens_per_minute": 1000000, "requests_per_day": 1500},
+    "groq": {"requests_per_minute": 30, "tokens_per_minute": 6000, "requests_per_day": 14400},
+}
+LLM_OUTPUT_TOKENS_ESTIMATE = 600  # added to the prompt estimate when reserving tokens
+SEND_QUOTA_MAX_WAIT = 30.0  # seconds a send from the UI may wait for its account quota before failing
+BULK_QUOTA_MAX_WAIT = 3600.0  # longest quota pacing a list send may block the UI for; beyond it, use the outbox
+
+# Durable outbox
+OUTBOX_DB_PATH = "logs/outbox.db"
+OUTBOX_MAX_ATTEMPTS = 5  # transient (4xx / connection) failures before an item is marked failed
+OUTBOX_RETRY_BASE = 30.0  # seconds, doubled per attempt with jitter
+OUTBOX_RETRY_MAX = 3600.0
+OUTBOX_LEASE_SECONDS = 300  # an item stuck in "sending" longer than this is requeued after a crash
+OUTBOX_BATCH_SIZE = 50  # items claimed per worker poll
+OUTBOX_POLL_INTERVAL = 1.0  # seconds between polls when the outbox is idle
+
+# Pre-send filter (services/send_filter.py)
+SUPPRESSION_DB_PATH = "logs/suppression.db"  # bounced and opted-out addresses, or @domain for a whole domain
+SEND_FILTER_SCOPE = "message"  # "message": skip the same subject to the same address; "recipient": any earlier send
+SEND_FILTER_ERROR_RATE = 0.01  # Bloom filter false positives; each costs one indexed history lookup
+
+# Headless batch runner (cli.py)
+BATCH_CHECKPOINT_DIR = "logs/batches"  # one JSON-lines checkpoint per recipients file
+BATCH_PROGRESS_INTERVAL = 0.5  # seconds between live progress updates
+
+# Hot-path instrumentation (core/metrics.py)
+METRICS_ENABLED = True
+METRICS_WINDOW = 1024  # recent samples per stage kept for p50/p95
+METRICS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # seconds
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+
+from models.email_models import CacheStats, GeneratedEmail
+from core.metrics import default_metrics
+from config.app_config import (
+    GENERATION_CACHE_SIZE,
+    GENERATION_CACHE_DIR,
+    GENERATION_CACHE_TTL,
+    GENERATION_CACHE_MAX_DISK_BYTES,
+)
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in sorted(value.items()) if v not in (None, "")}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+class GenerationCache:
+    # Two tiers: an in-memory LRU in front of an optional on-disk JSON store, both with a TTL
+    def __init__(
+        self,
+        max_entries: int = GENERATION_CACHE_SIZE,
+        disk_dir: Optional[str] = GENERATION_CACHE_DIR,
+        ttl: float = GENERATION_CACHE_TTL,
+        max_disk_bytes: int = GENERATION_CACHE_MAX_DISK_BYTES,
+    ) -> None:
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir or None
+        self.ttl = ttl
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, Tuple[float, GeneratedEmail]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._evictions = 0
+        self._disk_bytes = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, _, size in self._disk_entries())
+
+    @staticmethod
+    def make_key(model_name: str, **inputs: Any) -> str:
+        payload = json.dumps(
+            {"model": model_name, "inputs": _normalize(inputs)},
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expired(self, created: float) -> bool:
+        return bool(self.ttl) and time.time() - created > self.ttl
+
+    def get(self, key: str) -> Optional[GeneratedEmail]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(entry[0]):
+                self._memory.move_to_end(key)
+                self._hits += 1
+                self._memory_hits += 1
+                default_metrics.increment("generation_cache_hits")
+                return entry[1]
+            if entry is not None:
+                del self._memory[key]
+
+        created_email = self._disk_get(key)
+        with self._lock:
+            if created_email is None:
+                self._misses += 1
+                default_metrics.increment("generation_cache_misses")
+                return None
+            self._hits += 1
+            self._disk_hits += 1
+            self._remember(key, *created_email)
+        default_metrics.increment("generation_cache_hits")
+        return created_email[1]
+
+    def put(self, key: str, email: GeneratedEmail) -> None:
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, email)
+        self._disk_put(key, created, email)
+
+    def _remember(self, key: str, created: float, email: GeneratedEmail) -> None:
+        self._memory[key] = (created, email)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._evictions += 1
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, GeneratedEmail]]:
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return None
+        created = float(data.get("created", 0))
+        if self._expired(created):
+            size = self._file_size(path)
+            if self._remove_file(path):
+                with self._lock:
+                    self._disk_bytes = max(0, self._disk_bytes - size)
+            return None
+        return created, GeneratedEmail(subject=data.get("subject", ""), body=data.get("body", ""))
+
+    def _disk_put(self, key: str, created: float, email: GeneratedEmail) -> None:
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"created": created, "subject": email.subject, "body": email.body}, f, ensure_ascii=False)
+            # Overwriting an entry (a forced regeneration) replaces its bytes rather than adding to them
+            previous = self._file_size(path)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except Exception:
+            self._remove_file(tmp_path)
+            return
+        with self._lock:
+            self._disk_bytes += size - previous
+            over_budget = self._disk_bytes > self.max_disk_bytes
+        if over_budget:
+            self._evict_disk()
+
+    def _disk_entries(self) -> List[Tuple[float, str, int]]:
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, path, st.st_size))
+        return entries
+
+    def _evict_disk(self) -> None:
+        # Drop expired entries, then the oldest ones until we are back under 90% of the budget
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, _, size in entries)
+        target = self.max_disk_bytes * 0.9
+        now = time.time()
+        for mtime, path, size in entries:
+            expired = bool(self.ttl) and now - mtime > self.ttl
+            if not expired and total <= target:
+                continue
+            if self._remove_file(path):
+                total -= size
+                with self._lock:
+                    self._evictions += 1
+        with self._lock:
+            self._disk_bytes = total
+
+    @staticmethod
+    def _file_size(path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    @staticmethod
+    def _remove_file(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self.disk_dir:
+            for _, path, _ in self._disk_entries():
+                self._remove_file(path)
+            with self._lock:
+                self._disk_bytes = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                memory_hits=self._memory_hits,
+                disk_hits=self._disk_hits,
+                entries=len(self._memory),
+                evictions=self._evictions,
+            )
+
+
+_default_cache: Optional[GenerationCache] = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> GenerationCache:
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = GenerationCache()
+        return _default_cache
@@ -0,0 +1,178 @@
+import bisect
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import asdict
+from functools import wraps
+from typing import Any, Callable, Deque, Dict, List
+
+from models.email_models import StageStats
+from config.app_config import METRICS_BUCKETS, METRICS_ENABLED, METRICS_WINDOW
+
+
+class _Span:
+    __slots__ = ("metrics", "stage", "started")
+
+    def __init__(self, metrics: "Metrics", stage: str) -> None:
+        self.metrics = metrics
+        self.stage = stage
+        self.started = 0.0
+
+    def __enter__(self) -> "_Span":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> bool:
+        self.metrics.observe(self.stage, time.perf_counter() - self.started)
+        if exc_type is not None:
+            self.metrics.increment(f"{self.stage}_errors")
+        return False
+
+
+class _NullSpan:
+    # What span() hands out while metrics are disabled: one shared object, no clock reads, no locking
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> bool:
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Series:
+    # One stage: the most recent samples for percentiles, plus cumulative totals and histogram bucket
+    # counts (non-cumulative here, summed on export) for Prometheus
+    __slots__ = ("recent", "count", "total", "buckets")
+
+    def __init__(self, window: int, bucket_count: int) -> None:
+        self.recent: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * (bucket_count + 1)
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+class Metrics:
+    # Process-wide timings and counters for the hot paths: prompt build, LLM call (TTFT and total),
+    # response parsing, MIME build, SMTP connect/TLS/auth/DATA and log writes. Disabled, span() returns a
+    # shared no-op and observe()/increment() return after one attribute check
+    def __init__(
+        self,
+        enabled: bool = METRICS_ENABLED,
+        window: int = METRICS_WINDOW,
+        buckets: tuple = METRICS_BUCKETS,
+    ) -> None:
+        self.enabled = enabled
+        self.window = max(1, window)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[str, _Series] = {}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def span(self, stage: str) -> Any:
+        # with metrics.span("smtp_auth"): ...  records the duration, and counts <stage>_errors on exceptions
+        return _Span(self, stage) if self.enabled else _NULL_SPAN
+
+    def timed(self, stage: str) -> Callable:
+        def decorate(fn: Callable) -> Callable:
+            @wraps(fn)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Span(self, stage):
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorate
+
+    def observe(self, stage: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(stage)
+            if series is None:
+                series = self._series[stage] = _Series(self.window, len(self.buckets))
+            series.recent.append(seconds)
+            series.count += 1
+            series.total += seconds
+            series.buckets[index] += 1
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + amount
+
+    def stages(self) -> List[StageStats]:
+        # Percentiles over each stage's recent window; count and mean cover the whole process lifetime
+        with self._lock:
+            series = [(stage, sorted(s.recent), s.count, s.total) for stage, s in self._series.items()]
+        return [
+            StageStats(
+                stage=stage,
+                count=count,
+                mean=total / count if count else 0.0,
+                p50=_percentile(recent, 50),
+                p95=_percentile(recent, 95),
+                max=recent[-1] if recent else 0.0,
+            )
+            for stage, recent, count, total in sorted(series)
+        ]
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+            self._counters.clear()
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {"stages": [asdict(s) for s in self.stages()], "counters": self.counters()},
+            indent=2,
+        )
+
+    def prometheus(self, prefix: str = "email_writer") -> str:
+        # Text exposition format: one histogram over all stages (label "stage") and one counter family
+        with self._lock:
+            series = sorted((stage, list(s.buckets), s.count, s.total) for stage, s in self._series.items())
+            counters = sorted(self._counters.items())
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent per pipeline stage",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        for stage, buckets, count, total in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets, buckets):
+                cumulative += n
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {count}')
+        lines += [f"# HELP {prefix}_events_total Retries, cache hits and failures", f"# TYPE {prefix}_events_total counter"]
+        lines += [f'{prefix}_events_total{{event="{name}"}} {value}' for name, value in counters]
+        return "\n".join(lines) + "\n"
+
+    def export(self, filepath: str) -> str:
+        # Prometheus text for *.prom / *.txt, JSON otherwise
+        content = self.prometheus() if filepath.endswith((".prom", ".txt")) else self.to_json()
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write(content)
+        return filepath
+
+
+default_metrics = Metrics()
@@ -0,0 +1,252 @@
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from models.email_models import QuotaState
+from config.app_config import LLM_PROVIDER_QUOTAS, SMTP_ACCOUNT_QUOTAS
+
+
+class QuotaExceeded(RuntimeError):
+    # Raised instead of waiting when admission would take longer than the caller's max_wait
+    def __init__(self, budget: str, account: str, wait: float) -> None:
+        self.budget = budget
+        self.account = account
+        self.wait = wait
+        where = f"{budget} {account}".strip()
+        super().__init__(f"Quota {where} is used up: the next send is admitted in {_duration(wait)}")
+
+
+def _duration(seconds: float) -> str:
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f} h"
+    if seconds >= 60:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds:.0f} s"
+
+
+class TokenBucket:
+    # Refills `rate` tokens per second up to `capacity`; acquire() waits instead of rejecting.
+    # Starts full unless `tokens` says how much is left, e.g. quota already used before a restart
+    def __init__(self, rate: float, capacity: Optional[float] = None, tokens: Optional[float] = None) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = min(self.capacity, tokens) if tokens is not None else self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, count: float, burst: Optional[float] = None) -> "TokenBucket":
+        return cls(rate=count / 60.0, capacity=burst if burst is not None else 1.0)
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def _reserve(self, tokens: float) -> float:
+        # Reserve the tokens now (possibly going negative) and let the caller sleep off the debt
+        # outside the lock, so concurrent callers are paced in FIFO-ish order instead of spinning
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens: float = 1.0) -> float:
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+# Suffix of a budget limit name -> window length in seconds, e.g. "requests_per_minute"
+_WINDOWS = {"second": 1.0, "minute": 60.0, "hour": 3600.0, "day": 86400.0}
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough BPE estimate (about 4 characters per token); only used for pacing
+    return len(text) // 4 + 1
+
+
+class QuotaScheduler:
+    # Budgets by name, e.g. {"smtp:gmail": {"requests_per_minute": 20, "recipients_per_day": 500}}.
+    # Every (budget, account) pair gets its own buckets, one per limit. acquire() reserves from all of
+    # them at once and sleeps until the slowest has caught up, so callers are paced in arrival order
+    # instead of being rejected by the provider. `usage(budget, account, dimension, window_seconds)`
+    # reports what was already spent in a window before this process started (e.g. from the send log),
+    # so a restart does not hand out a fresh daily quota.
+    def __init__(
+        self,
+        budgets: Optional[Dict[str, Dict[str, float]]] = None,
+        usage: Optional[Callable[[str, str, str, float], float]] = None,
+    ) -> None:
+        self.budgets = dict(budgets or {})
+        self.usage = usage
+        self._buckets: Dict[Tuple[str, str], List[Tuple[str, str, float, TokenBucket]]] = {}
+        self._waiting: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def _limits(self, budget: str, account: str) -> List[Tuple[str, str, float, TokenBucket]]:
+        key = (budget, account.lower())
+        limits = self._buckets.get(key)
+        if limits is None:
+            limits = []
+            for name, limit in self.budgets.get(budget, {}).items():
+                dimension, _, window = name.partition("_per_")
+                if not limit or window not in _WINDOWS:
+                    continue
+                # Capacity is the whole window's quota; the refill rate spreads it over the window
+                used = self.usage(budget, account, dimension, _WINDOWS[window]) if self.usage else 0
+                bucket = TokenBucket(rate=limit / _WINDOWS[window], capacity=limit, tokens=limit - used)
+                limits.append((name, dimension, float(limit), bucket))
+            self._buckets[key] = limits
+        return limits
+
+    def _reserve(
+        self, budget: str, account: str, costs: Dict[str, float], max_wait: Optional[float] = None
+    ) -> float:
+        with self._lock:
+            limits = self._limits(budget, account)
+            if max_wait is not None:
+                # Checked before anything is reserved, so a refused caller leaves no debt behind
+                needed = max(
+                    (
+                        (costs.get(dimension, 0) - bucket.available()) / bucket.rate
+                        for _, dimension, _, bucket in limits
+                        if costs.get(dimension, 0) > 0
+                    ),
+                    default=0.0,
+                )
+                if needed > max_wait:
+                    raise QuotaExceeded(budget, account, needed)
+            wait = 0.0
+            for _, dimension, _, bucket in limits:
+                cost = costs.get(dimension, 0)
+                if cost > 0:
+                    wait = max(wait, bucket._reserve(cost))
+            if wait > 0:
+                key = (budget, account.lower())
+                self._waiting[key] = self._waiting.get(key, 0) + 1
+            return wait
+
+    def _done_waiting(self, budget: str, account: str) -> None:
+        with self._lock:
+            key = (budget, account.lower())
+            self._waiting[key] = max(0, self._waiting.get(key, 0) - 1)
+
+    def acquire(
+        self,
+        budget: str,
+        account: str = "",
+        requests: float = 1,
+        tokens: float = 0,
+        recipients: float = 0,
+        max_wait: Optional[float] = None,
+    ) -> float:
+        # Returns the seconds spent waiting; budgets missing from the config are not paced. With max_wait,
+        # raises QuotaExceeded instead of waiting longer than that
+        costs = {"requests": requests, "tokens": tokens, "recipients": recipients}
+        wait = self._reserve(budget, account, costs, max_wait)
+        if wait > 0:
+            try:
+                time.sleep(wait)
+            finally:
+                self._done_waiting(budget, account)
+        return wait
+
+    async def acquire_async(
+        self,
+        budget: str,
+        account: str = "",
+        requests: float = 1,
+        tokens: float = 0,
+        recipients: float = 0,
+    ) -> float:
+        wait = self._reserve(budget, account, {"requests": requests, "tokens": tokens, "recipients": recipients})
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._done_waiting(budget, account)
+        return wait
+
+    def predict(
+        self,
+        budget: str,
+        account: str = "",
+        requests: float = 0,
+        tokens: float = 0,
+        recipients: float = 0,
+    ) -> float:
+        # Seconds until this much additional work would have been admitted, behind everything already queued
+        costs = {"requests": requests, "tokens": tokens, "recipients": recipients}
+        with self._lock:
+            limits = self._limits(budget, account)
+        return max(
+            (
+                max(0.0, costs.get(dimension, 0) - bucket.available()) / bucket.rate
+                for _, dimension, _, bucket in limits
+            ),
+            default=0.0,
+        )
+
+    def state(self, budget: str, account: str = "") -> QuotaState:
+        with self._lock:
+            limits = self._limits(budget, account)
+            waiting = self._waiting.get((budget, account.lower()), 0)
+        available = {name: bucket.available() for name, _, _, bucket in limits}
+        # Reservations drive a bucket negative; the debt is what the queued callers still wait for
+        drain_time = max(
+            (max(0.0, -available[name]) / bucket.rate for name, _, _, bucket in limits),
+            default=0.0,
+        )
+        return QuotaState(
+            budget=budget,
+            account=account,
+            waiting=waiting,
+            drain_time=drain_time,
+            limits={name: limit for name, _, limit, _ in limits},
+            available=available,
+        )
+
+    def states(self) -> List[QuotaState]:
+        with self._lock:
+            keys = list(self._buckets)
+        return [self.state(budget, account) for budget, account in keys]
+
+
+_default_scheduler: Optional[QuotaScheduler] = None
+_default_lock = threading.Lock()
+
+
+def get_default_scheduler() -> QuotaScheduler:
+    # One scheduler per process: every EmailSender and AI client shares the same budgets
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            budgets = {f"smtp:{name}": limits for name, limits in SMTP_ACCOUNT_QUOTAS.items()}
+            budgets.update({f"llm:{name}": limits for name, limits in LLM_PROVIDER_QUOTAS.items()})
+            _default_scheduler = QuotaScheduler(budgets)
+        return _default_scheduler
@@ -1,18 +1,39 @@
-from dataclasses import dataclass
+import os
+from dataclasses import dataclass, field
 from enum import Enum
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple, Union
 
 
 class Provider(Enum):
     GMAIL = "gmail"
     OUTLOOK = "outlook"
+    CUSTOM = "custom"  # any SMTP server, see CUSTOM_SMTP_* in config/app_config.py
+
+
+# (host, port, security) of an SMTP server, security being "starttls", "ssl" or "plain"
+SmtpEndpoint = Tuple[str, int, str]
 
 
 @dataclass
 class Attachment:
     filename: str
-    content: bytes
+    content: Union[bytes, memoryview]
     mime_type: str
+    path: str = ""  # file-backed attachments leave content empty and are read only when encoded
+
+    @classmethod
+    def from_path(cls, path: str, mime_type: str = "application/octet-stream", filename: str = "") -> "Attachment":
+        return cls(filename=filename or os.path.basename(path), content=b"", mime_type=mime_type, path=path)
+
+    @property
+    def size(self) -> int:
+        return os.path.getsize(self.path) if self.path else memoryview(self.content).nbytes
+
+    def data(self) -> Union[bytes, memoryview]:
+        if self.path:
+            with open(self.path, "rb") as f:
+                return f.read()
+        return self.content
 
 
 @dataclass
@@ -24,9 +45,216 @@ class EmailRequest:
     subject: str
     body: str
     attachments: Optional[List[Attachment]] = None
+    message_id: str = ""
+    smtp_endpoint: Optional[SmtpEndpoint] = None  # Provider.CUSTOM only; None means the configured default
 
 
 @dataclass
 class GeneratedEmail:
     subject: str
     body: str
+
+
+@dataclass
+class SendResult:
+    index: int
+    recipient_email: str
+    ok: bool
+    error: str = ""
+    latency: float = 0.0
+    wait: float = 0.0  # time paced by the quota scheduler before sending
+
+
+@dataclass
+class SkippedRecipient:
+    index: int
+    recipient_email: str
+    reason: str  # "suppressed: <why>", "already sent" or "duplicate in batch"
+
+
+@dataclass
+class BulkSendSummary:
+    total: int
+    succeeded: int
+    failed: int
+    elapsed: float
+    throughput: float
+    latency_avg: float
+    latency_p50: float
+    latency_p95: float
+    latency_max: float
+    results: List[SendResult] = field(default_factory=list)
+    skipped: List[SkippedRecipient] = field(default_factory=list)  # filtered out before any SMTP work
+
+
+@dataclass
+class BatchProgress:
+    stage: str  # "generate" or "send"
+    total: int
+    done: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0  # already done in an earlier run, per the checkpoint
+    elapsed: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+
+@dataclass
+class StageStats:
+    stage: str
+    count: int
+    mean: float
+    p50: float  # p50/p95/max over the most recent samples only
+    p95: float
+    max: float
+
+
+@dataclass
+class LogWriterStats:
+    queue_depth: int
+    max_queue_depth: int
+    records_written: int
+    flushes: int
+    errors: int
+    last_flush_latency: float
+    avg_flush_latency: float
+    max_flush_latency: float
+    last_error: str = ""
+    retrying: int = 0  # records from failed flushes, written again with the next batch
+    dropped: int = 0  # failed records given up on once more than a full queue's worth was waiting
+    export_errors: int = 0  # periodic workbook exports that failed; the records themselves were stored
+
+
+@dataclass
+class CacheStats:
+    hits: int
+    misses: int
+    memory_hits: int
+    disk_hits: int
+    entries: int
+    evictions: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@dataclass
+class DraftRequest:
+    purpose: str
+    recipient_name: str
+    recipient_email: str = ""
+    tone: str = "Professional"
+    language: str = "Turkish"
+    additional_context: str = ""
+    email_length: str = "Medium (3-4 paragraphs)"
+
+
+@dataclass
+class DraftResult:
+    index: int
+    request: DraftRequest
+    email: Optional[GeneratedEmail] = None
+    error: str = ""
+    latency: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.email is not None
+
+
+@dataclass
+class StreamedDraft:
+    subject: str
+    body: str
+    done: bool = False
+    email: Optional[GeneratedEmail] = None
+    time_to_first_token: Optional[float] = None
+    elapsed: float = 0.0
+    cached: bool = False
+    provider: str = ""
+
+    @classmethod
+    def final(
+        cls,
+        email: GeneratedEmail,
+        time_to_first_token: Optional[float] = None,
+        elapsed: float = 0.0,
+        cached: bool = False,
+    ) -> "StreamedDraft":
+        return cls(
+            subject=email.subject,
+            body=email.body,
+            done=True,
+            email=email,
+            time_to_first_token=time_to_first_token,
+            elapsed=elapsed,
+            cached=cached,
+        )
+
+
+@dataclass
+class RouterStats:
+    requests: int
+    attempts: int
+    retries: int
+    failovers: int
+    hedges: int
+    hedge_wins: int
+    failures: int
+    breaker_states: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class QuotaState:
+    budget: str
+    account: str
+    waiting: int
+    drain_time: float  # seconds until everything queued on this budget has been admitted
+    limits: Dict[str, float] = field(default_factory=dict)
+    available: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class OutboxItem:
+    id: int
+    idempotency_key: str
+    state: str  # queued -> sending -> sent | failed
+    provider: str
+    sender: str
+    recipient: str
+    subject: str
+    body: str
+    attempts: int = 0
+    last_error: str = ""
+    message_id: str = ""
+    attachments: Optional[List[Attachment]] = None
+    smtp_host: str = ""  # Provider.CUSTOM sent elsewhere than the configured default
+    smtp_port: int = 0
+    smtp_security: str = ""
+
+
+@dataclass
+class OutboxStats:
+    queued: int
+    sending: int
+    sent: int
+    failed: int
+    retrying: int  # queued items that already failed at least once
+    oldest_queued_age: float = 0.0
+
+
+@dataclass
+class SentEmail:
+    # One send log row as returned by SendLogStore.search
+    id: int
+    timestamp: str  # ISO 8601, UTC
+    provider: str
+    sender: str
+    recipient: str
+    subject: str
+    body: str
@@ -0,0 +1,207 @@
+import asyncio
+import time
+import traceback
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from models.email_models import (
+    BulkSendSummary,
+    DraftRequest,
+    DraftResult,
+    EmailRequest,
+    Provider,
+    SendResult,
+    SmtpEndpoint,
+)
+from clients.async_smtp import AsyncSmtpTransport
+from clients.gmail_client import GmailClient
+from clients.outlook_client import OutlookClient
+from clients.message_template import default_templates
+from services.email_sender import summarize_results
+from core.rate_limiter import QuotaScheduler, TokenBucket, get_default_scheduler
+from config.app_config import (
+    ASYNC_MAX_IN_FLIGHT,
+    CUSTOM_SMTP_HOST,
+    CUSTOM_SMTP_PORT,
+    CUSTOM_SMTP_SECURITY,
+    PROVIDER_SEND_CONCURRENCY,
+    GENERATION_MAX_CONCURRENCY,
+)
+
+# provider -> (host, port, security); a request's own smtp_endpoint wins for Provider.CUSTOM
+SMTP_ENDPOINTS: Dict[Provider, SmtpEndpoint] = {
+    Provider.GMAIL: (GmailClient.HOST, GmailClient.PORT_TLS, "starttls"),
+    Provider.OUTLOOK: (OutlookClient.HOST, OutlookClient.PORT_TLS, "starttls"),
+    Provider.CUSTOM: (CUSTOM_SMTP_HOST, CUSTOM_SMTP_PORT, CUSTOM_SMTP_SECURITY),
+}
+
+
+class AsyncEmailSender:
+    # asyncio counterpart of EmailSender + DraftGenerator: many in-flight sends and generations on one loop
+    def __init__(
+        self,
+        transport: Optional[AsyncSmtpTransport] = None,
+        max_in_flight: int = ASYNC_MAX_IN_FLIGHT,
+        provider_limits: Optional[Dict[str, int]] = None,
+        endpoints: Optional[Dict[Provider, SmtpEndpoint]] = None,
+        scheduler: Optional[QuotaScheduler] = None,
+    ) -> None:
+        self.transport = transport or AsyncSmtpTransport()
+        self.scheduler = scheduler or get_default_scheduler()
+        self.max_in_flight = max(1, max_in_flight)
+        self.provider_limits = PROVIDER_SEND_CONCURRENCY if provider_limits is None else provider_limits
+        # Overrides are merged over the defaults, so overriding one provider keeps the others
+        self.endpoints = {**SMTP_ENDPOINTS, **(endpoints or {})}
+
+    async def pace(self, request: EmailRequest) -> float:
+        # Per-account SMTP quota, as EmailSender.pace, without blocking the loop
+        return await self.scheduler.acquire_async(f"smtp:{request.provider.value}", request.sender_email, recipients=1)
+
+    async def send(self, request: EmailRequest) -> Tuple[bool, str]:
+        await self.pace(request)
+        return await self._deliver(request)
+
+    async def _deliver(self, request: EmailRequest) -> Tuple[bool, str]:
+        endpoint = self.endpoints.get(request.provider)
+        if request.provider == Provider.CUSTOM and request.smtp_endpoint:
+            endpoint = request.smtp_endpoint
+        if endpoint is None:
+            return False, "Unsupported provider"
+        host, port, security = endpoint
+        try:
+            message = default_templates.render(
+                request.sender_email,
+                request.recipient_email,
+                request.subject,
+                request.body,
+                request.attachments,
+                request.message_id,
+            )
+            await self.transport.send_message(
+                host,
+                port,
+                request.sender_email,
+                request.sender_password,
+                message,
+                security=security,
+            )
+            return True, ""
+        except Exception as e:
+            details = traceback.format_exc()
+            return False, f"{e.__class__.__name__}: {e}\n{details}"
+
+    async def iter_send_many(self, requests: Iterable[EmailRequest]) -> AsyncIterator[SendResult]:
+        # Semaphores are created per call so they always belong to the running loop
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        limits = {name: asyncio.Semaphore(max(1, n)) for name, n in self.provider_limits.items()}
+
+        async def send_one(index: int, request: EmailRequest) -> SendResult:
+            provider_limit = limits.get(request.provider.value)
+            # Paced before taking an in-flight slot, so waiting on the account quota does not block other accounts
+            wait = await self.pace(request)
+            async with in_flight:
+                if provider_limit is not None:
+                    await provider_limit.acquire()
+                try:
+                    started = time.perf_counter()
+                    ok, error = await self._deliver(request)
+                    latency = time.perf_counter() - started
+                finally:
+                    if provider_limit is not None:
+                        provider_limit.release()
+            return SendResult(
+                index=index,
+                recipient_email=request.recipient_email,
+                ok=ok,
+                error=error,
+                latency=latency,
+                wait=wait,
+            )
+
+        tasks = [asyncio.ensure_future(send_one(i, r)) for i, r in enumerate(requests)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def send_many(
+        self,
+        requests: Iterable[EmailRequest],
+        on_result: Optional[Callable[[SendResult], None]] = None,
+    ) -> BulkSendSummary:
+        started = time.perf_counter()
+        results: List[SendResult] = []
+        async for result in self.iter_send_many(requests):
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+        return summarize_results(results, time.perf_counter() - started)
+
+    async def generate_many(
+        self,
+        client: Any,
+        drafts: Iterable[DraftRequest],
+        profile: Optional[Dict[str, Any]] = None,
+        use_cache: bool = True,
+        max_concurrency: int = GENERATION_MAX_CONCURRENCY,
+        requests_per_minute: Optional[float] = None,
+        on_result: Optional[Callable[[DraftResult], None]] = None,
+    ) -> List[DraftResult]:
+        # Provider quotas are paced inside the clients; requests_per_minute is an extra local cap
+        bucket = TokenBucket.per_minute(requests_per_minute) if requests_per_minute else None
+        limit = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def generate_one(index: int, draft: DraftRequest) -> DraftResult:
+            async with limit:
+                if bucket is not None:
+                    await bucket.acquire_async()
+                started = time.perf_counter()
+                try:
+                    email = await client.agenerate_email(
+                        purpose=draft.purpose,
+                        recipient_name=draft.recipient_name,
+                        tone=draft.tone,
+                        language=draft.language,
+                        additional_context=draft.additional_context,
+                        profile=profile,
+                        email_length=draft.email_length,
+                        use_cache=use_cache,
+                    )
+                    return DraftResult(index=index, request=draft, email=email, latency=time.perf_counter() - started)
+                except Exception as e:
+                    return DraftResult(
+                        index=index,
+                        request=draft,
+                        error=f"{e.__class__.__name__}: {e}",
+                        latency=time.perf_counter() - started,
+                    )
+
+        results: List[DraftResult] = []
+        for next_done in asyncio.as_completed([generate_one(i, d) for i, d in enumerate(drafts)]):
+            result = await next_done
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+        results.sort(key=lambda r: r.index)
+        return results
+
+    async def aclose(self) -> None:
+        await self.transport.close()
+
+    def send_many_sync(
+        self,
+        requests: Iterable[EmailRequest],
+        on_result: Optional[Callable[[SendResult], None]] = None,
+    ) -> BulkSendSummary:
+        # Thin blocking wrapper; pooled connections belong to the loop, so they are closed with it
+        async def run() -> BulkSendSummary:
+            try:
+                return await self.send_many(requests, on_result=on_result)
+            finally:
+                await self.aclose()
+
+        return asyncio.run(run())
+
+    def generate_many_sync(self, client: Any, drafts: Iterable[DraftRequest], **kwargs: Any) -> List[DraftResult]:
+        return asyncio.run(self.generate_many(client, drafts, **kwargs))
@@ -0,0 +1,198 @@
+import atexit
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from models.email_models import LogWriterStats
+from services.excel_logger import ExcelLogger
+from config.app_config import LOG_QUEUE_SIZE, LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL
+
+_STOP = object()
+
+
+class AsyncLogWriter:
+    # Same append/export interface as ExcelLogger, but writes happen on a background thread in batches
+    def __init__(
+        self,
+        logger: Optional[ExcelLogger] = None,
+        max_queue: int = LOG_QUEUE_SIZE,
+        batch_size: int = LOG_BATCH_SIZE,
+        flush_interval: float = LOG_FLUSH_INTERVAL,
+    ) -> None:
+        self.logger = logger or ExcelLogger()
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._max_retry = max(1, max_queue)
+        # Serializes append() against close(), so nothing is queued behind _STOP
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._max_depth = 0
+        self._written = 0
+        self._flushes = 0
+        self._errors = 0
+        self._last_error = ""
+        self._export_errors = 0
+        self._flush_total = 0.0
+        self._flush_last = 0.0
+        self._flush_max = 0.0
+        # Records whose write failed, oldest first; owned by the writer thread
+        self._retry: List[Dict[str, str]] = []
+        self._dropped = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def append(
+        self,
+        sender_email: str,
+        recipient_email: str,
+        subject: str,
+        body: str,
+        provider: str,
+    ) -> None:
+        record = self.logger.build_record(sender_email, recipient_email, subject, body, provider)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Log writer is closed")
+            # Blocks only when the queue is full, i.e. logging has fallen far behind sending
+            self._queue.put(record)
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            if depth > self._max_depth:
+                self._max_depth = depth
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            try:
+                # With failed records waiting, wake up to retry them even if nothing new arrives
+                item = self._queue.get(timeout=self.flush_interval if self._retry else None)
+            except queue.Empty:
+                self._write([])
+                continue
+            if item is _STOP:
+                self._queue.task_done()
+                break
+            batch: List[Dict[str, str]] = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+            self._write(batch)
+        if self._retry:
+            # Last chance for records that failed earlier
+            self._write([])
+
+    def _write(self, batch: List[Dict[str, str]]) -> None:
+        # Failed records are kept and go out ahead of the next batch; batch items are marked done either
+        # way, so flush() reports "processed" and never waits on a store that keeps failing
+        records = self._retry + batch
+        started = time.perf_counter()
+        error = ""
+        try:
+            self.logger.write_records(records)
+        except Exception as e:
+            error = f"{e.__class__.__name__}: {e}"
+        latency = time.perf_counter() - started
+        with self._stats_lock:
+            self._flushes += 1
+            self._flush_last = latency
+            self._flush_total += latency
+            self._flush_max = max(self._flush_max, latency)
+            if not error:
+                self._written += len(records)
+                self._retry = []
+            else:
+                self._errors += 1
+                self._last_error = error
+                overflow = len(records) - self._max_retry
+                if overflow > 0:
+                    self._dropped += overflow
+                    records = records[overflow:]
+                self._retry = records
+        if not error:
+            self._export_if_due()
+        for _ in batch:
+            self._queue.task_done()
+
+    def _export_if_due(self) -> None:
+        # Counted apart from flush errors: the records are already in the store, so a failed workbook
+        # export must not put them back into _retry and append them a second time
+        try:
+            self.logger.export_if_due()
+        except Exception as e:
+            with self._stats_lock:
+                self._export_errors += 1
+                self._last_error = f"export {e.__class__.__name__}: {e}"
+
+    def flush(self) -> None:
+        # Waits until everything queued so far has been written
+        self._queue.join()
+
+    def export(self, filepath: Optional[str] = None) -> str:
+        self.flush()
+        return self.logger.export(filepath)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+        # Anything still queued (the writer thread died, or stopped at _STOP inside a batch) is written here
+        leftover: List[Dict[str, str]] = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.task_done()
+            else:
+                leftover.append(item)
+        if leftover or self._retry:
+            self._write(leftover)
+
+    def stats(self) -> LogWriterStats:
+        with self._stats_lock:
+            return LogWriterStats(
+                queue_depth=self._queue.qsize(),
+                max_queue_depth=self._max_depth,
+                records_written=self._written,
+                flushes=self._flushes,
+                errors=self._errors,
+                last_flush_latency=self._flush_last,
+                avg_flush_latency=(self._flush_total / self._flushes) if self._flushes else 0.0,
+                max_flush_latency=self._flush_max,
+                last_error=self._last_error,
+                export_errors=self._export_errors,
+                retrying=len(self._retry),
+                dropped=self._dropped,
+            )
+
+
+_default_writer: Optional[AsyncLogWriter] = None
+_default_lock = threading.Lock()
+
+
+def get_default_writer() -> AsyncLogWriter:
+    # One writer thread per process, shared across Streamlit reruns and sessions
+    global _default_writer
+    with _default_lock:
+        if _default_writer is None:
+            _default_writer = AsyncLogWriter()
+        return _default_writer
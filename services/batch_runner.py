@@ -0,0 +1,285 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from models.email_models import (
+    Attachment,
+    BatchProgress,
+    BulkSendSummary,
+    DraftResult,
+    GeneratedEmail,
+    Provider,
+    SendResult,
+    SmtpEndpoint,
+)
+from services.draft_generator import DraftGenerator
+from services.email_sender import EmailSender
+from services.mail_merge import build_draft_requests, build_requests
+from config.app_config import BATCH_PROGRESS_INTERVAL, GENERATION_MAX_CONCURRENCY, SEND_MAX_WORKERS
+
+
+class CheckpointMismatch(ValueError):
+    pass
+
+
+def campaign_fingerprint(*parts: str) -> str:
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+class BatchCheckpoint:
+    # Append-only JSON lines, one per finished step: a recipient's draft once generated, "sent" once the
+    # server accepted the message. A rerun skips what is recorded; failures are not recorded, so they retry.
+    # Each stage also records a fingerprint of the campaign it ran for, so a different campaign on the same
+    # recipients file cannot inherit its drafts or its "sent" marks
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.drafts: Dict[str, GeneratedEmail] = {}
+        self.sent: Set[str] = set()
+        self.fingerprints: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        torn = self._load()
+        self._file = open(path, "a", encoding="utf-8")
+        if torn:
+            # The last run died mid-line; start the next record on a line of its own
+            self._file.write("\n")
+
+    def _load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "r", encoding="utf-8") as f:
+            text = f.read()
+        for line in text.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("stage") == "drafted":
+                self.drafts[entry["email"]] = GeneratedEmail(subject=entry["subject"], body=entry["body"])
+            elif entry.get("stage") == "sent":
+                self.sent.add(entry["email"])
+            elif entry.get("stage") == "campaign":
+                self.fingerprints[entry["for"]] = entry["fingerprint"]
+        return bool(text) and not text.endswith("\n")
+
+    def _write(self, entry: Dict[str, str]) -> None:
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def claim(self, stage: str, fingerprint: str) -> None:
+        # Raises CheckpointMismatch when `stage` already ran here for a different campaign
+        recorded = self.fingerprints.get(stage)
+        if recorded == fingerprint:
+            return
+        if recorded is not None:
+            raise CheckpointMismatch(
+                f"{self.path} holds progress of a different {stage} run (other purpose, template, sender or provider)"
+            )
+        self.fingerprints[stage] = fingerprint
+        self._write({"stage": "campaign", "for": stage, "fingerprint": fingerprint})
+
+    def record_draft(self, email_addr: str, draft: GeneratedEmail) -> None:
+        self.drafts[email_addr] = draft
+        self._write({"stage": "drafted", "email": email_addr, "subject": draft.subject, "body": draft.body})
+
+    def record_sent(self, email_addr: str) -> None:
+        self.sent.add(email_addr)
+        self._write({"stage": "sent", "email": email_addr, "at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+
+    def reset(self) -> None:
+        with self._lock:
+            self._file.seek(0)
+            self._file.truncate()
+        self.drafts.clear()
+        self.sent.clear()
+        self.fingerprints.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+
+
+class _Tracker:
+    # Counts results for one stage and hands a BatchProgress to the callback, throttled to `interval`
+    def __init__(
+        self,
+        stage: str,
+        total: int,
+        skipped: int,
+        callback: Optional[Callable[[BatchProgress], None]],
+        interval: float,
+    ) -> None:
+        self.progress = BatchProgress(stage=stage, total=total, skipped=skipped)
+        self.callback = callback
+        self.interval = interval
+        self.started = time.perf_counter()
+        self._last = 0.0
+        self._reported = 0
+
+    def update(self, ok: bool) -> None:
+        self.progress.done += 1
+        if ok:
+            self.progress.succeeded += 1
+        else:
+            self.progress.failed += 1
+        now = time.perf_counter()
+        if now - self._last >= self.interval:
+            self._report(now)
+
+    def skip(self, count: int) -> None:
+        # Recipients dropped after the stage started (the send filter); forces a final report
+        if count:
+            self.progress.skipped += count
+            self._reported = -1
+
+    def finish(self) -> BatchProgress:
+        if self._reported != self.progress.done or not self._last:
+            self._report(time.perf_counter())
+        return self.progress
+
+    def _report(self, now: float) -> None:
+        self._last = now
+        self._reported = self.progress.done
+        self.progress.elapsed = now - self.started
+        if self.callback is not None:
+            self.callback(self.progress)
+
+
+class BatchRunner:
+    # Headless generate/send over a recipients list (see cli.py). DraftGenerator and EmailSender do the
+    # parallel work, the checkpoint lets a rerun resume where the last one stopped, and sent messages go
+    # to the same send log as the UI's
+    def __init__(
+        self,
+        email_sender: Optional[EmailSender] = None,
+        ai_client: Any = None,
+        log_writer: Any = None,
+        checkpoint: Optional[BatchCheckpoint] = None,
+        on_progress: Optional[Callable[[BatchProgress], None]] = None,
+        progress_interval: float = BATCH_PROGRESS_INTERVAL,
+    ) -> None:
+        self.email_sender = email_sender
+        self.ai_client = ai_client
+        self.log_writer = log_writer
+        self.checkpoint = checkpoint
+        self.on_progress = on_progress
+        self.progress_interval = progress_interval
+
+    def generate(
+        self,
+        recipients: List[Dict[str, str]],
+        purpose: str,
+        tone: str = "Professional",
+        language: str = "Turkish",
+        additional_context: str = "",
+        email_length: str = "Medium (3-4 paragraphs)",
+        profile: Optional[Dict[str, Any]] = None,
+        max_concurrency: int = GENERATION_MAX_CONCURRENCY,
+        use_cache: bool = True,
+    ) -> Tuple[Dict[str, GeneratedEmail], List[DraftResult]]:
+        # Returns the drafts for every recipient that has one (including those from the checkpoint) and
+        # the failures of this run
+        if self.ai_client is None:
+            raise ValueError("BatchRunner needs an AI client to generate drafts")
+        if self.checkpoint is not None:
+            self.checkpoint.claim(
+                "generate", campaign_fingerprint(purpose, tone, language, additional_context, email_length)
+            )
+        drafts: Dict[str, GeneratedEmail] = dict(self.checkpoint.drafts) if self.checkpoint else {}
+        sent = self.checkpoint.sent if self.checkpoint else set()
+        pending = [r for r in recipients if r["email"] not in drafts and r["email"] not in sent]
+        draft_requests = build_draft_requests(
+            pending,
+            purpose=purpose,
+            tone=tone,
+            language=language,
+            additional_context=additional_context,
+            email_length=email_length,
+        )
+        tracker = _Tracker("generate", len(recipients), len(recipients) - len(pending), self.on_progress, self.progress_interval)
+        failures: List[DraftResult] = []
+        generator = DraftGenerator(self.ai_client, max_concurrency=max_concurrency)
+        for result in generator.iter_generate(draft_requests, profile=profile, use_cache=use_cache):
+            if result.ok:
+                drafts[result.request.recipient_email] = result.email
+                if self.checkpoint is not None:
+                    self.checkpoint.record_draft(result.request.recipient_email, result.email)
+            else:
+                failures.append(result)
+            tracker.update(result.ok)
+        tracker.finish()
+        failures.sort(key=lambda r: r.index)
+        return drafts, failures
+
+    def send(
+        self,
+        recipients: List[Dict[str, str]],
+        provider: Provider,
+        sender_email: str,
+        sender_password: str,
+        subject: str = "",
+        body: str = "",
+        attachments: Optional[List[Attachment]] = None,
+        drafts: Optional[Dict[str, GeneratedEmail]] = None,
+        max_workers: int = SEND_MAX_WORKERS,
+        log: bool = True,
+        screen: bool = True,
+        smtp_endpoint: Optional[SmtpEndpoint] = None,
+    ) -> BulkSendSummary:
+        # Personalized drafts win over the subject/body template, as in the UI. The summary covers this
+        # run only; recipients the checkpoint already marks as sent, and those the sender's filter drops
+        # (summary.skipped, unless screen=False), are counted as skipped
+        if self.email_sender is None:
+            raise ValueError("BatchRunner needs an EmailSender to send")
+        if self.checkpoint is not None:
+            self.checkpoint.claim("send", campaign_fingerprint(subject, body, sender_email, provider.value))
+        if drafts is None and self.checkpoint is not None:
+            drafts = self.checkpoint.drafts
+        sent = self.checkpoint.sent if self.checkpoint else set()
+        pending = [r for r in recipients if r["email"] not in sent]
+        requests = build_requests(
+            pending,
+            provider=provider,
+            sender_email=sender_email,
+            sender_password=sender_password,
+            subject=subject,
+            body=body,
+            attachments=attachments,
+            drafts=drafts,
+            smtp_endpoint=smtp_endpoint,
+        )
+        tracker = _Tracker("send", len(recipients), len(recipients) - len(pending), self.on_progress, self.progress_interval)
+
+        def on_result(result: SendResult) -> None:
+            if result.ok:
+                request = requests[result.index]
+                if self.checkpoint is not None:
+                    self.checkpoint.record_sent(request.recipient_email)
+                if log and self.log_writer is not None:
+                    self.log_writer.append(
+                        sender_email=sender_email,
+                        recipient_email=request.recipient_email,
+                        subject=request.subject,
+                        body=request.body,
+                        provider=provider.name,
+                    )
+            tracker.update(result.ok)
+
+        try:
+            summary = self.email_sender.send_many(requests, max_workers=max_workers, on_result=on_result, screen=screen)
+        finally:
+            # Also on Ctrl-C: what was sent must be in the send log before the process exits
+            if log and self.log_writer is not None:
+                self.log_writer.flush()
+        tracker.skip(len(summary.skipped))
+        tracker.finish()
+        return summary
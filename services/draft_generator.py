@@ -0,0 +1,76 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from models.email_models import DraftRequest, DraftResult
+from core.rate_limiter import TokenBucket
+from config.app_config import GENERATION_MAX_CONCURRENCY
+
+
+class DraftGenerator:
+    # Runs generate_email for many recipients concurrently on top of GeminiClient/GroqClient.
+    # Provider quotas are paced by the clients' QuotaScheduler; requests_per_minute adds a local cap
+    def __init__(
+        self,
+        client: Any,
+        max_concurrency: int = GENERATION_MAX_CONCURRENCY,
+        requests_per_minute: Optional[float] = None,
+    ) -> None:
+        self.client = client
+        self.max_concurrency = max(1, max_concurrency)
+        self.bucket = TokenBucket.per_minute(requests_per_minute) if requests_per_minute else None
+
+    def _generate_one(
+        self,
+        index: int,
+        draft: DraftRequest,
+        profile: Optional[Dict[str, Any]],
+        use_cache: bool,
+    ) -> DraftResult:
+        if self.bucket is not None:
+            self.bucket.acquire()
+        started = time.perf_counter()
+        try:
+            email = self.client.generate_email(
+                purpose=draft.purpose,
+                recipient_name=draft.recipient_name,
+                tone=draft.tone,
+                language=draft.language,
+                additional_context=draft.additional_context,
+                profile=profile,
+                email_length=draft.email_length,
+                use_cache=use_cache,
+            )
+            return DraftResult(index=index, request=draft, email=email, latency=time.perf_counter() - started)
+        except Exception as e:
+            return DraftResult(
+                index=index,
+                request=draft,
+                error=f"{e.__class__.__name__}: {e}",
+                latency=time.perf_counter() - started,
+            )
+
+    def iter_generate(
+        self,
+        drafts: Iterable[DraftRequest],
+        profile: Optional[Dict[str, Any]] = None,
+        use_cache: bool = True,
+    ) -> Iterator[DraftResult]:
+        # Results are yielded in completion order; a failed item never aborts the batch
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="draft-gen") as executor:
+            futures = [
+                executor.submit(self._generate_one, index, draft, profile, use_cache)
+                for index, draft in enumerate(drafts)
+            ]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def generate_many(
+        self,
+        drafts: Iterable[DraftRequest],
+        profile: Optional[Dict[str, Any]] = None,
+        use_cache: bool = True,
+    ) -> List[DraftResult]:
+        results = list(self.iter_generate(drafts, profile=profile, use_cache=use_cache))
+        results.sort(key=lambda r: r.index)
+        return results
@@ -1,39 +1,307 @@
-from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import smtplib
+import threading
+import time
 import traceback
 
-from models.email_models import EmailRequest, Provider
+from models.email_models import EmailRequest, Provider, SendResult, BulkSendSummary, SkippedRecipient, SmtpEndpoint
+from clients.custom_smtp_client import CustomSmtpClient
 from clients.gmail_client import GmailClient
 from clients.outlook_client import OutlookClient
+from clients.smtp_base import SmtpClient
+from clients.smtp_pool import SmtpConnectionPool
+from core.rate_limiter import QuotaExceeded, QuotaScheduler, get_default_scheduler
+from services.send_filter import SendFilter
+from config.app_config import BROADCAST_BATCH_SIZE, SEND_MAX_WORKERS, PROVIDER_SEND_CONCURRENCY, SEND_QUOTA_MAX_WAIT
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize_results(
+    results: List[SendResult],
+    elapsed: float,
+    skipped: Optional[List[SkippedRecipient]] = None,
+) -> BulkSendSummary:
+    latencies = sorted(r.latency for r in results)
+    succeeded = sum(1 for r in results if r.ok)
+    return BulkSendSummary(
+        total=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        elapsed=elapsed,
+        throughput=(succeeded / elapsed) if elapsed > 0 else 0.0,
+        latency_avg=(sum(latencies) / len(latencies)) if latencies else 0.0,
+        latency_p50=_percentile(latencies, 50),
+        latency_p95=_percentile(latencies, 95),
+        latency_max=latencies[-1] if latencies else 0.0,
+        results=sorted(results, key=lambda r: r.index),
+        skipped=skipped or [],
+    )
 
 
 class EmailSender:
-    def __init__(self) -> None:
-        self.gmail = GmailClient()
-        self.outlook = OutlookClient()
+    def __init__(
+        self,
+        pool: Optional[SmtpConnectionPool] = None,
+        scheduler: Optional[QuotaScheduler] = None,
+        custom: Optional[CustomSmtpClient] = None,
+        send_filter: Optional[SendFilter] = None,
+    ) -> None:
+        self.gmail = GmailClient(pool=pool)
+        self.outlook = OutlookClient(pool=pool)
+        self.custom = custom or CustomSmtpClient(pool=pool)
+        self.scheduler = scheduler or get_default_scheduler()
+        # Optional pre-send stage for send_many/broadcast: suppression list, send history and in-batch repeats
+        self.send_filter = send_filter
+
+    def pace(self, request: EmailRequest, max_wait: Optional[float] = None) -> float:
+        # Per-account SMTP quota; waits rather than letting the server reject the message, or raises
+        # QuotaExceeded when that would take longer than max_wait
+        return self.scheduler.acquire(
+            f"smtp:{request.provider.value}", request.sender_email, recipients=1, max_wait=max_wait
+        )
 
-    def send(self, request: EmailRequest) -> Tuple[bool, str]:
+    def send(self, request: EmailRequest, max_wait: Optional[float] = SEND_QUOTA_MAX_WAIT) -> Tuple[bool, str]:
+        # Interactive: an exhausted quota is reported with its predicted wait instead of blocking the caller
         try:
-            if request.provider == Provider.GMAIL:
-                self.gmail.send(
-                    sender_email=request.sender_email,
-                    sender_password=request.sender_password,
-                    recipient_email=request.recipient_email,
-                    subject=request.subject,
-                    body=request.body,
-                    attachments=request.attachments,
+            self.pace(request, max_wait)
+        except QuotaExceeded as e:
+            return False, str(e)
+        return self._deliver(request)
+
+    def configure_custom(self, host: str, port: int, security: str) -> None:
+        # Changes the default for every caller of this sender; a request can name its own smtp_endpoint instead
+        client = self.custom
+        client.HOST, client.PORT, client.security = host, int(port), security
+
+    def _client(self, provider: Provider, endpoint: Optional[SmtpEndpoint] = None) -> SmtpClient:
+        if provider == Provider.GMAIL:
+            return self.gmail
+        if provider == Provider.OUTLOOK:
+            return self.outlook
+        if provider == Provider.CUSTOM:
+            custom = self.custom
+            if endpoint is None or tuple(endpoint) == (custom.HOST, custom.PORT, custom.security):
+                return custom
+            # Another server for this request only; the pool is shared, so its sessions are still reused
+            host, port, security = endpoint
+            return CustomSmtpClient(host, int(port), security, pool=custom.pool)
+        raise ValueError("Unsupported provider")
+
+    def deliver(self, request: EmailRequest) -> None:
+        # Raises the SMTP error as is, so callers such as the outbox can tell transient from permanent
+        self._client(request.provider, request.smtp_endpoint).send(
+            sender_email=request.sender_email,
+            sender_password=request.sender_password,
+            recipient_email=request.recipient_email,
+            subject=request.subject,
+            body=request.body,
+            attachments=request.attachments,
+            message_id=request.message_id,
+        )
+
+    def _deliver(self, request: EmailRequest) -> Tuple[bool, str]:
+        if request.provider not in (Provider.GMAIL, Provider.OUTLOOK, Provider.CUSTOM):
+            return False, "Unsupported provider"
+        try:
+            self.deliver(request)
+            return True, ""
+        except Exception as e:
+            details = traceback.format_exc()
+            if self.send_filter is not None:
+                self.send_filter.record_failure(request.recipient_email, e)
+            return False, f"{e.__class__.__name__}: {e}\n{details}"
+
+    def _send_limited(
+        self,
+        index: int,
+        request: EmailRequest,
+        limits: Dict[str, threading.Semaphore],
+    ) -> SendResult:
+        # Paced before taking a connection slot, so a throttled account does not hold one while waiting
+        wait = self.pace(request)
+        semaphore = limits.get(request.provider.value)
+        if semaphore is not None:
+            semaphore.acquire()
+        try:
+            started = time.perf_counter()
+            ok, error = self._deliver(request)
+            latency = time.perf_counter() - started
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+        return SendResult(
+            index=index,
+            recipient_email=request.recipient_email,
+            ok=ok,
+            error=error,
+            latency=latency,
+            wait=wait,
+        )
+
+    def predict_drain(self, requests: Iterable[EmailRequest]) -> float:
+        # Seconds the account quotas will take to admit these requests (0 when within budget)
+        counts: Dict[Tuple[str, str], int] = {}
+        for request in requests:
+            key = (request.provider.value, request.sender_email)
+            counts[key] = counts.get(key, 0) + 1
+        return max(
+            (
+                self.scheduler.predict(f"smtp:{provider}", account, requests=n, recipients=n)
+                for (provider, account), n in counts.items()
+            ),
+            default=0.0,
+        )
+
+    def iter_send_many(
+        self,
+        requests: Iterable[EmailRequest],
+        max_workers: int = SEND_MAX_WORKERS,
+        provider_limits: Optional[Dict[str, int]] = None,
+    ) -> Iterator[SendResult]:
+        # Yields one result per request, in completion order
+        return self._iter_send(enumerate(requests), max_workers, provider_limits)
+
+    def _iter_send(
+        self,
+        indexed: Iterable[Tuple[int, EmailRequest]],
+        max_workers: int,
+        provider_limits: Optional[Dict[str, int]],
+        interrupted: Optional[List[SendResult]] = None,
+    ) -> Iterator[SendResult]:
+        limits_config = PROVIDER_SEND_CONCURRENCY if provider_limits is None else provider_limits
+        limits = {name: threading.Semaphore(max(1, n)) for name, n in limits_config.items()}
+        executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="email-send")
+        futures = [executor.submit(self._send_limited, index, request, limits) for index, request in indexed]
+        unreported = set(futures)
+        try:
+            for future in as_completed(futures):
+                unreported.discard(future)
+                yield future.result()
+        finally:
+            # On Ctrl-C (or when the caller stops iterating) queued sends are cancelled rather than sent
+            # with nobody recording them. Sends already on the wire finish, and their results go to
+            # `interrupted` so the caller can still record them
+            executor.shutdown(wait=True, cancel_futures=True)
+            if interrupted is not None:
+                interrupted.extend(
+                    f.result() for f in futures if f in unreported and not f.cancelled() and f.exception() is None
                 )
-            elif request.provider == Provider.OUTLOOK:
-                self.outlook.send(
+
+    def screen(self, messages: List[Tuple[str, str]]) -> Tuple[List[int], List[SkippedRecipient]]:
+        # (recipient, subject) per message -> indexes to send, and the rest with the reason they are skipped
+        if self.send_filter is None:
+            return list(range(len(messages))), []
+        return self.send_filter.screen(messages)
+
+    def send_many(
+        self,
+        requests: Iterable[EmailRequest],
+        max_workers: int = SEND_MAX_WORKERS,
+        provider_limits: Optional[Dict[str, int]] = None,
+        on_result: Optional[Callable[[SendResult], None]] = None,
+        screen: bool = True,
+    ) -> BulkSendSummary:
+        # Result indexes refer to positions in `requests`; recipients the send filter drops get no
+        # result and are listed in summary.skipped instead. screen=False sends to everyone
+        started = time.perf_counter()
+        requests = list(requests)
+        if screen:
+            allowed, skipped = self.screen([(r.recipient_email, r.subject) for r in requests])
+        else:
+            allowed, skipped = list(range(len(requests))), []
+        results: List[SendResult] = []
+
+        def record(result: SendResult) -> None:
+            if result.ok and self.send_filter is not None:
+                self.send_filter.record_sent(result.recipient_email, requests[result.index].subject)
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+
+        interrupted: List[SendResult] = []
+        sends = self._iter_send(((index, requests[index]) for index in allowed), max_workers, provider_limits, interrupted)
+        try:
+            for result in sends:
+                record(result)
+        except KeyboardInterrupt:
+            # Nothing new is sent after Ctrl-C, but messages already handed to the server are recorded
+            # (checkpoint, send log) so a rerun does not send them again
+            sends.close()
+            for result in sorted(interrupted, key=lambda r: r.index):
+                record(result)
+            raise
+        return summarize_results(results, time.perf_counter() - started, skipped)
+
+    def broadcast(
+        self,
+        request: EmailRequest,
+        recipients: List[str],
+        batch_size: int = BROADCAST_BATCH_SIZE,
+        on_result: Optional[Callable[[SendResult], None]] = None,
+        screen: bool = True,
+    ) -> BulkSendSummary:
+        # One message to many recipients: sender, subject, body and attachments come from `request`
+        # (its recipient_email is unused) and each batch is a single pipelined SMTP transaction.
+        # Results are per recipient, in the order given, with the server's reply for refused addresses;
+        # as in send_many, recipients the send filter drops are in summary.skipped instead
+        started = time.perf_counter()
+        results: List[SendResult] = []
+        if screen:
+            allowed, skipped = self.screen([(address, request.subject) for address in recipients])
+        else:
+            allowed, skipped = list(range(len(recipients))), []
+        batch_size = max(1, batch_size)
+        for start in range(0, len(allowed), batch_size):
+            indexes = allowed[start:start + batch_size]
+            batch = [recipients[i] for i in indexes]
+            wait = self.scheduler.acquire(
+                f"smtp:{request.provider.value}", request.sender_email, recipients=len(batch)
+            )
+            sent_at = time.perf_counter()
+            try:
+                refused = self._client(request.provider, request.smtp_endpoint).broadcast(
                     sender_email=request.sender_email,
                     sender_password=request.sender_password,
-                    recipient_email=request.recipient_email,
+                    recipients=batch,
                     subject=request.subject,
                     body=request.body,
                     attachments=request.attachments,
+                    message_id=request.message_id,
                 )
-            else:
-                return False, "Unsupported provider"
-            return True, ""
-        except Exception as e:
-            details = traceback.format_exc()
-            return False, f"{e.__class__.__name__}: {e}\n{details}"
+                failure = ""
+            except smtplib.SMTPRecipientsRefused as e:
+                # No recipient in the batch was accepted; each gets the server's reply
+                refused = e.recipients
+                failure = f"{e.__class__.__name__}: {e}"
+            except Exception as e:
+                refused = {}
+                failure = f"{e.__class__.__name__}: {e}"
+            latency = time.perf_counter() - sent_at
+            if refused and self.send_filter is not None:
+                self.send_filter.record_refused(refused, len(batch))
+            for index, address in zip(indexes, batch):
+                error = failure
+                if address in refused:
+                    code, message = refused[address]
+                    error = f"{code} {message.decode('utf-8', 'replace')}"
+                elif not error and self.send_filter is not None:
+                    self.send_filter.record_sent(address, request.subject)
+                result = SendResult(
+                    index=index,
+                    recipient_email=address,
+                    ok=not error,
+                    error=error,
+                    latency=latency,
+                    wait=wait,
+                )
+                results.append(result)
+                if on_result is not None:
+                    on_result(result)
+        return summarize_results(results, time.perf_counter() - started, skipped)
@@ -1,26 +1,53 @@
 import os
+import time
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Optional
 
-import pandas as pd
+from config.app_config import EXCEL_LOG_PATH, SEND_LOG_DB_PATH, EXCEL_EXPORT_INTERVAL
+from core.metrics import default_metrics
+from services.send_log_store import SendLogStore, LOG_COLUMNS
 
 
 class ExcelLogger:
-    def __init__(self, log_filepath: str = "logs/sent_emails.xlsx") -> None:
+    def __init__(
+        self,
+        log_filepath: str = EXCEL_LOG_PATH,
+        db_path: str = SEND_LOG_DB_PATH,
+        export_interval: float = EXCEL_EXPORT_INTERVAL,
+    ) -> None:
         self.log_filepath = log_filepath
+        self.export_interval = export_interval
+        self._last_export = time.monotonic()
         directory = os.path.dirname(self.log_filepath)
         if directory and not os.path.exists(directory):
             os.makedirs(directory, exist_ok=True)
+        self.store = SendLogStore(db_path)
+        self._import_legacy_workbook()
 
-    def append(
-        self,
+    def _import_legacy_workbook(self) -> None:
+        # One-time migration of a workbook written by the old read-concat-rewrite logger
+        if not os.path.exists(self.log_filepath) or self.store.count() > 0:
+            return
+        import pandas as pd
+
+        try:
+            df_old = pd.read_excel(self.log_filepath, dtype=str)
+        except Exception:
+            # Never overwrite history we could not read; keep it next to the new export
+            base, ext = os.path.splitext(self.log_filepath)
+            os.replace(self.log_filepath, f"{base}.unreadable-{int(time.time())}{ext}")
+            return
+        self.store.append_many(df_old.reindex(columns=list(LOG_COLUMNS)).to_dict(orient="records"))
+
+    @staticmethod
+    def build_record(
         sender_email: str,
         recipient_email: str,
         subject: str,
         body: str,
         provider: str,
-    ) -> None:
-        row = {
+    ) -> Dict[str, str]:
+        return {
             "timestamp": datetime.utcnow().isoformat(),
             "provider": provider,
             "sender": sender_email,
@@ -29,15 +56,35 @@ class ExcelLogger:
             "body": body,
         }
 
-        df_new = pd.DataFrame([row])
-        if os.path.exists(self.log_filepath):
-            try:
-                df_old = pd.read_excel(self.log_filepath)
-                df_all = pd.concat([df_old, df_new], ignore_index=True)
-            except Exception:
-                # If file is corrupted/unreadable, start fresh
-                df_all = df_new
-        else:
-            df_all = df_new
-
-        df_all.to_excel(self.log_filepath, index=False)
+    def write_records(self, records: List[Dict[str, str]]) -> None:
+        # Only the store append: once it commits the records are safe, whatever the workbook export does
+        with default_metrics.span("log_write"):
+            self.store.append_many(records)
+
+    def export_if_due(self) -> Optional[str]:
+        if self.export_interval and time.monotonic() - self._last_export >= self.export_interval:
+            return self.export()
+        return None
+
+    def append(
+        self,
+        sender_email: str,
+        recipient_email: str,
+        subject: str,
+        body: str,
+        provider: str,
+    ) -> None:
+        self.write_records([self.build_record(sender_email, recipient_email, subject, body, provider)])
+        self.export_if_due()
+
+    def export(self, filepath: Optional[str] = None) -> str:
+        # pandas and the xlsx engine are only loaded when a workbook is actually written
+        import pandas as pd
+
+        target = filepath or self.log_filepath
+        df_all = pd.DataFrame(self.store.records(), columns=list(LOG_COLUMNS))
+        tmp_path = f"{target}.tmp.xlsx"
+        df_all.to_excel(tmp_path, index=False)
+        os.replace(tmp_path, target)
+        self._last_export = time.monotonic()
+        return target
@@ -0,0 +1,88 @@
+import json
+import os
+import threading
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+
+class CachedJsonStore:
+    # Keeps the parsed JSON in memory and only re-reads the file when a stat() shows it changed.
+    # Writes go to a temp file that is renamed over the target, so readers never see a partial file.
+    def __init__(self, filepath: str) -> None:
+        self.filepath = filepath
+        directory = os.path.dirname(self.filepath)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._data: Optional[Dict[str, Any]] = None
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self.version = 0
+
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.filepath)
+        except OSError:
+            return None
+        # Every atomic save creates a new inode, so (mtime, size, inode) catches same-second rewrites too
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def _current(self) -> Dict[str, Any]:
+        stamp = self._stat()
+        if self._data is not None and stamp == self._stamp:
+            return self._data
+        data: Dict[str, Any] = {}
+        if stamp is not None:
+            try:
+                with open(self.filepath, "r", encoding="utf-8") as f:
+                    loaded = json.load(f)
+                if isinstance(loaded, dict):
+                    data = loaded
+            except Exception:
+                data = {}
+        if data != self._data:
+            self.version += 1
+        self._data = data
+        self._stamp = stamp
+        return data
+
+    def load(self) -> Dict[str, Any]:
+        with self._lock:
+            # Shallow copy so callers cannot mutate the cached dict
+            return dict(self._current())
+
+    def save(self, data: Dict[str, Any]) -> None:
+        with self._lock:
+            directory = os.path.dirname(self.filepath) or "."
+            tmp_path = os.path.join(directory, f".tmp-{uuid.uuid4().hex}.json")
+            # Created like open() would (0666 less the umask), unlike mkstemp's 0600; os.replace keeps it
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                try:
+                    # An existing file keeps whatever mode it was given
+                    os.chmod(tmp_path, os.stat(self.filepath).st_mode & 0o7777)
+                except FileNotFoundError:
+                    pass
+                os.replace(tmp_path, self.filepath)
+            except Exception:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+            self._data = dict(data)
+            self._stamp = self._stat()
+            self.version += 1
+
+    def update(self, changes: Dict[str, Any]) -> Dict[str, Any]:
+        # Merges into the cached copy; the file is only re-parsed if someone else changed it
+        with self._lock:
+            current = self._current()
+            if all(k in current and current[k] == v for k, v in changes.items()):
+                return dict(current)
+            merged = {**current, **changes}
+            self.save(merged)
+            return dict(merged)
@@ -0,0 +1,115 @@
+import csv
+import io
+import os
+from typing import Any, Dict, List, Optional
+
+from models.email_models import Attachment, DraftRequest, EmailRequest, GeneratedEmail, Provider, SmtpEndpoint
+
+EMAIL_COLUMNS = ("email", "recipient_email", "e-mail", "mail")
+NAME_COLUMNS = ("name", "recipient_name", "full_name")
+
+
+class _KeepMissing(dict):
+    def __missing__(self, key: str) -> str:
+        return "{" + key + "}"
+
+
+def _normalize_row(row: Dict[str, Any]) -> Dict[str, str]:
+    fields: Dict[str, str] = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        if value is None or (isinstance(value, float) and value != value):
+            value = ""
+        fields[str(key).strip().lower().replace(" ", "_")] = str(value).strip()
+    for column in EMAIL_COLUMNS:
+        if fields.get(column):
+            fields["email"] = fields[column]
+            break
+    for column in NAME_COLUMNS:
+        if fields.get(column):
+            fields["name"] = fields[column]
+            break
+    fields.setdefault("name", "")
+    return fields
+
+
+def load_recipients(filename: str, data: bytes) -> List[Dict[str, str]]:
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext in (".xlsx", ".xls"):
+        import pandas as pd
+
+        df = pd.read_excel(io.BytesIO(data), dtype=str)
+        rows = df.to_dict(orient="records")
+    else:
+        text = data.decode("utf-8-sig")
+        rows = list(csv.DictReader(io.StringIO(text)))
+    recipients = [_normalize_row(row) for row in rows]
+    return [r for r in recipients if r.get("email")]
+
+
+def render_template(text: str, fields: Dict[str, str]) -> str:
+    # {name}, {company}, ... are replaced by column values; unknown placeholders stay as written
+    try:
+        return (text or "").format_map(_KeepMissing(fields))
+    except (ValueError, IndexError, AttributeError):
+        return text or ""
+
+
+def build_requests(
+    recipients: List[Dict[str, str]],
+    provider: Provider,
+    sender_email: str,
+    sender_password: str,
+    subject: str,
+    body: str,
+    attachments: Optional[List[Attachment]] = None,
+    drafts: Optional[Dict[str, GeneratedEmail]] = None,
+    smtp_endpoint: Optional[SmtpEndpoint] = None,
+) -> List[EmailRequest]:
+    # Personalized drafts (keyed by recipient email) win over the shared subject/body template
+    drafts = drafts or {}
+    requests = []
+    for fields in recipients:
+        draft = drafts.get(fields["email"])
+        requests.append(
+            EmailRequest(
+                provider=provider,
+                sender_email=sender_email,
+                sender_password=sender_password,
+                recipient_email=fields["email"],
+                subject=draft.subject if draft else render_template(subject, fields),
+                body=draft.body if draft else render_template(body, fields),
+                attachments=attachments,
+                smtp_endpoint=smtp_endpoint,
+            )
+        )
+    return requests
+
+
+def build_draft_requests(
+    recipients: List[Dict[str, str]],
+    purpose: str,
+    tone: str,
+    language: str,
+    additional_context: str,
+    email_length: str,
+) -> List[DraftRequest]:
+    drafts = []
+    for fields in recipients:
+        details = [f"{k}: {v}" for k, v in fields.items() if v and k not in EMAIL_COLUMNS + NAME_COLUMNS]
+        context = render_template(additional_context, fields)
+        if details:
+            context = (context + "\n\nRECIPIENT DETAILS:\n" + "\n".join(details)).strip()
+        drafts.append(
+            DraftRequest(
+                purpose=render_template(purpose, fields),
+                recipient_name=fields.get("name", ""),
+                recipient_email=fields["email"],
+                tone=tone,
+                language=language,
+                additional_context=context,
+                email_length=email_length,
+            )
+        )
+    return drafts
@@ -0,0 +1,532 @@
+import hashlib
+import os
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from models.email_models import Attachment, EmailRequest, OutboxItem, OutboxStats, Provider
+from services.email_sender import EmailSender
+from core.metrics import default_metrics
+from config.app_config import (
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_DB_PATH,
+    OUTBOX_LEASE_SECONDS,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_POLL_INTERVAL,
+    OUTBOX_RETRY_BASE,
+    OUTBOX_RETRY_MAX,
+    SEND_MAX_WORKERS,
+)
+
+_ITEM_COLUMNS = (
+    "id", "idempotency_key", "state", "provider", "sender", "recipient", "subject", "body",
+    "attempts", "last_error", "message_id", "smtp_host", "smtp_port", "smtp_security",
+)
+# Added after the first release: (column, definition) for databases created without them
+_LATER_COLUMNS = (
+    ("smtp_host", "TEXT NOT NULL DEFAULT ''"),
+    ("smtp_port", "INTEGER NOT NULL DEFAULT 0"),
+    ("smtp_security", "TEXT NOT NULL DEFAULT ''"),
+)
+
+
+def is_transient(error: Exception) -> bool:
+    # 4xx replies and dropped connections are worth retrying; 5xx, auth and local errors are not
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(400 <= code < 500 for code in codes)
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    return isinstance(error, OSError)
+
+
+def _content_digest(att: Attachment, memo: Optional[Dict[int, str]] = None) -> str:
+    # Memoized by attachment object: file-backed attachments all share an empty `content`
+    if memo is None:
+        return hashlib.sha256(att.data()).hexdigest()
+    digest = memo.get(id(att))
+    if digest is None:
+        digest = memo[id(att)] = hashlib.sha256(att.data()).hexdigest()
+    return digest
+
+
+class Outbox:
+    # Durable SQLite (WAL) queue of outgoing messages: queued -> sending -> sent | failed.
+    # Each item has an idempotency key, so enqueueing the same message again is a no-op, also after it
+    # was sent and across restarts, and a stable Message-ID. Sending it again on purpose takes force=True
+    # or a new caller-supplied key. Passwords are never stored; the worker asks for them when it sends.
+    def __init__(self, db_path: str = OUTBOX_DB_PATH, lease_seconds: float = OUTBOX_LEASE_SECONDS) -> None:
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        # Identifies this process's leases, so only abandoned ones are taken over
+        self.owner = uuid.uuid4().hex
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                state TEXT NOT NULL DEFAULT 'queued',
+                provider TEXT NOT NULL,
+                sender TEXT NOT NULL,
+                recipient TEXT NOT NULL,
+                subject TEXT,
+                body TEXT,
+                message_id TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT NOT NULL DEFAULT '',
+                next_attempt_at REAL NOT NULL,
+                lease_owner TEXT,
+                lease_until REAL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                sent_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS outbox_due ON outbox (state, next_attempt_at);
+            CREATE TABLE IF NOT EXISTS outbox_blobs (
+                sha256 TEXT PRIMARY KEY,
+                content BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS outbox_attachments (
+                outbox_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                filename TEXT NOT NULL,
+                mime_type TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                PRIMARY KEY (outbox_id, position)
+            );
+            CREATE INDEX IF NOT EXISTS outbox_attachments_blob ON outbox_attachments (sha256);
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")}
+        for name, definition in _LATER_COLUMNS:
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE outbox ADD COLUMN {name} {definition}")
+
+    @staticmethod
+    def make_key(request: EmailRequest, digests: Optional[Dict[int, str]] = None) -> str:
+        # Same provider, sender, recipient and content -> same key. `digests` memoizes attachment hashes
+        # by object id, so a batch sharing one attachment hashes it once
+        digest = hashlib.sha256()
+        for part in (request.provider.value, request.sender_email.lower(), request.recipient_email.lower(),
+                     request.subject or "", request.body or ""):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        if request.smtp_endpoint:
+            digest.update("{}:{}:{}".format(*request.smtp_endpoint).encode("utf-8"))
+        for att in request.attachments or []:
+            digest.update(att.filename.encode("utf-8"))
+            digest.update(_content_digest(att, digests).encode("ascii"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _message_id(key: str, sender: str) -> str:
+        domain = sender.rsplit("@", 1)[-1] if "@" in sender else "localhost"
+        return f"<outbox.{key[:32]}@{domain}>"
+
+    @staticmethod
+    def _resend_key(key: str) -> str:
+        # A fresh key (and so a fresh Message-ID) for a deliberate resend of an already known message
+        return f"{key}:resend:{uuid.uuid4().hex}"
+
+    def enqueue(
+        self, request: EmailRequest, idempotency_key: Optional[str] = None, force: bool = False
+    ) -> Tuple[int, bool]:
+        # Returns (item id, newly queued); an existing key returns the original item untouched
+        key = idempotency_key or self.make_key(request)
+        if force:
+            key = self._resend_key(key)
+        inserted = self.enqueue_many([request], [key])
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM outbox WHERE idempotency_key = ?", (key,)).fetchone()
+        return row[0], inserted == 1
+
+    def enqueue_many(
+        self,
+        requests: Iterable[EmailRequest],
+        idempotency_keys: Optional[List[str]] = None,
+        force: bool = False,
+    ) -> int:
+        # One transaction for the whole batch; attachment bodies are stored once per distinct content.
+        # force=True queues every request even if the same message is already in the outbox or was sent.
+        requests = list(requests)
+        digests: Dict[int, str] = {}
+        keys = idempotency_keys or [self.make_key(r, digests) for r in requests]
+        if force:
+            keys = [self._resend_key(key) for key in keys]
+        now = time.time()
+        inserted = 0
+        stored = set()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for request, key in zip(requests, keys):
+                    host, port, security = request.smtp_endpoint or ("", 0, "")
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO outbox (idempotency_key, provider, sender, recipient, subject, body, "
+                        "message_id, smtp_host, smtp_port, smtp_security, next_attempt_at, created_at, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            key,
+                            request.provider.value,
+                            request.sender_email,
+                            request.recipient_email,
+                            request.subject,
+                            request.body,
+                            request.message_id or self._message_id(key, request.sender_email),
+                            host,
+                            int(port),
+                            security,
+                            now,
+                            now,
+                            now,
+                        ),
+                    )
+                    if cursor.rowcount != 1:
+                        continue
+                    inserted += 1
+                    for position, att in enumerate(request.attachments or []):
+                        sha = _content_digest(att, digests)
+                        if sha not in stored:
+                            self._conn.execute(
+                                "INSERT OR IGNORE INTO outbox_blobs (sha256, content) VALUES (?, ?)",
+                                (sha, sqlite3.Binary(att.data())),
+                            )
+                            stored.add(sha)
+                        self._conn.execute(
+                            "INSERT INTO outbox_attachments VALUES (?, ?, ?, ?, ?)",
+                            (cursor.lastrowid, position, att.filename, att.mime_type, sha),
+                        )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return inserted
+
+    def claim(self, limit: int = OUTBOX_BATCH_SIZE) -> List[OutboxItem]:
+        # Moves due items to "sending" under this process's lease
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    f"SELECT {', '.join(_ITEM_COLUMNS)} FROM outbox WHERE state = 'queued' AND next_attempt_at <= ? "
+                    "ORDER BY next_attempt_at, id LIMIT ?",
+                    (now, limit),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE outbox SET state = 'sending', lease_owner = ?, lease_until = ?, updated_at = ? "
+                    "WHERE id = ?",
+                    [(self.owner, now + self.lease_seconds, now, row[0]) for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            items = [OutboxItem(**dict(zip(_ITEM_COLUMNS, row))) for row in rows]
+            for item in items:
+                item.state = "sending"
+            self._load_attachments(items)
+        return items
+
+    def _load_attachments(self, items: List[OutboxItem]) -> None:
+        by_id = {item.id: item for item in items}
+        if not by_id:
+            return
+        rows = self._conn.execute(
+            "SELECT a.outbox_id, a.filename, a.mime_type, b.content FROM outbox_attachments a "
+            f"JOIN outbox_blobs b ON b.sha256 = a.sha256 WHERE a.outbox_id IN ({', '.join('?' * len(by_id))}) "
+            "ORDER BY a.outbox_id, a.position",
+            list(by_id),
+        ).fetchall()
+        for outbox_id, filename, mime_type, content in rows:
+            item = by_id[outbox_id]
+            if item.attachments is None:
+                item.attachments = []
+            item.attachments.append(Attachment(filename=filename, content=bytes(content), mime_type=mime_type))
+
+    def _finish(self, item_id: int, state: str, error: str = "", delay: float = 0.0, attempt: bool = True) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE outbox SET state = ?, last_error = ?, next_attempt_at = ?, attempts = attempts + ?, "
+                    "lease_owner = NULL, lease_until = NULL, updated_at = ?, sent_at = ? WHERE id = ?",
+                    (state, error, now + delay, 1 if attempt else 0, now, now if state == "sent" else None, item_id),
+                )
+                if state == "sent":
+                    # Failed items keep their attachments, retry_failed() may queue them again
+                    self._drop_attachments(item_id)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _drop_attachments(self, item_id: int) -> None:
+        # Blobs are shared by content, so one is deleted only when no other item refers to it any more
+        shas = [row[0] for row in self._conn.execute(
+            "SELECT DISTINCT sha256 FROM outbox_attachments WHERE outbox_id = ?", (item_id,)
+        )]
+        if not shas:
+            return
+        self._conn.execute("DELETE FROM outbox_attachments WHERE outbox_id = ?", (item_id,))
+        self._conn.execute(
+            f"DELETE FROM outbox_blobs WHERE sha256 IN ({', '.join('?' * len(shas))}) AND NOT EXISTS "
+            "(SELECT 1 FROM outbox_attachments a WHERE a.sha256 = outbox_blobs.sha256)",
+            shas,
+        )
+
+    def mark_sent(self, item_id: int) -> None:
+        self._finish(item_id, "sent")
+
+    def mark_retry(self, item_id: int, error: str, delay: float) -> None:
+        self._finish(item_id, "queued", error=error, delay=delay)
+
+    def mark_failed(self, item_id: int, error: str) -> None:
+        self._finish(item_id, "failed", error=error)
+
+    def release(self, item_id: int, delay: float, reason: str = "") -> None:
+        # Back to the queue without counting an attempt (e.g. no credentials yet)
+        self._finish(item_id, "queued", error=reason, delay=delay, attempt=False)
+
+    def renew_leases(self) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET lease_until = ? WHERE state = 'sending' AND lease_owner = ?",
+                (time.time() + self.lease_seconds, self.owner),
+            )
+
+    def recover(self) -> int:
+        # Items whose lease ran out belong to a process that died mid-send: requeue them. Whether the
+        # server accepted the message is unknown, so the resend reuses the same Message-ID.
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE outbox SET state = 'queued', lease_owner = NULL, lease_until = NULL, updated_at = ?, "
+                "last_error = 'Recovered after an interrupted send' WHERE state = 'sending' AND lease_until < ?",
+                (now, now),
+            )
+            return cursor.rowcount
+
+    def retry_failed(self) -> int:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE outbox SET state = 'queued', attempts = 0, last_error = '', next_attempt_at = ?, "
+                "updated_at = ? WHERE state = 'failed'",
+                (now, now),
+            )
+            return cursor.rowcount
+
+    def get(self, item_id: int) -> Optional[OutboxItem]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_ITEM_COLUMNS)} FROM outbox WHERE id = ?", (item_id,)
+            ).fetchone()
+        return OutboxItem(**dict(zip(_ITEM_COLUMNS, row))) if row else None
+
+    def items(self, state: Optional[str] = None, limit: int = 100) -> List[OutboxItem]:
+        query = f"SELECT {', '.join(_ITEM_COLUMNS)} FROM outbox"
+        params: Tuple = ()
+        if state:
+            query += " WHERE state = ?"
+            params = (state,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id DESC LIMIT ?", params + (limit,)).fetchall()
+        return [OutboxItem(**dict(zip(_ITEM_COLUMNS, row))) for row in rows]
+
+    def next_due_in(self) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(next_attempt_at) FROM outbox WHERE state = 'queued'").fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def stats(self) -> OutboxStats:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT state, COUNT(*) FROM outbox GROUP BY state").fetchall())
+            retrying, oldest = self._conn.execute(
+                "SELECT COUNT(CASE WHEN attempts > 0 THEN 1 END), MIN(created_at) FROM outbox WHERE state = 'queued'"
+            ).fetchone()
+        return OutboxStats(
+            queued=counts.get("queued", 0),
+            sending=counts.get("sending", 0),
+            sent=counts.get("sent", 0),
+            failed=counts.get("failed", 0),
+            retrying=retrying or 0,
+            oldest_queued_age=(time.time() - oldest) if oldest else 0.0,
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class OutboxWorker:
+    # Drains an Outbox through EmailSender on a background thread. Transient failures are retried with
+    # jittered exponential backoff up to max_attempts; everything else is marked failed.
+    # credentials(provider, sender) returns the password, or None to leave the item queued for now.
+    def __init__(
+        self,
+        outbox: Outbox,
+        sender: Optional[EmailSender] = None,
+        credentials: Optional[Callable[[str, str], Optional[str]]] = None,
+        max_workers: int = SEND_MAX_WORKERS,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+        retry_base: float = OUTBOX_RETRY_BASE,
+        retry_max: float = OUTBOX_RETRY_MAX,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        poll_interval: float = OUTBOX_POLL_INTERVAL,
+        on_result: Optional[Callable[[OutboxItem], None]] = None,
+    ) -> None:
+        self.outbox = outbox
+        self.sender = sender or EmailSender()
+        self._passwords: Dict[Tuple[str, str], str] = {}
+        self.credentials = credentials or self._remembered_password
+        self.max_workers = max(1, max_workers)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = poll_interval
+        self.on_result = on_result
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="outbox-send")
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._random = random.Random()
+        self.errors = 0
+        self.last_error = ""
+
+    def set_credentials(self, provider: str, sender: str, password: str) -> None:
+        # Kept in memory only, for the default credentials callback
+        self._passwords[(provider, sender.lower())] = password
+        self._wake.set()
+
+    def _remembered_password(self, provider: str, sender: str) -> Optional[str]:
+        return self._passwords.get((provider, sender.lower()))
+
+    def _backoff(self, attempts: int) -> float:
+        ceiling = min(self.retry_max, self.retry_base * (2 ** max(0, attempts - 1)))
+        return self._random.uniform(ceiling / 2, ceiling)
+
+    def _process(self, item: OutboxItem) -> None:
+        try:
+            password = self.credentials(item.provider, item.sender)
+            if password is None:
+                self.outbox.release(item.id, delay=max(self.poll_interval, 30.0), reason="Waiting for credentials")
+                return
+            request = EmailRequest(
+                provider=Provider(item.provider),
+                sender_email=item.sender,
+                sender_password=password,
+                recipient_email=item.recipient,
+                subject=item.subject,
+                body=item.body,
+                attachments=item.attachments,
+                message_id=item.message_id,
+                smtp_endpoint=(item.smtp_host, item.smtp_port, item.smtp_security) if item.smtp_host else None,
+            )
+            self.sender.pace(request)
+            attempts = item.attempts + 1
+            try:
+                self.sender.deliver(request)
+            except Exception as e:
+                error = f"{e.__class__.__name__}: {e}"
+                if is_transient(e) and attempts < self.max_attempts:
+                    default_metrics.increment("outbox_retries")
+                    self.outbox.mark_retry(item.id, error, self._backoff(attempts))
+                else:
+                    default_metrics.increment("outbox_failures")
+                    self.outbox.mark_failed(item.id, error)
+            else:
+                self.outbox.mark_sent(item.id)
+            if self.on_result is not None:
+                updated = self.outbox.get(item.id)
+                if updated is not None:
+                    self.on_result(updated)
+        except Exception as e:
+            # Bookkeeping failed (e.g. database locked for too long); the lease will expire and requeue it
+            self.errors += 1
+            self.last_error = f"{e.__class__.__name__}: {e}"
+        finally:
+            with self._in_flight_lock:
+                self._in_flight -= 1
+            self._wake.set()
+
+    def run_once(self) -> int:
+        # Claims as many due items as there are free send slots; returns how many were dispatched
+        self.outbox.renew_leases()
+        with self._in_flight_lock:
+            free = self.max_workers * 2 - self._in_flight
+        if free <= 0:
+            return 0
+        items = self.outbox.claim(min(free, self.batch_size))
+        with self._in_flight_lock:
+            self._in_flight += len(items)
+        for item in items:
+            self._executor.submit(self._process, item)
+        return len(items)
+
+    def _run(self) -> None:
+        self.outbox.recover()
+        last_recover = time.monotonic()
+        while not self._stop.is_set():
+            if time.monotonic() - last_recover > self.outbox.lease_seconds / 2:
+                self.outbox.recover()
+                last_recover = time.monotonic()
+            if self.run_once() == 0:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-worker", daemon=True)
+        self._thread.start()
+
+    def notify(self) -> None:
+        # Call after enqueueing to skip the poll wait
+        self._wake.set()
+
+    def in_flight(self) -> int:
+        with self._in_flight_lock:
+            return self._in_flight
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        # Blocks until nothing is due or in flight (retries scheduled later do not count)
+        self.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            due = self.outbox.next_due_in()
+            if (due is None or due > 0) and self.in_flight() == 0:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            self._wake.set()
+            time.sleep(min(0.05, self.poll_interval))
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._executor.shutdown(wait=True)
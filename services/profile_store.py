@@ -1,24 +1,6 @@
-import json
-import os
-from typing import Any, Dict, Optional
+from services.json_store import CachedJsonStore
 
 
-class ProfileStore:
+class ProfileStore(CachedJsonStore):
     def __init__(self, filepath: str = "config/profile.json") -> None:
-        self.filepath = filepath
-        directory = os.path.dirname(self.filepath)
-        if directory and not os.path.exists(directory):
-            os.makedirs(directory, exist_ok=True)
-
-    def load(self) -> Dict[str, Any]:
-        if not os.path.exists(self.filepath):
-            return {}
-        try:
-            with open(self.filepath, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return {}
-
-    def save(self, data: Dict[str, Any]) -> None:
-        with open(self.filepath, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        super().__init__(filepath)
@@ -0,0 +1,340 @@
+import asyncio
+import copy
+import dataclasses
+import queue
+import random
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from models.email_models import GeneratedEmail, RouterStats, StreamedDraft
+from core.metrics import default_metrics
+from config.app_config import (
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    ROUTER_BACKOFF_BASE,
+    ROUTER_BACKOFF_MAX,
+    ROUTER_HEDGE_AFTER,
+    ROUTER_MAX_ATTEMPTS,
+)
+
+
+class ProviderUnavailable(RuntimeError):
+    def __init__(self, errors: List[str]) -> None:
+        self.errors = errors
+        super().__init__("All AI providers failed: " + ("; ".join(errors) or "no provider available"))
+
+
+class CircuitBreaker:
+    # closed -> open after `failure_threshold` consecutive failures; after `reset_timeout` it is
+    # half-open and lets exactly one trial request through, whose outcome closes or re-opens it
+    def __init__(
+        self,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+    ) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == "closed":
+                return True
+            if state == "open" or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.consecutive_failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.consecutive_failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        # The attempt was abandoned (lost a hedge race): no verdict, but free the half-open slot
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class ProviderRouter:
+    # Drop-in for GeminiClient/GroqClient (generate_email, generate_email_stream, agenerate_email)
+    # over several clients in priority order. A failed attempt fails over to the next healthy
+    # provider straight away; going back to a provider that already failed waits a jittered
+    # exponential backoff. With hedge_after set, a second provider is started when the first has
+    # not produced a token within that budget, and whichever finishes first wins.
+    def __init__(
+        self,
+        clients: List[Any],
+        max_attempts: int = ROUTER_MAX_ATTEMPTS,
+        backoff_base: float = ROUTER_BACKOFF_BASE,
+        backoff_max: float = ROUTER_BACKOFF_MAX,
+        hedge_after: Optional[float] = ROUTER_HEDGE_AFTER,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+    ) -> None:
+        if not clients:
+            raise ValueError("ProviderRouter needs at least one client")
+        self.clients = [self._raising(c) for c in clients]
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after or None
+        # One breaker per client, so two models of the same provider open and close independently
+        self.breakers: Dict[str, CircuitBreaker] = {
+            self._name(c): CircuitBreaker(failure_threshold, reset_timeout) for c in self.clients
+        }
+        self._random = random.Random()
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(
+            ("requests", "attempts", "retries", "failovers", "hedges", "hedge_wins", "failures"), 0
+        )
+
+    @staticmethod
+    def _name(client: Any) -> str:
+        # Identifies a client in breakers, stats and error messages, e.g. "gemini/gemini-2.0-flash"
+        model_name = getattr(client, "model_name", "")
+        return f"{client.PROVIDER}/{model_name}" if model_name else client.PROVIDER
+
+    @staticmethod
+    def _raising(client: Any) -> Any:
+        # The router must see failures, so a client that would return a canned draft gets a raising copy
+        if getattr(client, "raise_on_error", True):
+            return client
+        clone = copy.copy(client)
+        clone.raise_on_error = True
+        return clone
+
+    @property
+    def PROVIDER(self) -> str:
+        return self.clients[0].PROVIDER
+
+    @property
+    def model_name(self) -> str:
+        return self.clients[0].model_name
+
+    @property
+    def cache(self) -> Any:
+        # The primary client's draft cache (shared process-wide unless a client was given its own)
+        return self.clients[0].cache
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+        if name != "requests":
+            default_metrics.increment(f"router_{name}", amount)
+
+    def _backoff(self, retry: int) -> float:
+        # Full jitter: uniform over [0, min(max, base * 2^retry)]
+        return self._random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** retry)))
+
+    def _pick(self, exclude: Set[str], failed: Set[str]) -> Optional[Any]:
+        # Untried providers first, then ones that already failed this request, always in priority order
+        candidates = [c for c in self.clients if self._name(c) not in exclude and getattr(c, "configured", True)]
+        candidates.sort(key=lambda c: self._name(c) in failed)
+        for client in candidates:
+            if self.breakers[self._name(client)].allow():
+                return client
+        return None
+
+    def _next_attempt(self, launched: int, failed: Set[str], errors: List[str]) -> Any:
+        if launched >= self.max_attempts:
+            raise ProviderUnavailable(errors)
+        client = self._pick(set(), failed)
+        if client is None:
+            raise ProviderUnavailable(errors + ["every provider's circuit breaker is open"])
+        if launched:
+            self._count("failovers" if self._name(client) not in failed else "retries")
+        return client
+
+    def _stream_worker(
+        self,
+        attempt: int,
+        client: Any,
+        inputs: Dict[str, Any],
+        events: "queue.Queue",
+        cancel: threading.Event,
+    ) -> None:
+        stream = client.generate_email_stream(**inputs)
+        try:
+            for draft in stream:
+                if cancel.is_set():
+                    self.breakers[self._name(client)].release()
+                    return
+                events.put((attempt, draft, None))
+        except Exception as e:
+            events.put((attempt, None, e))
+        finally:
+            stream.close()
+
+    def generate_email(self, **inputs: Any) -> GeneratedEmail:
+        final = None
+        for final in self.generate_email_stream(**inputs):
+            pass
+        return final.email
+
+    def generate_email_stream(self, **inputs: Any) -> Iterator[StreamedDraft]:
+        # Partial drafts come from whichever attempt produced a token first; the final one from the winner
+        self._count("requests")
+        events: "queue.Queue" = queue.Queue()
+        cancel = threading.Event()
+        running: Dict[int, Any] = {}
+        failed: Set[str] = set()
+        errors: List[str] = []
+        launched = 0
+        leader: Optional[int] = None
+        hedge_at: Optional[float] = None
+        hedge_attempt: Optional[int] = None
+
+        def launch(client: Any) -> int:
+            nonlocal launched
+            attempt = launched
+            launched += 1
+            running[attempt] = client
+            self._count("attempts")
+            threading.Thread(
+                target=self._stream_worker,
+                args=(attempt, client, inputs, events, cancel),
+                name=f"router-{client.PROVIDER}",
+                daemon=True,
+            ).start()
+            return attempt
+
+        try:
+            while True:
+                if not running:
+                    client = self._next_attempt(launched, failed, errors)
+                    if self._name(client) in failed:
+                        time.sleep(self._backoff(len(errors) - 1))
+                    launch(client)
+                    leader = None
+                    hedge_at = time.monotonic() + self.hedge_after if self.hedge_after else None
+
+                timeout = None
+                if hedge_at is not None and leader is None and launched < self.max_attempts:
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                try:
+                    attempt, draft, error = events.get(timeout=timeout)
+                except queue.Empty:
+                    hedge_at = None
+                    client = self._pick(exclude={self._name(c) for c in running.values()}, failed=failed)
+                    if client is not None:
+                        hedge_attempt = launch(client)
+                        self._count("hedges")
+                    continue
+
+                client = running.get(attempt)
+                if client is None:
+                    continue
+                if error is not None:
+                    del running[attempt]
+                    self.breakers[self._name(client)].record_failure()
+                    self._count("failures")
+                    failed.add(self._name(client))
+                    errors.append(f"{self._name(client)}: {error}")
+                    if leader == attempt:
+                        leader = None
+                    continue
+                if draft.done:
+                    del running[attempt]
+                    self.breakers[self._name(client)].record_success()
+                    if attempt == hedge_attempt:
+                        self._count("hedge_wins")
+                    yield dataclasses.replace(draft, provider=client.PROVIDER)
+                    return
+                if leader is None:
+                    leader = attempt
+                if attempt == leader:
+                    yield dataclasses.replace(draft, provider=client.PROVIDER)
+        finally:
+            cancel.set()
+            for client in running.values():
+                self.breakers[self._name(client)].release()
+
+    async def agenerate_email(self, **inputs: Any) -> GeneratedEmail:
+        # Non-streaming, so the hedge budget applies to the whole call instead of the first token
+        self._count("requests")
+        tasks: Dict[asyncio.Task, Any] = {}
+        hedges: Set[asyncio.Task] = set()
+        failed: Set[str] = set()
+        errors: List[str] = []
+        launched = 0
+        hedge_at: Optional[float] = None
+
+        def launch(client: Any) -> asyncio.Task:
+            nonlocal launched
+            launched += 1
+            self._count("attempts")
+            task = asyncio.ensure_future(client.agenerate_email(**inputs))
+            tasks[task] = client
+            return task
+
+        try:
+            while True:
+                if not tasks:
+                    client = self._next_attempt(launched, failed, errors)
+                    if self._name(client) in failed:
+                        await asyncio.sleep(self._backoff(len(errors) - 1))
+                    launch(client)
+                    hedge_at = time.monotonic() + self.hedge_after if self.hedge_after else None
+
+                timeout = None
+                if hedge_at is not None and launched < self.max_attempts:
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedge_at = None
+                    client = self._pick(exclude={self._name(c) for c in tasks.values()}, failed=failed)
+                    if client is not None:
+                        hedges.add(launch(client))
+                        self._count("hedges")
+                    continue
+
+                for task in done:
+                    client = tasks.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        self.breakers[self._name(client)].record_success()
+                        if task in hedges:
+                            self._count("hedge_wins")
+                        return task.result()
+                    self.breakers[self._name(client)].record_failure()
+                    self._count("failures")
+                    failed.add(self._name(client))
+                    errors.append(f"{self._name(client)}: {error}")
+        finally:
+            for task, client in tasks.items():
+                task.cancel()
+                self.breakers[self._name(client)].release()
+
+    def stats(self) -> RouterStats:
+        with self._lock:
+            counters = dict(self._counters)
+        return RouterStats(
+            breaker_states={name: breaker.state for name, breaker in self.breakers.items()},
+            **counters,
+        )
@@ -0,0 +1,260 @@
+import math
+import os
+import re
+import smtplib
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from models.email_models import SkippedRecipient
+from core.metrics import default_metrics
+from services.send_log_store import SendLogStore
+from config.app_config import SEND_FILTER_ERROR_RATE, SEND_FILTER_SCOPE, SUPPRESSION_DB_PATH
+
+
+# RFC 3463 enhanced status at the start of a reply, e.g. b"5.1.1 User unknown"
+_ENHANCED_STATUS = re.compile(rb"\s*([245])\.(\d{1,3})\.(\d{1,3})\b")
+
+
+def is_mailbox_failure(code: int, message: bytes) -> bool:
+    # Only a permanent failure of the mailbox itself: 5.1.x (bad address, no such user) or 5.2.1 (mailbox
+    # disabled). A bare 5xx, 5.7.x (relaying denied, policy, reputation) and the rest say nothing about
+    # whether the address exists, and suppressing on them would drop good recipients for good
+    if code < 500:
+        return False
+    match = _ENHANCED_STATUS.match(message or b"")
+    if match is None or match.group(1) != b"5":
+        return False
+    return match.group(2) == b"1" or (match.group(2), match.group(3)) == (b"2", b"1")
+
+
+def hard_bounces(refused: Dict[str, Tuple[int, bytes]], recipients: int) -> List[str]:
+    # The refused addresses that bounced for good. When a transaction with several recipients had every
+    # one refused, the server is rejecting the sender or the message, not the mailboxes
+    if not refused or (recipients > 1 and len(refused) >= recipients):
+        return []
+    return [address for address, (code, message) in refused.items() if is_mailbox_failure(code, message)]
+
+
+def is_hard_bounce(error: Exception) -> bool:
+    # A single-recipient send refused at RCPT TO with a mailbox failure; anything else may succeed next time
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return len(error.recipients) == 1 and bool(hard_bounces(error.recipients, 1))
+    return False
+
+
+class BloomFilter:
+    # Fixed-size bit array, k probes per key by double hashing Python's str hash. That hash is salted per
+    # process, which is fine for a filter that is rebuilt on startup and never written to disk
+    def __init__(self, capacity: int, error_rate: float = SEND_FILTER_ERROR_RATE) -> None:
+        self.capacity = max(1, capacity)
+        self.error_rate = min(max(error_rate, 1e-9), 0.5)
+        self.size = max(64, int(math.ceil(-self.capacity * math.log(self.error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / self.capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _probes(self, key: str) -> Tuple[int, int]:
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        return h & 0xFFFFFFFF, (h >> 32) | 1
+
+    def add(self, key: str) -> None:
+        h1, h2 = self._probes(key)
+        bits, size = self.bits, self.size
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % size
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        # Most keys that were never added stop at the first or second probe
+        h1, h2 = self._probes(key)
+        bits, size = self.bits, self.size
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class SuppressionList:
+    # Addresses never to mail again, with why: hard bounces (recorded automatically) and opt-outs. An entry
+    # "@example.com" covers the whole domain. Small enough to hold in memory; the cached copy is re-read
+    # only when another connection has changed the database
+    def __init__(self, db_path: str = SUPPRESSION_DB_PATH) -> None:
+        self.db_path = db_path
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS suppressed (
+                address TEXT PRIMARY KEY,
+                reason TEXT NOT NULL,
+                added TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        self._entries: Optional[Dict[str, str]] = None
+        self._version = -1
+
+    def add(self, addresses: Iterable[str], reason: str) -> int:
+        # Returns how many were new; an address already on the list keeps its original reason
+        added = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())
+        rows = [(a, reason, added) for a in {_normalize(a) for a in addresses} if a]
+        if not rows:
+            return 0
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.executemany(
+                    "INSERT OR IGNORE INTO suppressed (address, reason, added) VALUES (?, ?, ?)", rows
+                )
+            self._entries = None
+        return cursor.rowcount
+
+    def remove(self, addresses: Iterable[str]) -> int:
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.executemany(
+                    "DELETE FROM suppressed WHERE address = ?", [(_normalize(a),) for a in addresses]
+                )
+            self._entries = None
+        return cursor.rowcount
+
+    def entries(self) -> Dict[str, str]:
+        # address (or @domain) -> reason
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if self._entries is None or version != self._version:
+                self._entries = dict(self._conn.execute("SELECT address, reason FROM suppressed"))
+                self._version = version
+            return self._entries
+
+    def reason(self, address: str) -> str:
+        # Why this address is suppressed, "" when it is not
+        entries = self.entries()
+        address = _normalize(address)
+        return entries.get(address) or entries.get("@" + address.rpartition("@")[2], "")
+
+    def count(self) -> int:
+        return len(self.entries())
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SendFilter:
+    # Pre-send stage for bulk sends: drops recipients on the suppression list, those the send history says
+    # already got this message (scope "message": same address and subject) or anything at all (scope
+    # "recipient"), and repeats within the batch. History keys live in a Bloom filter, so a new address
+    # costs a few hash probes; only filter hits are confirmed with an indexed lookup in the send log
+    def __init__(
+        self,
+        history: SendLogStore,
+        suppression: Optional[SuppressionList] = None,
+        scope: str = SEND_FILTER_SCOPE,
+        error_rate: float = SEND_FILTER_ERROR_RATE,
+    ) -> None:
+        if scope not in ("message", "recipient"):
+            raise ValueError(f"Unknown send filter scope: {scope}")
+        self.history = history
+        self.suppression = suppression or SuppressionList()
+        self.scope = scope
+        self.error_rate = error_rate
+        self._bloom: Optional[BloomFilter] = None
+        self._last_id = 0
+        # Sent by this process but maybe not flushed to the send log yet
+        self._recent: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def _key(self, recipient: str, subject: str) -> str:
+        address = _normalize(recipient)
+        return address if self.scope == "recipient" else f"{address}\n{subject}"
+
+    def refresh(self) -> None:
+        # Adds rows logged since the last call (by any process); rebuilds, twice as large, once full
+        with self._lock:
+            if self._bloom is None or self._bloom.count > self._bloom.capacity:
+                size = self.history.count() + len(self._recent)
+                capacity = max(10000, 2 * size, 2 * self._bloom.capacity if self._bloom else 0)
+                self._bloom = BloomFilter(capacity, self.error_rate)
+                self._last_id = 0
+                for key in self._recent:
+                    self._bloom.add(key)
+            bloom = self._bloom
+            for row_id, recipient, subject in self.history.iter_sent(self._last_id):
+                bloom.add(self._key(recipient, subject))
+                self._last_id = row_id
+
+    def screen(self, messages: List[Tuple[str, str]]) -> Tuple[List[int], List[SkippedRecipient]]:
+        # messages: (recipient, subject) per message. Returns the indexes to send and the skipped ones
+        with default_metrics.span("send_filter"):
+            self.refresh()
+            bloom = self._bloom
+            suppressed = self.suppression.entries()
+            allowed: List[int] = []
+            skipped: List[SkippedRecipient] = []
+            seen: Set[str] = set()
+            for index, (recipient, subject) in enumerate(messages):
+                address = _normalize(recipient)
+                key = self._key(recipient, subject)
+                reason = ""
+                if suppressed:
+                    why = suppressed.get(address) or suppressed.get("@" + address.rpartition("@")[2])
+                    if why:
+                        reason = f"suppressed: {why}"
+                if not reason and key in seen:
+                    reason = "duplicate in batch"
+                if not reason and key in bloom and self._was_sent(key, recipient, subject):
+                    reason = "already sent"
+                if reason:
+                    skipped.append(SkippedRecipient(index=index, recipient_email=recipient, reason=reason))
+                else:
+                    allowed.append(index)
+                seen.add(key)
+        if skipped:
+            default_metrics.increment("send_filter_skipped", len(skipped))
+        return allowed, skipped
+
+    def _was_sent(self, key: str, recipient: str, subject: str) -> bool:
+        # Exact check behind a Bloom filter hit
+        if key in self._recent:
+            return True
+        return self.history.has_sent(recipient.strip(), subject=None if self.scope == "recipient" else subject)
+
+    def record_sent(self, recipient: str, subject: str) -> None:
+        key = self._key(recipient, subject)
+        with self._lock:
+            self._recent.add(key)
+            if self._bloom is not None:
+                self._bloom.add(key)
+
+    def record_bounce(self, recipient: str) -> None:
+        self.suppression.add([recipient], "bounced")
+
+    def record_refused(self, refused: Dict[str, Tuple[int, bytes]], recipients: int) -> int:
+        # Suppresses the hard bounces among one transaction's refused recipients; returns how many
+        bounced = hard_bounces(refused, recipients)
+        if bounced:
+            self.suppression.add(bounced, "bounced")
+        return len(bounced)
+
+    def record_failure(self, recipient: str, error: Exception) -> bool:
+        # Suppresses the address on a hard bounce; True when it did
+        if not is_hard_bounce(error):
+            return False
+        self.record_bounce(recipient)
+        return True
+
+
+def _normalize(address: str) -> str:
+    return (address or "").strip().lower()
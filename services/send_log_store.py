@@ -0,0 +1,291 @@
+import os
+import sqlite3
+import threading
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from models.email_models import SentEmail
+from core.metrics import default_metrics
+from config.app_config import HISTORY_PAGE_SIZE, SEND_LOG_DB_PATH
+
+LOG_COLUMNS = ("timestamp", "provider", "sender", "recipient", "subject", "body")
+# Indexed lookups are case-insensitive, like the addresses they hold
+_INDEXES = {
+    "idx_sent_emails_recipient": "recipient COLLATE NOCASE",
+    "idx_sent_emails_domain": "domain",
+    "idx_sent_emails_sender": "sender COLLATE NOCASE",
+    "idx_sent_emails_provider": "provider COLLATE NOCASE",
+    "idx_sent_emails_timestamp": "timestamp",
+}
+# Placeholders per IN (...) lookup, under SQLite's default variable limit
+_IN_CHUNK = 500
+
+TimeBound = Union[str, date, None]
+
+
+class SendLogStore:
+    # Append-only SQLite (WAL) log: each append is a single INSERT regardless of history size. It is also
+    # the send history: recipient, domain, sender, provider and timestamp are indexed, and subject/body are
+    # full-text indexed (FTS5, kept in sync by triggers) when the SQLite build has it, LIKE scans otherwise
+    def __init__(self, db_path: str = SEND_LOG_DB_PATH) -> None:
+        self.db_path = db_path
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.create_function("email_domain", 1, _domain, deterministic=True)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sent_emails (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                provider TEXT,
+                sender TEXT,
+                recipient TEXT,
+                subject TEXT,
+                body TEXT,
+                domain TEXT
+            )
+            """
+        )
+        self._migrate()
+        self.full_text = self._create_full_text_index()
+        self._conn.commit()
+
+    def _migrate(self) -> None:
+        # Logs written before the history indexes existed have no domain column
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sent_emails)")}
+        if "domain" not in columns:
+            self._conn.execute("ALTER TABLE sent_emails ADD COLUMN domain TEXT")
+            self._conn.execute("UPDATE sent_emails SET domain = email_domain(recipient)")
+        for name, column in _INDEXES.items():
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON sent_emails ({column})")
+
+    def _create_full_text_index(self) -> bool:
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sent_emails_fts'"
+        ).fetchone()
+        if exists:
+            return True
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE sent_emails_fts USING fts5("
+                "subject, body, content='sent_emails', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+            )
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: search() falls back to LIKE
+            return False
+        self._conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS sent_emails_fts_insert AFTER INSERT ON sent_emails BEGIN
+                INSERT INTO sent_emails_fts (rowid, subject, body) VALUES (new.id, new.subject, new.body);
+            END
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS sent_emails_fts_delete AFTER DELETE ON sent_emails BEGIN
+                INSERT INTO sent_emails_fts (sent_emails_fts, rowid, subject, body)
+                VALUES ('delete', old.id, old.subject, old.body);
+            END
+            """
+        )
+        # Index whatever was logged before the table existed
+        self._conn.execute("INSERT INTO sent_emails_fts (sent_emails_fts) VALUES ('rebuild')")
+        return True
+
+    def append(self, record: Dict[str, Any]) -> None:
+        self.append_many([record])
+
+    def append_many(self, records: Iterable[Dict[str, Any]]) -> int:
+        rows = []
+        for r in records:
+            row = tuple(_text(r.get(c)) for c in LOG_COLUMNS)
+            rows.append(row + (_domain(row[3]),))
+        if not rows:
+            return 0
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT INTO sent_emails ({', '.join(LOG_COLUMNS)}, domain) "
+                    f"VALUES ({', '.join('?' * (len(LOG_COLUMNS) + 1))})",
+                    rows,
+                )
+        return len(rows)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sent_emails").fetchone()[0]
+
+    def iter_records(self, batch_size: int = 1000) -> Iterator[Dict[str, str]]:
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, {', '.join(LOG_COLUMNS)} FROM sent_emails WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield dict(zip(LOG_COLUMNS, row[1:]))
+            last_id = rows[-1][0]
+
+    def records(self) -> List[Dict[str, str]]:
+        return list(self.iter_records())
+
+    def iter_sent(self, after_id: int = 0, batch_size: int = 5000) -> Iterator[Tuple[int, str, str]]:
+        # (id, recipient, subject) for rows logged after `after_id`, oldest first
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, recipient, subject FROM sent_emails WHERE id > ? ORDER BY id LIMIT ?",
+                    (after_id, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row[0], _text(row[1]), _text(row[2])
+            after_id = rows[-1][0]
+
+    def search(
+        self,
+        text: str = "",
+        recipient: str = "",
+        sender: str = "",
+        provider: str = "",
+        since: TimeBound = None,
+        until: TimeBound = None,
+        limit: int = HISTORY_PAGE_SIZE,
+        offset: int = 0,
+    ) -> List[SentEmail]:
+        # Newest first. text: words that must all appear in the subject or body (prefix match, any case);
+        # recipient: an address, or a domain such as "example.com" / "@example.com"; since is inclusive,
+        # until exclusive, both ISO strings or dates in UTC
+        columns = ", ".join(f"sent_emails.{c}" for c in ("id",) + LOG_COLUMNS)
+        with default_metrics.span("history_search"):
+            with self._lock:
+                source, order, params = self._query(text, recipient, sender, provider, since, until)
+                rows = self._conn.execute(
+                    f"SELECT {columns} FROM {source} ORDER BY {order} DESC LIMIT ? OFFSET ?",
+                    params + [max(0, limit), max(0, offset)],
+                ).fetchall()
+        return [SentEmail(row[0], *(_text(v) for v in row[1:])) for row in rows]
+
+    def count_matching(
+        self,
+        text: str = "",
+        recipient: str = "",
+        sender: str = "",
+        provider: str = "",
+        since: TimeBound = None,
+        until: TimeBound = None,
+    ) -> int:
+        with self._lock:
+            source, _, params = self._query(text, recipient, sender, provider, since, until)
+            return self._conn.execute(f"SELECT COUNT(*) FROM {source}", params).fetchone()[0]
+
+    def has_sent(self, recipient: str, sender: str = "", since: TimeBound = None, subject: Optional[str] = None) -> bool:
+        # One index probe: has this address (optionally from this sender, since a time, with exactly this
+        # subject) been sent to
+        with self._lock:
+            source, _, params = self._query("", recipient, sender, "", since, None)
+            if subject is not None:
+                source += (" AND " if " WHERE " in source else " WHERE ") + "subject = ?"
+                params.append(subject)
+            return self._conn.execute(f"SELECT 1 FROM {source} LIMIT 1", params).fetchone() is not None
+
+    def sent_to(self, recipients: Iterable[str], sender: str = "", since: TimeBound = None) -> Set[str]:
+        # Which of these addresses are in the history, lowercased; one indexed IN (...) per 500 addresses
+        wanted = sorted({r.strip().lower() for r in recipients if r and r.strip()})
+        found: Set[str] = set()
+        with self._lock:
+            source, _, params = self._query("", "", sender, "", since, None)
+            joiner = " AND " if " WHERE " in source else " WHERE "
+            for start in range(0, len(wanted), _IN_CHUNK):
+                chunk = wanted[start:start + _IN_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT DISTINCT lower(recipient) FROM {source}{joiner}"
+                    f"recipient COLLATE NOCASE IN ({', '.join('?' * len(chunk))})",
+                    params + chunk,
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    def _query(
+        self,
+        text: str,
+        recipient: str,
+        sender: str,
+        provider: str,
+        since: TimeBound,
+        until: TimeBound,
+    ) -> Tuple[str, str, List[Any]]:
+        # (FROM ... WHERE ..., ORDER BY column, params); call with the lock held. With FTS5 a text query is
+        # driven from the full-text index in descending rowid order, so LIMIT stops at the first page of
+        # matches instead of collecting all of them
+        words = text.split()
+        full_text = bool(words) and self.full_text
+        id_column = "sent_emails_fts.rowid" if full_text else "sent_emails.id"
+        clauses: List[str] = []
+        params: List[Any] = []
+        if full_text:
+            # Each word quoted so user input is never parsed as FTS5 query syntax
+            clauses.append("sent_emails_fts MATCH ?")
+            params.append(" ".join('"' + w.replace('"', '""') + '"*' for w in words))
+        else:
+            for word in words:
+                pattern = "%" + word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                clauses.append("(subject LIKE ? ESCAPE '\\' OR body LIKE ? ESCAPE '\\')")
+                params += [pattern, pattern]
+        recipient = recipient.strip()
+        if recipient:
+            if "@" in recipient.lstrip("@"):
+                clauses.append("recipient = ? COLLATE NOCASE")
+                params.append(recipient)
+            else:
+                clauses.append("domain = ?")
+                params.append(recipient.lstrip("@").lower())
+        if sender.strip():
+            clauses.append("sender = ? COLLATE NOCASE")
+            params.append(sender.strip())
+        if provider.strip():
+            clauses.append("provider = ? COLLATE NOCASE")
+            params.append(provider.strip())
+        # On the indexed timestamp column itself: ids do not follow timestamps for retried batches or
+        # rows imported from the legacy workbook
+        if since:
+            clauses.append("sent_emails.timestamp >= ?")
+            params.append(_bound(since))
+        if until:
+            clauses.append("sent_emails.timestamp < ?")
+            params.append(_bound(until))
+        source = (
+            "sent_emails_fts JOIN sent_emails ON sent_emails.id = sent_emails_fts.rowid" if full_text else "sent_emails"
+        )
+        if clauses:
+            source += " WHERE " + " AND ".join(clauses)
+        return source, id_column, params
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _text(value: Any) -> str:
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    return str(value)
+
+
+def _domain(recipient: Any) -> str:
+    address = _text(recipient).strip()
+    return address.rpartition("@")[2].lower() if "@" in address else ""
+
+
+def _bound(value: Union[str, date]) -> str:
+    # Timestamps are stored as datetime.utcnow().isoformat(), so ISO strings compare in time order
+    return value if isinstance(value, str) else value.isoformat()
@@ -0,0 +1,165 @@
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from models.email_models import OutboxItem
+from clients.gemini_client import GeminiClient
+from clients.groq_client import GroqClient
+from services.async_log_writer import AsyncLogWriter, get_default_writer
+from services.send_log_store import SendLogStore
+from services.email_sender import EmailSender
+from services.outbox import Outbox, OutboxWorker
+from services.profile_store import ProfileStore
+from services.send_filter import SendFilter, SuppressionList
+from services.provider_router import ProviderRouter
+from services.settings_store import SettingsStore
+
+AI_CLIENT_CLASSES = {
+    "gemini": GeminiClient,
+    "groq": GroqClient,
+}
+
+
+def _key_fingerprint(api_key: str) -> str:
+    # Never keep raw API keys as dict keys
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+class ServiceRegistry:
+    # Process-wide memo of clients and services so a Streamlit rerun does not rebuild them
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._ai_clients: Dict[Tuple[str, str, str], Any] = {}
+        self._routers: Dict[Tuple[Tuple[str, str, str], ...], ProviderRouter] = {}
+        self._email_sender: Optional[EmailSender] = None
+        self._profile_store: Optional[ProfileStore] = None
+        self._settings_store: Optional[SettingsStore] = None
+        self._outbox: Optional[Outbox] = None
+        self._outbox_worker: Optional[OutboxWorker] = None
+
+    def ai_client(self, provider: str, model_name: str, api_key: str) -> Any:
+        client_cls = AI_CLIENT_CLASSES.get(provider, GeminiClient)
+        fingerprint = _key_fingerprint(api_key)
+        key = (provider, model_name, fingerprint)
+        with self._lock:
+            client = self._ai_clients.get(key)
+            if client is not None:
+                return client
+            # Same provider and key with another model: share the SDK client and its connection pool
+            sibling = next(
+                (c for (p, _, f), c in self._ai_clients.items() if p == provider and f == fingerprint),
+                None,
+            )
+            if sibling is not None:
+                client = sibling.with_model(model_name)
+            else:
+                # A new API key for this provider: clients built with the old key are stale
+                self.invalidate(provider)
+                client = client_cls(api_key=api_key, model_name=model_name)
+            self._ai_clients[key] = client
+            return client
+
+    def provider_router(self, providers: List[Tuple[str, str, str]]) -> ProviderRouter:
+        # providers: (provider, model_name, api_key) in priority order. The router keeps circuit
+        # breaker state, so it is memoized like the clients it wraps
+        key = tuple((p, m, _key_fingerprint(k)) for p, m, k in providers)
+        with self._lock:
+            router = self._routers.get(key)
+            if router is None:
+                router = ProviderRouter([self.ai_client(p, m, k) for p, m, k in providers])
+                self._routers[key] = router
+            return router
+
+    def email_sender(self) -> EmailSender:
+        # Bulk sends are screened against the send history and the suppression list
+        with self._lock:
+            if self._email_sender is None:
+                self._email_sender = EmailSender(send_filter=SendFilter(self.send_history()))
+                self._email_sender.scheduler.usage = self._quota_used
+            return self._email_sender
+
+    def _quota_used(self, budget: str, account: str, dimension: str, window: float) -> float:
+        # SMTP recipients sent within the window, counted from the send log when an account's quota is
+        # first paced in this process; a restart must not start the daily quota over
+        if not budget.startswith("smtp:") or dimension != "recipients" or not account:
+            return 0.0
+        since = datetime.utcnow() - timedelta(seconds=window)
+        return self.send_history().count_matching(sender=account, provider=budget[len("smtp:"):], since=since)
+
+    def suppression_list(self) -> SuppressionList:
+        return self.email_sender().send_filter.suppression
+
+    def log_writer(self) -> AsyncLogWriter:
+        return get_default_writer()
+
+    def send_history(self) -> SendLogStore:
+        # The store the log writer appends to, so searches see every flushed send
+        return self.log_writer().logger.store
+
+    def outbox(self) -> Outbox:
+        # The queue alone, for stats and maintenance; opening it does not start the worker
+        with self._lock:
+            if self._outbox is None:
+                self._outbox = Outbox()
+            return self._outbox
+
+    def outbox_worker(self) -> OutboxWorker:
+        # Started on first use (the first enqueue), then kept draining the outbox between reruns
+        with self._lock:
+            if self._outbox_worker is None:
+                writer = self.log_writer()
+
+                def log_sent(item: OutboxItem) -> None:
+                    if item.state == "sent":
+                        writer.append(
+                            sender_email=item.sender,
+                            recipient_email=item.recipient,
+                            subject=item.subject,
+                            body=item.body,
+                            provider=item.provider.upper(),
+                        )
+
+                self._outbox_worker = OutboxWorker(self.outbox(), sender=self.email_sender(), on_result=log_sent)
+                self._outbox_worker.start()
+            return self._outbox_worker
+
+    def profile_store(self) -> ProfileStore:
+        with self._lock:
+            if self._profile_store is None:
+                self._profile_store = ProfileStore()
+            return self._profile_store
+
+    def settings_store(self) -> SettingsStore:
+        with self._lock:
+            if self._settings_store is None:
+                self._settings_store = SettingsStore()
+            return self._settings_store
+
+    def invalidate(self, provider: Optional[str] = None) -> None:
+        # Drop memoized AI clients (all, or one provider's) so the next call rebuilds them from fresh settings
+        with self._lock:
+            if provider is None:
+                self._ai_clients.clear()
+                self._routers.clear()
+            else:
+                for key in [k for k in self._ai_clients if k[0] == provider]:
+                    del self._ai_clients[key]
+                for key in [k for k in self._routers if any(p == provider for p, _, _ in k)]:
+                    del self._routers[key]
+
+    def cached_client_count(self) -> int:
+        with self._lock:
+            return len(self._ai_clients)
+
+
+_registry: Optional[ServiceRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ServiceRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ServiceRegistry()
+        return _registry
@@ -1,35 +1,58 @@
 import os
+import time
+from datetime import datetime, timedelta
+
 import streamlit as st
 
-from services.email_sender import EmailSender
-from services.excel_logger import ExcelLogger
-from services.profile_store import ProfileStore
-from services.settings_store import SettingsStore
-from clients.gemini_client import GeminiClient
-from clients.groq_client import GroqClient
+from services.service_registry import get_registry
+from services.mail_merge import load_recipients, build_requests, build_draft_requests
+from services.draft_generator import DraftGenerator
+from core.metrics import default_metrics
 from models.email_models import EmailRequest, Provider, Attachment
 from config.app_config import GEMINI_MODEL
 from config.app_config import GROQ_MODEL
+from config.app_config import CUSTOM_SMTP_HOST, CUSTOM_SMTP_PORT, CUSTOM_SMTP_SECURITY
+from config.app_config import HISTORY_PAGE_SIZE
+from config.app_config import BULK_QUOTA_MAX_WAIT
+
+
+def _api_key(provider: str) -> str:
+    return os.getenv("GROQ_API_KEY", "") if provider == "groq" else os.getenv("GEMINI_API_KEY", "")
 
 
-def init_services(model_name: str = GEMINI_MODEL, provider: str = "gemini"):
-    gemini_api_key = os.getenv("GEMINI_API_KEY", "")
-    groq_api_key = os.getenv("GROQ_API_KEY", "")
-    if provider == "groq":
-        ai_client = GroqClient(api_key=groq_api_key, model_name=model_name)
+def init_services(
+    model_name: str = GEMINI_MODEL,
+    provider: str = "gemini",
+    failover_model: str = "",
+):
+    # Memoized across reruns and sessions; only the first call per (provider, model, api key) builds anything
+    registry = get_registry()
+    if failover_model:
+        # Retries, circuit breakers and hedging across both providers, selected one first
+        other = "gemini" if provider == "groq" else "groq"
+        ai_client = registry.provider_router(
+            [(provider, model_name, _api_key(provider)), (other, failover_model, _api_key(other))]
+        )
     else:
-        ai_client = GeminiClient(api_key=gemini_api_key, model_name=model_name)
-    email_sender = EmailSender()
-    excel_logger = ExcelLogger()
-    profile_store = ProfileStore()
+        ai_client = registry.ai_client(provider, model_name, _api_key(provider))
+    email_sender = registry.email_sender()
+    excel_logger = registry.log_writer()
+    profile_store = registry.profile_store()
     return ai_client, email_sender, excel_logger, profile_store
 
 
+def _show_skipped(skipped):
+    if skipped:
+        with st.expander(f"{len(skipped)} skipped before sending"):
+            for item in skipped:
+                st.text(f"{item.recipient_email}: {item.reason}")
+
+
 def run_app():
     st.set_page_config(page_title="Smart Email Writer", page_icon="✉️", layout="centered")
 
     # Load persisted UI defaults
-    settings_store = SettingsStore()
+    settings_store = get_registry().settings_store()
     settings = settings_store.load()
     default_ai_provider = settings.get("ai_provider", "gemini")
 
@@ -69,25 +92,42 @@ def run_app():
             help="2.0-flash-lite is newest and fastest, Pro is most capable",
         )
 
+    failover = st.checkbox(
+        "Fail over to the other provider",
+        value=bool(settings.get("failover", False)),
+        help="Retry with backoff and switch providers on errors or a slow first token",
+    )
+    failover_model = ""
+    if failover:
+        if ai_provider == "groq":
+            failover_model = settings.get("gemini_model", GEMINI_MODEL)
+        else:
+            failover_model = settings.get("groq_model", GROQ_MODEL)
+
     # Save defaults control
     col_sd1, col_sd2 = st.columns([1, 3])
     with col_sd1:
         if st.button("Save as default"):
             new_settings = {
                 "ai_provider": ai_provider,
+                "failover": failover,
             }
             if ai_provider == "groq":
                 new_settings["groq_model"] = model_choice
             else:
                 new_settings["gemini_model"] = model_choice
-            settings_store.save({**settings, **new_settings})
+            settings_store.update(new_settings)
+            get_registry().invalidate()
             st.success("Defaults saved")
 
-    ai_client, email_sender, excel_logger, profile_store = init_services(model_name=model_choice, provider=ai_provider)
+    ai_client, email_sender, excel_logger, profile_store = init_services(
+        model_name=model_choice, provider=ai_provider, failover_model=failover_model
+    )
 
     # Defaults from environment
     env_provider = (os.getenv("SMTP_PROVIDER", "gmail") or "gmail").lower()
-    default_provider = Provider.GMAIL if env_provider == "gmail" else Provider.OUTLOOK
+    provider_labels = {"Gmail": Provider.GMAIL, "Outlook": Provider.OUTLOOK, "Custom SMTP": Provider.CUSTOM}
+    default_provider = next((p for p in provider_labels.values() if p.value == env_provider), Provider.OUTLOOK)
     default_email = os.getenv("SMTP_EMAIL", "")
     default_password = os.getenv("SMTP_PASSWORD", "")
 
@@ -98,14 +138,117 @@ def run_app():
         st.header("SMTP Settings")
         provider_label = st.selectbox(
             "Provider",
-            options=["Gmail", "Outlook"],
-            index=(0 if default_provider == Provider.GMAIL else 1),
+            options=list(provider_labels),
+            index=list(provider_labels.values()).index(default_provider),
         )
-        provider = Provider.GMAIL if provider_label == "Gmail" else Provider.OUTLOOK
+        provider = provider_labels[provider_label]
+        smtp_endpoint = None
+        if provider == Provider.CUSTOM:
+            host_col, port_col = st.columns([3, 1])
+            with host_col:
+                custom_host = st.text_input("SMTP host", value=os.getenv("SMTP_HOST", CUSTOM_SMTP_HOST))
+            with port_col:
+                custom_port = st.number_input(
+                    "Port", min_value=1, max_value=65535, value=int(os.getenv("SMTP_PORT", CUSTOM_SMTP_PORT))
+                )
+            security_options = ["starttls", "ssl", "plain"]
+            env_security = os.getenv("SMTP_SECURITY", CUSTOM_SMTP_SECURITY)
+            custom_security = st.selectbox(
+                "Security",
+                options=security_options,
+                index=security_options.index(env_security) if env_security in security_options else 0,
+            )
+            # Carried on each request: the EmailSender and outbox worker are shared by every session
+            smtp_endpoint = (custom_host, int(custom_port), custom_security)
         smtp_email = st.text_input("Your Email (sender)", value=default_email, placeholder="name@example.com")
         smtp_password = st.text_input("SMTP Password/App Password", value=default_password, type="password")
         st.info("We do not store your credentials. Used only to send during this session.")
 
+        st.header("Send Log")
+        if st.button("Export log to Excel"):
+            try:
+                export_path = excel_logger.export()
+                st.success(f"Exported to {export_path}")
+            except Exception as e:
+                st.error(f"Export failed: {e}")
+        log_stats = excel_logger.stats()
+        st.caption(
+            f"Queue {log_stats.queue_depth} (max {log_stats.max_queue_depth}) · "
+            f"{log_stats.records_written} written in {log_stats.flushes} flushes · "
+            f"flush avg {log_stats.avg_flush_latency * 1000:.1f} ms, max {log_stats.max_flush_latency * 1000:.1f} ms"
+        )
+        if log_stats.errors:
+            st.warning(
+                f"{log_stats.errors} log flushes failed: {log_stats.last_error}"
+                + (f" · {log_stats.retrying} records waiting to be retried" if log_stats.retrying else "")
+                + (f" · {log_stats.dropped} dropped" if log_stats.dropped else "")
+            )
+        if log_stats.export_errors:
+            st.warning(f"{log_stats.export_errors} periodic Excel exports failed: {log_stats.last_error}")
+
+        st.header("Suppression List")
+        suppression = get_registry().suppression_list()
+        st.caption(f"{suppression.count()} addresses are never mailed in bulk sends (bounced or opted out)")
+        opt_out_file = st.file_uploader("Add opt-outs (CSV/XLSX with an 'email' column)", type=["csv", "xlsx"])
+        if opt_out_file is not None and st.button("Suppress these addresses"):
+            try:
+                opted_out = [r["email"] for r in load_recipients(opt_out_file.name, opt_out_file.getvalue())]
+                st.success(f"{suppression.add(opted_out, 'opted out')} new addresses suppressed")
+            except Exception as e:
+                st.error(f"Could not read opt-out file: {e}")
+
+        if failover:
+            st.header("AI Providers")
+            router_stats = ai_client.stats()
+            st.caption(
+                " · ".join(f"{name}: {state}" for name, state in router_stats.breaker_states.items())
+                + f" · {router_stats.retries} retries, {router_stats.failovers} failovers, "
+                f"{router_stats.hedges} hedges ({router_stats.hedge_wins} won)"
+            )
+
+        st.header("Outbox")
+        outbox = get_registry().outbox()
+        outbox_stats = outbox.stats()
+        st.caption(
+            f"{outbox_stats.queued} queued ({outbox_stats.retrying} retrying) · {outbox_stats.sending} sending · "
+            f"{outbox_stats.sent} sent · {outbox_stats.failed} failed"
+        )
+        if outbox_stats.failed and st.button("Retry failed"):
+            outbox.retry_failed()
+            get_registry().outbox_worker().notify()
+
+        st.header("Quotas")
+        for quota in email_sender.scheduler.states():
+            usage = ", ".join(
+                f"{name.replace('_', ' ')}: {max(0.0, quota.available[name]):.0f}/{limit:.0f} left"
+                for name, limit in quota.limits.items()
+            )
+            label = f"{quota.budget} {quota.account}".strip()
+            if quota.waiting:
+                usage += f" · {quota.waiting} waiting, drains in {quota.drain_time:.0f}s"
+            st.caption(f"{label} — {usage}")
+
+        st.header("Performance")
+        default_metrics.enabled = st.checkbox("Record timings", value=default_metrics.enabled)
+        stage_stats = default_metrics.stages()
+        for stat in stage_stats:
+            st.caption(
+                f"{stat.stage.replace('_', ' ')} — p50 {stat.p50 * 1000:.1f} ms · p95 {stat.p95 * 1000:.1f} ms "
+                f"· {stat.count} samples"
+            )
+        counters = default_metrics.counters()
+        if counters:
+            st.caption(" · ".join(f"{name.replace('_', ' ')}: {value}" for name, value in counters.items()))
+        if stage_stats or counters:
+            st.download_button(
+                "Download metrics (Prometheus)",
+                data=default_metrics.prometheus(),
+                file_name="email_writer_metrics.prom",
+                mime="text/plain",
+            )
+        else:
+            st.caption("No timings recorded yet")
+
     with st.expander("Your Profile (used for drafts)", expanded=False):
         current_profile = profile_store.load()
         
@@ -153,15 +296,70 @@ def run_app():
             if st.button("Reload Profile", use_container_width=True):
                 st.experimental_rerun()
 
+    # A checkbox rather than an expander: a collapsed expander still runs its body, and with it the
+    # history queries, on every rerun
+    if st.checkbox("Show send history", value=False):
+        history = get_registry().send_history()
+        query = st.text_input("Search subject and body", placeholder="invoice renewal")
+        hist_col1, hist_col2, hist_col3 = st.columns([2, 1, 1])
+        with hist_col1:
+            history_recipient = st.text_input("Recipient or domain", placeholder="jane@example.com or example.com")
+        with hist_col2:
+            history_provider = st.selectbox("Via", ["Any"] + [p.name for p in Provider])
+        with hist_col3:
+            periods = {"Any time": None, "Last 24 hours": 1, "Last 7 days": 7, "Last 30 days": 30, "Last year": 365}
+            period = st.selectbox("Period", list(periods))
+        history_filters = {
+            "text": query,
+            "recipient": history_recipient,
+            "provider": "" if history_provider == "Any" else history_provider,
+            "since": datetime.utcnow() - timedelta(days=periods[period]) if periods[period] else None,
+        }
+        # The total is a full COUNT, so it is kept until the filters change or more sends are logged
+        count_key = (query, history_recipient, history_provider, period, excel_logger.stats().records_written)
+        if st.session_state.get("history_count_key") != count_key:
+            st.session_state["history_count"] = history.count_matching(**history_filters)
+            st.session_state["history_count_key"] = count_key
+        matches = st.session_state["history_count"]
+        page = st.number_input(
+            "Page", min_value=1, max_value=max(1, -(-matches // HISTORY_PAGE_SIZE)), value=1, step=1
+        )
+        started = time.perf_counter()
+        found = history.search(**history_filters, limit=HISTORY_PAGE_SIZE, offset=(int(page) - 1) * HISTORY_PAGE_SIZE)
+        st.caption(f"{matches} sent emails match · page loaded in {(time.perf_counter() - started) * 1000:.1f} ms")
+        for sent_email in found:
+            st.markdown(f"**{sent_email.subject or '(no subject)'}** → {sent_email.recipient}")
+            preview = " ".join(sent_email.body.split())
+            st.caption(
+                f"{sent_email.timestamp[:16].replace('T', ' ')} UTC · {sent_email.provider} · {sent_email.sender} · "
+                f"{preview[:160]}{'…' if len(preview) > 160 else ''}"
+            )
+
     st.subheader("Generate Email")
     purpose_default = settings.get("default_purpose", "")
     purpose = st.text_input("Purpose/Topic", value=purpose_default, placeholder="Follow-up meeting request about Q4 roadmap")
     save_purpose = st.button("Save Purpose")
     if save_purpose:
-        settings_store.save({**settings, "default_purpose": purpose})
+        settings_store.update({"default_purpose": purpose})
         st.success("Purpose saved")
+    send_mode = st.radio("Send Mode", ["Single recipient", "Send to list"], horizontal=True)
     recipient = st.text_input("Recipient Name", placeholder="Jane Doe")
-    recipient_email = st.text_input("Recipient Email", placeholder="jane@example.com")
+    recipients = []
+    if send_mode == "Send to list":
+        recipient_email = ""
+        recipients_file = st.file_uploader(
+            "Recipients (CSV/XLSX with an 'email' column)",
+            type=["csv", "xlsx"],
+            help="Other columns (e.g. name, company) can be used as {placeholders} in Subject and Body",
+        )
+        if recipients_file is not None:
+            try:
+                recipients = load_recipients(recipients_file.name, recipients_file.getvalue())
+                st.caption(f"{len(recipients)} recipients loaded")
+            except Exception as e:
+                st.error(f"Could not read recipients file: {e}")
+    else:
+        recipient_email = st.text_input("Recipient Email", placeholder="jane@example.com")
 
     col_gen1, col_gen2, col_gen3 = st.columns(3)
     with col_gen1:
@@ -181,30 +379,90 @@ def run_app():
 
     uploaded_files = st.file_uploader("Attachments (optional)", accept_multiple_files=True)
 
+    regenerate = st.checkbox("Regenerate anyway (skip cache)", value=False)
+    cache_stats = ai_client.cache.stats()
+    if cache_stats.hits or cache_stats.misses:
+        st.caption(
+            f"Draft cache: {cache_stats.hits} hits / {cache_stats.misses} misses "
+            f"({cache_stats.hit_rate:.0%}), {cache_stats.entries} cached"
+        )
     col1, col2 = st.columns(2)
     with col1:
-        if st.button("Generate with AI", use_container_width=True):
-            with st.spinner("Generating email draft..."):
-                try:
-                    generated = ai_client.generate_email(
-                        purpose=purpose,
-                        recipient_name=recipient,
-                        tone=tone,
-                        language=language,
-                        additional_context=additional_context,
-                        profile=profile_store.load(),
-                        email_length=email_length,
-                    )
-                    st.session_state["generated_email_body"] = generated.body
-                    st.session_state["generated_subject"] = generated.subject
-                except Exception as e:
-                    st.error(str(e))
+        generate_clicked = st.button("Generate with AI", use_container_width=True)
 
     with col2:
         if st.button("Clear Draft", use_container_width=True):
             st.session_state["generated_email_body"] = ""
             st.session_state["generated_subject"] = ""
 
+    if generate_clicked:
+        preview = st.empty()
+        preview.caption("Generating email draft...")
+        try:
+            for update in ai_client.generate_email_stream(
+                purpose=purpose,
+                recipient_name=recipient,
+                tone=tone,
+                language=language,
+                additional_context=additional_context,
+                profile=profile_store.load(),
+                email_length=email_length,
+                use_cache=not regenerate,
+            ):
+                if update.done:
+                    break
+                preview.text(f"Subject: {update.subject}\n\n{update.body}")
+            preview.empty()
+            st.session_state["generated_email_body"] = update.email.body
+            st.session_state["generated_subject"] = update.email.subject
+            if update.cached:
+                st.caption("Draft served from cache")
+            elif update.time_to_first_token is not None:
+                st.caption(
+                    f"First token after {update.time_to_first_token:.2f}s, complete after {update.elapsed:.2f}s"
+                    + (f" ({update.provider})" if update.provider else "")
+                )
+        except Exception as e:
+            preview.empty()
+            st.error(str(e))
+
+    list_drafts = st.session_state.get("list_drafts", {})
+    if send_mode == "Send to list" and recipients:
+        if st.button("Generate personalized drafts for list", use_container_width=True):
+            draft_requests = build_draft_requests(
+                recipients,
+                purpose=purpose,
+                tone=tone,
+                language=language,
+                additional_context=additional_context,
+                email_length=email_length,
+            )
+            generator = DraftGenerator(ai_client)
+            progress = st.progress(0.0, text="Generating drafts...")
+            list_drafts = {}
+            draft_errors = []
+            for done, result in enumerate(
+                generator.iter_generate(draft_requests, profile=profile_store.load(), use_cache=not regenerate),
+                start=1,
+            ):
+                if result.ok:
+                    list_drafts[result.request.recipient_email] = result.email
+                else:
+                    draft_errors.append(result)
+                progress.progress(done / len(draft_requests), text=f"Generated {done}/{len(draft_requests)}")
+            st.session_state["list_drafts"] = list_drafts
+            if draft_errors:
+                with st.expander(f"{len(draft_errors)} drafts failed"):
+                    for r in draft_errors:
+                        st.text(f"{r.request.recipient_email}: {r.error}")
+        if list_drafts:
+            st.caption(
+                f"{len(list_drafts)} personalized drafts ready; they replace Subject/Body for those recipients."
+            )
+            if st.button("Discard personalized drafts"):
+                st.session_state["list_drafts"] = {}
+                list_drafts = {}
+
     subject_default = st.session_state.get("generated_subject", "")
     body_default = st.session_state.get("generated_email_body", "")
 
@@ -214,6 +472,25 @@ def run_app():
     send_col1, send_col2 = st.columns([1, 1])
     with send_col1:
         attach_log = st.checkbox("Log to Excel after send", value=True)
+        use_outbox = False
+        use_broadcast = False
+        skip_duplicates = False
+        if send_mode == "Send to list":
+            use_outbox = st.checkbox(
+                "Queue through outbox",
+                value=False,
+                help="Sends in the background, retries temporary SMTP errors and resumes after a restart",
+            )
+            use_broadcast = st.checkbox(
+                "Send as one broadcast (Bcc)",
+                value=False,
+                help="Same message to everyone, up to 100 recipients per SMTP transaction; placeholders are not filled",
+            )
+            skip_duplicates = st.checkbox(
+                "Skip suppressed and already-sent recipients",
+                value=True,
+                help="Leaves out bounced/opted-out addresses, repeats in the list and anyone who already got this subject",
+            )
     with send_col2:
         send_btn = st.button("Send Email ✉️", type="primary", use_container_width=True)
 
@@ -222,10 +499,114 @@ def run_app():
         if uploaded_files:
             attachments = []
             for uf in uploaded_files:
-                content = uf.read()
+                # A view of the uploaded buffer: one copy of the file no matter how many recipients
+                content = uf.getbuffer()
                 mime = uf.type or "application/octet-stream"
                 attachments.append(Attachment(filename=uf.name, content=content, mime_type=mime))
 
+        if send_mode == "Send to list":
+            if not recipients:
+                st.error("Upload a recipients file first.")
+                return
+            requests = build_requests(
+                recipients,
+                provider=provider,
+                sender_email=smtp_email,
+                sender_password=smtp_password,
+                subject=subject,
+                body=body,
+                attachments=attachments,
+                drafts=list_drafts,
+                smtp_endpoint=smtp_endpoint,
+            )
+            if skip_duplicates and not use_broadcast:
+                # Screened here rather than in send_many so the progress bar counts only what is sent
+                allowed, skipped_recipients = email_sender.screen([(r.recipient_email, r.subject) for r in requests])
+                requests = [requests[i] for i in allowed]
+                _show_skipped(skipped_recipients)
+            if use_outbox:
+                # The password stays in this process's memory only; the outbox never stores it
+                worker = get_registry().outbox_worker()
+                worker.set_credentials(provider.value, smtp_email, smtp_password)
+                # With screening off the user asked for repeats, so already sent messages are queued again
+                queued = worker.outbox.enqueue_many(requests, force=not skip_duplicates)
+                worker.notify()
+                skipped = len(requests) - queued
+                st.success(
+                    f"Queued {queued} messages" + (f" ({skipped} were already in the outbox)" if skipped else "")
+                )
+                return
+            if use_broadcast:
+                request = EmailRequest(
+                    provider=provider,
+                    sender_email=smtp_email,
+                    sender_password=smtp_password,
+                    recipient_email=smtp_email,
+                    subject=subject,
+                    body=body,
+                    attachments=attachments,
+                    smtp_endpoint=smtp_endpoint,
+                )
+                with st.spinner(f"Broadcasting to {len(recipients)} recipients..."):
+                    summary = email_sender.broadcast(request, [r["email"] for r in recipients], screen=skip_duplicates)
+                if attach_log:
+                    for r in summary.results:
+                        if r.ok:
+                            excel_logger.append(
+                                sender_email=smtp_email,
+                                recipient_email=r.recipient_email,
+                                subject=subject,
+                                body=body,
+                                provider=provider.name,
+                            )
+                st.success(f"Accepted for {summary.succeeded}/{summary.total} recipients in {summary.elapsed:.1f}s")
+                _show_skipped(summary.skipped)
+                refused = [r for r in summary.results if not r.ok]
+                if refused:
+                    with st.expander(f"{len(refused)} refused"):
+                        for r in refused:
+                            st.text(f"{r.recipient_email}: {r.error.splitlines()[0] if r.error else ''}")
+                return
+            drain = email_sender.predict_drain(requests)
+            if drain > BULK_QUOTA_MAX_WAIT:
+                st.error(
+                    f"The account quota would hold this batch for about {drain / 3600:.1f} h. "
+                    "Queue it through the outbox instead, it sends in the background as the quota allows."
+                )
+                return
+            if drain > 1:
+                st.info(f"Account quota paces this batch: expect about {drain / 60:.1f} min")
+            progress = st.progress(0.0, text="Sending...")
+            done = []
+
+            def on_result(result):
+                done.append(result)
+                progress.progress(len(done) / len(requests), text=f"Sent {len(done)}/{len(requests)}")
+                if result.ok and attach_log:
+                    sent = requests[result.index]
+                    try:
+                        excel_logger.append(
+                            sender_email=smtp_email,
+                            recipient_email=sent.recipient_email,
+                            subject=sent.subject,
+                            body=sent.body,
+                            provider=provider.name,
+                        )
+                    except Exception as e:
+                        st.warning(f"Sent to {sent.recipient_email} but failed to log: {e}")
+
+            summary = email_sender.send_many(requests, on_result=on_result, screen=False)
+            st.success(
+                f"Sent {summary.succeeded}/{summary.total} in {summary.elapsed:.1f}s "
+                f"({summary.throughput:.2f} msg/s, p50 {summary.latency_p50:.2f}s, p95 {summary.latency_p95:.2f}s)"
+            )
+            failed = [r for r in summary.results if not r.ok]
+            if failed:
+                with st.expander(f"{len(failed)} failed"):
+                    for r in failed:
+                        st.text(f"{r.recipient_email}: {r.error.splitlines()[0] if r.error else ''}")
+            return
+
         request = EmailRequest(
             provider=provider,
             sender_email=smtp_email,
@@ -234,6 +615,7 @@ def run_app():
             subject=subject,
             body=body,
             attachments=attachments,
+            smtp_endpoint=smtp_endpoint,
         )
         with st.spinner("Sending email..."):
             ok, error_message = email_sender.send(request)
@@ -248,7 +630,7 @@ def run_app():
                         body=body,
                         provider=provider.name,
                     )
-                    st.toast("Logged to Excel.")
+                    st.toast("Queued for logging.")
                 except Exception as e:
                     st.warning(f"Sent but failed to log: {e}")
         else: